@@ -0,0 +1,84 @@
+"""convert block order to fractional keys
+
+Revision ID: 46260063a04d
+Revises: be7250fa9539
+Create Date: 2026-10-19 10:03:17.224905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '46260063a04d'
+down_revision: Union[str, Sequence[str], None] = 'be7250fa9539'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The n-th block (from 0) in a space, by its old position and then id, gets the n-th
+    # integer key of app.core.ordering: "a0".."az", then "b00".."bzz", and so on.
+    op.execute(sa.text("""
+        CREATE FUNCTION pg_temp.block_order_key(n bigint) RETURNS text AS $$
+        DECLARE
+            digits CONSTANT text := '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz';
+            width int := 1;
+            span numeric := 62;
+            key text := '';
+        BEGIN
+            WHILE n >= span LOOP
+                n := n - span;
+                width := width + 1;
+                span := span * 62;
+            END LOOP;
+            FOR i IN 1..width LOOP
+                key := substr(digits, (n % 62)::int + 1, 1) || key;
+                n := n / 62;
+            END LOOP;
+            RETURN chr(ascii('a') + width - 1) || key;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """))
+    # Old positions can tie, which a type change's USING can't break, so the keys go into
+    # a new column with a single UPDATE: the only rewrite of the table. updated_at moves
+    # too, so cached lists and ETags of every space are invalidated.
+    op.add_column('blocks', sa.Column('order_key', sa.String(collation='C'), nullable=True))
+    op.execute(sa.text(
+        'UPDATE blocks SET order_key = pg_temp.block_order_key(ranked.position - 1), updated_at = now() FROM ('
+        '  SELECT id, row_number() OVER (PARTITION BY space_id ORDER BY "order", id) AS position'
+        '  FROM blocks'
+        ') AS ranked WHERE blocks.id = ranked.id'
+    ))
+    op.execute(sa.text("DROP FUNCTION pg_temp.block_order_key(bigint)"))
+    # Takes ix_blocks_space_id_order with it; the unique index below replaces it
+    op.drop_column('blocks', 'order')
+    op.alter_column('blocks', 'order_key', new_column_name='order', nullable=False)
+
+    # Keys are unique per space from now on, so two writers that computed the same key
+    # get an error and retry instead of leaving a tie. Built without blocking writes,
+    # then attached as the constraint.
+    with op.get_context().autocommit_block():
+        op.create_index('uq_blocks_space_id_order', 'blocks', ['space_id', 'order'], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.execute(sa.text(
+            'ALTER TABLE blocks ADD CONSTRAINT uq_blocks_space_id_order UNIQUE USING INDEX uq_blocks_space_id_order'
+        ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_blocks_space_id_order', 'blocks', type_='unique')
+    op.add_column('blocks', sa.Column('order_int', sa.Integer(), nullable=True))
+    op.execute(sa.text(
+        'UPDATE blocks SET order_int = ranked.position FROM ('
+        '  SELECT id, row_number() OVER (PARTITION BY space_id ORDER BY "order", id) AS position'
+        '  FROM blocks'
+        ') AS ranked WHERE blocks.id = ranked.id'
+    ))
+    op.drop_column('blocks', 'order')
+    op.alter_column('blocks', 'order_int', new_column_name='order', nullable=False)
+    op.create_index('ix_blocks_space_id_order', 'blocks', ['space_id', 'order'], unique=False)
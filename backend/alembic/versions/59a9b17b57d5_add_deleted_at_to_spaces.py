@@ -0,0 +1,29 @@
+"""add deleted_at to spaces
+
+Revision ID: 59a9b17b57d5
+Revises: abfb1785041a
+Create Date: 2026-10-19 13:20:44.119027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '59a9b17b57d5'
+down_revision: Union[str, Sequence[str], None] = 'abfb1785041a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Set when a space is deleted; its blocks are purged in the background afterwards
+    op.add_column('spaces', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('spaces', 'deleted_at')
@@ -0,0 +1,88 @@
+"""store large block content compressed with lz4 by TOAST, or as configured
+
+Revision ID: 741bf45db948
+Revises: ac4d66f88d92
+Create Date: 2026-10-19 15:06:48.350119
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '741bf45db948'
+down_revision: Union[str, Sequence[str], None] = 'ac4d66f88d92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# How TOAST stores blocks.content, read when this migration runs:
+#   lz4  (default) compress with lz4, which decompresses several times faster than pglz.
+#        Needs Postgres 14+ built --with-lz4; without it the column keeps pglz.
+#   pglz leave the column as Postgres sets it up (pglz)
+#   off  never compress; large values are still moved out of line
+# Whatever the setting, Postgres only looks at rows past TOAST_TUPLE_THRESHOLD (about
+# 2 kB), and a value is only kept compressed when that saves space. To change the
+# setting later, downgrade to ac4d66f88d92 and upgrade again with the new value.
+BLOCK_CONTENT_COMPRESSION = os.getenv("BLOCK_CONTENT_COMPRESSION", "lz4").lower()
+# Content shorter than this is never compressed, so those rows need no rewrite
+TOAST_THRESHOLD_BYTES = 2000
+# Existing rows are rewritten this many at a time, each batch in its own transaction
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Storage only: Postgres decompresses values as it reads them, so queries, the app
+    # and API responses still carry the full text. What shrinks is the table on disk
+    # and the pages read from it.
+    if BLOCK_CONTENT_COMPRESSION == "pglz":
+        return
+    if BLOCK_CONTENT_COMPRESSION == "off":
+        op.execute(sa.text("ALTER TABLE blocks ALTER COLUMN content SET STORAGE EXTERNAL"))
+    elif BLOCK_CONTENT_COMPRESSION == "lz4":
+        op.execute(sa.text(
+            "DO $$ BEGIN "
+            "ALTER TABLE blocks ALTER COLUMN content SET COMPRESSION lz4; "
+            "EXCEPTION WHEN OTHERS THEN RAISE NOTICE 'lz4 not available, keeping pglz'; "
+            "END $$"
+        ))
+    else:
+        raise ValueError(f"BLOCK_CONTENT_COMPRESSION must be lz4, pglz or off, not {BLOCK_CONTENT_COMPRESSION!r}")
+
+    # The new setting only applies to values written from now on. Rewrite the rows whose
+    # content isn't stored that way yet, so TOAST looks at them again. In id order and in
+    # batches, so the table is never locked for long. content || '' forces a new value;
+    # updated_at is left alone since the text doesn't change.
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        method = bind.execute(sa.text(
+            "SELECT CASE WHEN attstorage = 'e' THEN NULL WHEN attcompression = 'l' THEN 'lz4' ELSE 'pglz' END "
+            "FROM pg_attribute WHERE attrelid = 'blocks'::regclass AND attname = 'content'"
+        )).scalar()
+        if method == "pglz":
+            return  # lz4 wasn't available: the rows already use pglz
+        last_id = 0
+        while last_id is not None:
+            last_id = bind.execute(sa.text(
+                "WITH batch AS (SELECT id FROM blocks WHERE id > :last_id ORDER BY id LIMIT :batch_size), "
+                "rewritten AS ("
+                "  UPDATE blocks SET content = blocks.content || '' FROM batch"
+                "  WHERE blocks.id = batch.id AND octet_length(blocks.content) > :threshold"
+                "  AND pg_column_compression(blocks.content) IS DISTINCT FROM :method"
+                "  RETURNING blocks.id"
+                ") SELECT max(id) FROM batch"
+            ), {"last_id": last_id, "batch_size": BATCH_SIZE,
+                "threshold": TOAST_THRESHOLD_BYTES, "method": method}).scalar()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Values already written with lz4 or uncompressed stay readable; new ones use the default
+    # again. The row target is one an earlier version of this migration set.
+    op.execute(sa.text("ALTER TABLE blocks RESET (toast_tuple_target)"))
+    op.execute(sa.text("ALTER TABLE blocks ALTER COLUMN content SET STORAGE EXTENDED"))
+    op.execute(sa.text("ALTER TABLE blocks ALTER COLUMN content SET COMPRESSION default"))
@@ -0,0 +1,85 @@
+"""add block_order_after function
+
+Revision ID: abfb1785041a
+Revises: 46260063a04d
+Create Date: 2026-10-19 11:41:05.871362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'abfb1785041a'
+down_revision: Union[str, Sequence[str], None] = '46260063a04d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQL twin of app.core.ordering.key_after(key): the next integer after the key's
+    # integer part, "a0" for an empty space, so a block can be appended with a single
+    # INSERT ... SELECT. Keep the two in sync.
+    op.execute(sa.text("""
+        CREATE OR REPLACE FUNCTION block_order_after(key text) RETURNS text AS $$
+        DECLARE
+            digits CONSTANT text := '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz';
+            head text;
+            integer_digits text;
+            position int;
+            digit int;
+        BEGIN
+            IF key IS NULL THEN
+                RETURN 'a0';
+            END IF;
+            head := left(key, 1);
+            IF ascii(head) >= ascii('a') THEN
+                integer_digits := substr(key, 2, ascii(head) - ascii('a') + 1);
+            ELSE
+                integer_digits := substr(key, 2, ascii('Z') - ascii(head) + 1);
+            END IF;
+
+            position := length(integer_digits);
+            WHILE position > 0 LOOP
+                digit := strpos(digits, substr(integer_digits, position, 1));
+                IF digit < 62 THEN
+                    RETURN head || overlay(integer_digits PLACING substr(digits, digit + 1, 1) FROM position FOR 1);
+                END IF;
+                integer_digits := overlay(integer_digits PLACING '0' FROM position FOR 1);
+                position := position - 1;
+            END LOOP;
+
+            -- Every digit carried: one more digit (or one fewer below "a0")
+            IF head = 'Z' THEN
+                RETURN 'a0';
+            ELSIF head = 'z' THEN
+                -- Largest integer: a fraction after the key's own, as key_between(key, None) does
+                position := 28;
+                integer_digits := left(key, 27);
+                LOOP
+                    IF position > length(key) THEN
+                        digit := 0;
+                    ELSE
+                        digit := strpos(digits, substr(key, position, 1)) - 1;
+                    END IF;
+                    IF digit < 61 THEN
+                        RETURN integer_digits || substr(digits, (digit + 62) / 2 + 1, 1);
+                    END IF;
+                    integer_digits := integer_digits || 'z';
+                    position := position + 1;
+                END LOOP;
+            ELSIF ascii(head) >= ascii('a') THEN
+                RETURN chr(ascii(head) + 1) || integer_digits || '0';
+            END IF;
+            RETURN chr(ascii(head) + 1) || left(integer_digits, -1);
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.text("DROP FUNCTION IF EXISTS block_order_after(text)"))
@@ -0,0 +1,46 @@
+"""add block revision history
+
+Revision ID: ac4d66f88d92
+Revises: cd10a0ab5639
+Create Date: 2026-10-19 14:31:17.902846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ac4d66f88d92'
+down_revision: Union[str, Sequence[str], None] = 'cd10a0ab5639'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing blocks start at revision 0; their history begins with the next edit
+    op.add_column('blocks', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('block_revisions',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('block_id', sa.Integer(), nullable=False),
+    sa.Column('revision', sa.Integer(), nullable=False),
+    sa.Column('is_snapshot', sa.Boolean(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('content_length', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['block_id'], ['blocks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('block_id', 'revision', name='uq_block_revisions_block_id_revision')
+    )
+    # Data is already zlib compressed, TOAST compressing it again only costs CPU
+    op.execute("ALTER TABLE block_revisions ALTER COLUMN data SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('block_revisions')
+    op.drop_column('blocks', 'revision')
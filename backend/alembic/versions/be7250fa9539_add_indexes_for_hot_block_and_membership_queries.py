@@ -0,0 +1,47 @@
+"""add indexes for hot block and membership queries
+
+Revision ID: be7250fa9539
+Revises: 1264dc044da3
+Create Date: 2026-10-19 09:12:41.508217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'be7250fa9539'
+down_revision: Union[str, Sequence[str], None] = '1264dc044da3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    # get_blocks_in_space, max(order) on create and refresh-order
+    ('ix_blocks_space_id_order', 'blocks', ['space_id', 'order']),
+    ('ix_blocks_owner_id', 'blocks', ['owner_id']),
+    ('ix_spaces_owner_id', 'spaces', ['owner_id']),
+    # Lookups by user_id are served by the leading column of the (user_id, space_id) key,
+    # listing the members of a space is not.
+    ('ix_users_in_spaces_space_id_user_id', 'users_in_spaces', ['space_id', 'user_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table,
+                          postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,41 @@
+"""add full-text search vector to blocks
+
+Revision ID: cd10a0ab5639
+Revises: 59a9b17b57d5
+Create Date: 2026-10-19 13:58:02.671394
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cd10a0ab5639'
+down_revision: Union[str, Sequence[str], None] = '59a9b17b57d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Stored generated column: Postgres recomputes the vector of a row whenever its
+    # content is written, whichever code path does the write. Adding it rewrites the table.
+    op.add_column('blocks', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('simple'::regconfig, content)", persisted=True),
+        nullable=True,
+    ))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_blocks_search_vector', 'blocks', ['search_vector'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_blocks_search_vector', table_name='blocks',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column('blocks', 'search_vector')
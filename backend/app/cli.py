@@ -0,0 +1,59 @@
+"""Command line tools, run from the backend directory:
+
+    python -m app.cli export-space 42 -o space-42.ndjson
+    python -m app.cli import-space space-42.ndjson --owner-email alice@example.com
+"""
+import sys
+import time
+
+import click
+
+from app.db.session import SessionLocal
+from app.models.user import User
+from app.services.space import get_space_by_id, iter_space_export, import_space
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command("export-space")
+@click.argument("space_id", type=int)
+@click.option("-o", "--output", type=click.File("wb"), default="-", help="File to write, stdout by default.")
+def export_space(space_id: int, output):
+    """Write a space, its members and its blocks as NDJSON."""
+    db = SessionLocal()
+    try:
+        if not get_space_by_id(db, space_id):
+            raise click.ClickException(f"Space {space_id} not found")
+        for chunk in iter_space_export(db, space_id):
+            output.write(chunk)
+    finally:
+        db.close()
+
+
+@cli.command("import-space")
+@click.argument("path", type=click.File("rb"))
+@click.option("--owner-email", required=True, help="User who will own the imported space.")
+@click.option("--batch-size", type=int, default=5000, show_default=True, help="Blocks per COPY.")
+def import_space_command(path, owner_email: str, batch_size: int):
+    """Create a new space from an NDJSON export."""
+    db = SessionLocal()
+    try:
+        owner_id = db.query(User.id).filter(User.email == owner_email).scalar()
+        if owner_id is None:
+            raise click.ClickException(f"No user with email {owner_email}")
+
+        started = time.perf_counter()
+        result = import_space(db, path, owner_id, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        rate = result["blocks_imported"] / elapsed * 60 if elapsed else 0
+        click.echo(f"Imported {result['blocks_imported']} blocks into space {result['space_id']} "
+                   f"in {elapsed:.1f}s ({rate:,.0f} blocks/minute)", err=True)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
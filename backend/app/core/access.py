@@ -0,0 +1,82 @@
+from typing import Annotated, Optional
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.core.auth import get_current_user
+from app.core.permissions import Permission, PERMISSION_BITS, CREATOR_MASK, capability_mask
+from app.models.space import Space
+from app.models.user_in_space import UserInSpace, UserRole
+from app.schemas.user import UserOut
+
+
+class SpaceAccess:
+    """What the current user may do in one space, resolved once per request.
+
+    mask holds the user's permission bits (see app/core/permissions.py), so checks
+    during the rest of the request need no further queries.
+    """
+
+    def __init__(self, user, space_id: int, owner_id: Optional[int], role: Optional[UserRole], is_creator: bool):
+        self.user = user
+        self.space_id = space_id
+        self.owner_id = owner_id
+        self.role = role
+        self.is_creator = bool(is_creator)
+        self.is_member = role is not None
+        self.is_owner = owner_id is not None and owner_id == user.id
+        self.mask = capability_mask(role, is_creator) if role is not None else 0
+        if self.is_owner:
+            self.mask |= CREATOR_MASK
+
+    def can(self, permission: Permission) -> bool:
+        return bool(self.mask & PERMISSION_BITS[permission])
+
+    def require(self, permission: Permission, detail: str = "Insufficient permissions"):
+        if not self.is_member and not self.is_owner:
+            raise HTTPException(status_code=403, detail="You are not a member of this space")
+        if not self.can(permission):
+            raise HTTPException(status_code=403, detail=detail)
+        return self
+
+    def require_member(self):
+        if not self.is_member:
+            raise HTTPException(status_code=403, detail="You are not a member of this space")
+        return self
+
+    def require_owner(self):
+        if not self.is_owner:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        return self
+
+
+def remember_access(request: Request, access: SpaceAccess) -> SpaceAccess:
+    if not hasattr(request.state, "space_access"):
+        request.state.space_access = {}
+    request.state.space_access[access.space_id] = access
+    return access
+
+
+def resolve_space_access(request: Request, db: Session, user, space_id: int) -> SpaceAccess:
+    """Space and the user's membership in one query, cached on request.state per space.
+
+    Raises 404 for a missing or deleted space; membership is checked by the caller.
+    """
+    cached = getattr(request.state, "space_access", {}).get(space_id)
+    if cached is not None:
+        return cached
+
+    row = db.query(Space.owner_id, UserInSpace.role, UserInSpace.is_creator).outerjoin(
+        UserInSpace, and_(UserInSpace.space_id == Space.id, UserInSpace.user_id == user.id)
+    ).filter(Space.id == space_id, Space.deleted_at.is_(None)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Space not found")
+    return remember_access(request, SpaceAccess(user, space_id, row.owner_id, row.role, row.is_creator))
+
+
+def get_space_access(space_id: int, request: Request, db: Annotated[Session, Depends(get_db)],
+                     current_user: Annotated[UserOut, Depends(get_current_user)]):
+    return resolve_space_access(request, db, current_user, space_id)
+
+
+SpaceAccessDependency = Annotated[SpaceAccess, Depends(get_space_access)]
@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta, timezone
+import hmac
 import os
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -10,10 +12,16 @@ from typing import Annotated, Optional
 from app.db.session import get_db
 from app.schemas.user import UserOut
 from app.services.user import get_user_by_email
+from app.core import metrics
+from app.core.loop_monitor import flag_blocking_call
 
 SECRET_KEY = os.getenv("SECRET")
 ALGORITHM = "HS256" # fix
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Comma separated; these users may call the /internal debugging endpoints
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+# Bearer token Prometheus scrapes /metrics with; unset, only admins can read the metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -23,10 +31,16 @@ TokenDependency = Annotated[str, Depends(oauth2_scheme)]
 
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    flag_blocking_call("bcrypt")
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        metrics.password_verify_duration.observe(time.perf_counter() - started)
 
 
 def get_password_hash(password: str):
+    flag_blocking_call("bcrypt")
     return pwd_context.hash(password)
 
 
@@ -76,11 +90,29 @@ def get_current_user(token: TokenDependency, db: SessionDependency):
     return UserOut.model_validate(user)
 
 
+def get_admin_user(current_user: Annotated[UserOut, Depends(get_current_user)]):
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
+def get_metrics_reader(token: TokenDependency, db: SessionDependency):
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid metrics token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return None
+    return get_admin_user(get_current_user(token, db))
+
+
 def get_current_active_user(current_user: Annotated[UserOut, Depends(get_current_user)]):  
     return current_user
 
 
-async def get_current_user_websocket(token: str, db: Session):
+def get_current_user_websocket(token: str, db: Session):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class BlockListCache:
+    """LRU of serialized block lists per space, capped by total bytes.
+
+    Entries are stored with the ETag of the list they were built from and only served
+    while the database still reports that version, so a write made by another worker
+    can never be served stale. Writes in this process drop the entry straight away.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, tuple[str, bytes]]" = OrderedDict()
+        self._size = 0
+        # Sync endpoints run in the threadpool
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, space_id: int, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(space_id)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(space_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, space_id: int, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(space_id)
+            self._entries[space_id] = (etag, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, space_id: int):
+        with self._lock:
+            if self._discard(space_id):
+                self.invalidations += 1
+
+    def _discard(self, space_id: int) -> bool:
+        entry = self._entries.pop(space_id, None)
+        if entry is None:
+            return False
+        self._size -= len(entry[1])
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+block_cache = BlockListCache(int(os.getenv("BLOCK_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
@@ -0,0 +1,22 @@
+import hashlib
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the cheap version parts of a resource (counts, timestamps, hashes)."""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
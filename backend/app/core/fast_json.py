@@ -0,0 +1,38 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used without it
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Plain rows (dicts, lists, datetimes, enums) straight to JSON bytes.
+
+    Output matches what the pydantic response models produce for the same data,
+    including "Z" for UTC timestamps.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """For list endpoints whose rows come from trusted columns: no per-row model validation."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
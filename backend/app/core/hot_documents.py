@@ -0,0 +1,301 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from app.db.session import SessionLocal
+from app.models.block import Block, BLOCK_ROW_COLUMNS
+from app.models.block_revision import BlockRevision
+from app.core.block_cache import block_cache
+from app.core.revisions import prepare_revisions
+
+# Rough per-block overhead on top of the content, used for the memory budget
+BLOCK_OVERHEAD_BYTES = 256
+
+
+def block_row(block) -> dict:
+    """Plain dict of a Block's columns, the form documents keep blocks in."""
+    return {column.key: getattr(block, column.key) for column in BLOCK_ROW_COLUMNS}
+
+
+class HotDocument:
+    """In-memory copy of one space's blocks; the source of truth while it is loaded.
+
+    Edits land here first and are written back to the blocks table by checkpoint().
+    """
+
+    def __init__(self, space_id: int, rows: Iterable[dict]):
+        self.space_id = space_id
+        self.blocks: Dict[int, dict] = {row["id"]: row for row in rows}
+        self.dirty: set = set()
+        self.authors: Dict[int, Optional[int]] = {}  # last editor of each dirty block
+        self.revision = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        # Held for a whole checkpoint, so two of them can't commit out of order
+        self.checkpoint_lock = threading.Lock()
+        self.size = sum(self._row_size(row) for row in self.blocks.values())
+
+    @staticmethod
+    def _row_size(row: dict) -> int:
+        return len(row.get("content") or "") + BLOCK_OVERHEAD_BYTES
+
+    def _replace(self, block_id: int, row: dict):
+        old = self.blocks.get(block_id)
+        if old is not None:
+            self.size -= self._row_size(old)
+        self.blocks[block_id] = row
+        self.size += self._row_size(row)
+
+    def apply_edit(self, block_id: int, content: str, updated_at, author_id: Optional[int] = None) -> Optional[dict]:
+        with self.lock:
+            row = self.blocks.get(block_id)
+            if row is None:
+                return None
+            self._replace(block_id, {**row, "content": content, "updated_at": updated_at})
+            self.dirty.add(block_id)
+            self.authors[block_id] = author_id
+            self.revision += 1
+            self.last_used = time.monotonic()
+            return self.blocks[block_id]
+
+    def patch(self, upserts: Iterable[dict], deletes: Iterable[int]):
+        # Changes already committed by REST paths. They supersede pending edits of the same block.
+        with self.lock:
+            for change in upserts:
+                block_id = change["id"]
+                row = self.blocks.get(block_id)
+                if row is None and "space_id" not in change:
+                    continue  # partial change for a block this document never saw
+                self._replace(block_id, {**(row or {}), **change})
+                if "content" in change:
+                    self.dirty.discard(block_id)
+            for block_id in deletes:
+                row = self.blocks.pop(block_id, None)
+                if row is not None:
+                    self.size -= self._row_size(row)
+                self.dirty.discard(block_id)
+            self.revision += 1
+
+    def get(self, block_id: int) -> Optional[dict]:
+        with self.lock:
+            self.last_used = time.monotonic()
+            return self.blocks.get(block_id)
+
+    def snapshot(self) -> List[dict]:
+        with self.lock:
+            self.last_used = time.monotonic()
+            return sorted(self.blocks.values(), key=lambda row: (row["order"], row["id"]))
+
+    def take_dirty(self) -> List[dict]:
+        # "revision" is the block's revision in the table these edits were made on
+        with self.lock:
+            changes = [{"id": block_id, "content": self.blocks[block_id]["content"],
+                        "updated_at": self.blocks[block_id]["updated_at"],
+                        "revision": self.blocks[block_id].get("revision"),
+                        "author_id": self.authors.get(block_id)} for block_id in self.dirty]
+            self.dirty.clear()
+            self.authors.clear()
+            return changes
+
+    def mark_dirty(self, changes: Iterable[dict]):
+        with self.lock:
+            for change in changes:
+                if change["id"] in self.blocks:
+                    self.dirty.add(change["id"])
+                    self.authors.setdefault(change["id"], change["author_id"])
+
+    def checkpointed(self, revisions: Dict[int, int], superseded: Iterable[dict]):
+        """Record what a checkpoint wrote: the new revision of each written block, and the
+        table's rows for blocks another writer changed since take_dirty()."""
+        with self.lock:
+            for block_id, revision in revisions.items():
+                row = self.blocks.get(block_id)
+                if row is not None:
+                    self._replace(block_id, {**row, "revision": revision})
+            for change in superseded:
+                row = self.blocks.get(change["id"])
+                if row is None:
+                    continue
+                if change["id"] in self.dirty:
+                    # Edited again since: newer than the table, written on top of it next time
+                    self._replace(change["id"], {**row, "revision": change["revision"]})
+                else:
+                    self._replace(change["id"], change)
+            self.revision += 1
+
+
+class HotDocumentStore:
+    """Hot-document mode: spaces with websocket users are served from memory.
+
+    The first connection to a space loads it, websocket edits are applied in memory
+    and reads are served from it. Dirty blocks are written back every checkpoint
+    interval and when the last user leaves; idle documents are evicted when the
+    store goes over its memory budget.
+    """
+
+    def __init__(self, enabled: bool, max_bytes: int, checkpoint_seconds: float):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.checkpoint_seconds = checkpoint_seconds
+        self._documents: Dict[int, HotDocument] = {}
+        self._active: set = set()  # spaces with at least one websocket connection
+        self._lock = threading.Lock()
+        self.edits_applied = 0
+        self.edit_seconds_total = 0.0
+        self.edit_seconds_max = 0.0
+        self.checkpoints = 0
+        self.rows_written = 0
+        self.evictions = 0
+
+    def get(self, space_id: int) -> Optional[HotDocument]:
+        return self._documents.get(space_id)
+
+    def open(self, db, space_id: int) -> HotDocument:
+        """Load a space on its first connection (no-op when already loaded)."""
+        with self._lock:
+            self._active.add(space_id)
+            document = self._documents.get(space_id)
+        if document is None:
+            rows = [block_row(block) for block in db.query(Block).filter(Block.space_id == space_id)]
+            with self._lock:
+                document = self._documents.setdefault(space_id, HotDocument(space_id, rows))
+        self._evict_idle()
+        return document
+
+    def release(self, space_id: int):
+        """Last user left: write back pending edits, keep the document until evicted."""
+        with self._lock:
+            self._active.discard(space_id)
+        self.checkpoint(space_id)
+        self._evict_idle()
+
+    def apply_edit(self, space_id: int, block_id: int, content: str, updated_at, author_id: Optional[int] = None) -> Optional[dict]:
+        document = self._documents.get(space_id)
+        if document is None:
+            return None
+        started = time.perf_counter()
+        row = document.apply_edit(block_id, content, updated_at, author_id)
+        elapsed = time.perf_counter() - started
+        if row is not None:
+            self.edits_applied += 1
+            self.edit_seconds_total += elapsed
+            self.edit_seconds_max = max(self.edit_seconds_max, elapsed)
+        return row
+
+    def patch(self, space_id: int, upserts: Iterable[dict] = (), deletes: Iterable[int] = ()):
+        document = self._documents.get(space_id)
+        if document is not None:
+            document.patch(upserts, deletes)
+
+    def discard(self, space_id: int):
+        """Drop a document without writing it back (its space is being deleted)."""
+        with self._lock:
+            self._documents.pop(space_id, None)
+            self._active.discard(space_id)
+
+    def checkpoint(self, space_id: int):
+        """Write a document's dirty blocks back to the table.
+
+        A block whose revision moved since its edits were taken was written by a REST path
+        meanwhile (possibly in another worker); that write wins and the document takes the
+        table's row instead, the same as when the write patches the document itself.
+        """
+        document = self._documents.get(space_id)
+        if document is None:
+            return
+        with document.checkpoint_lock:
+            taken = document.take_dirty()
+            if not taken:
+                return
+            db = SessionLocal()
+            try:
+                blocks = Block.__table__
+                current = {row["id"]: dict(row) for row in db.execute(
+                    select(*BLOCK_ROW_COLUMNS).where(blocks.c.id.in_([change["id"] for change in taken]))
+                    .with_for_update()
+                ).mappings()}
+                # Blocks deleted meanwhile are in neither list
+                changes = [change for change in taken
+                           if change["id"] in current and current[change["id"]]["revision"] == change["revision"]]
+                superseded = [current[change["id"]] for change in taken
+                              if change["id"] in current and current[change["id"]]["revision"] != change["revision"]]
+                numbers = {}
+                if changes:
+                    # One revision per block per checkpoint, however many keystrokes went into it
+                    numbers, revisions = prepare_revisions(
+                        db, {change["id"]: change["content"] for change in changes},
+                        {change["id"]: change["author_id"] for change in changes}, datetime.now(timezone.utc)
+                    )
+                    # The rows are locked and their revisions checked above
+                    db.execute(
+                        update(blocks).where(blocks.c.id == bindparam("block_id"))
+                        .values(content=bindparam("new_content"), updated_at=bindparam("new_updated_at"),
+                                revision=func.coalesce(bindparam("new_revision"), blocks.c.revision)),
+                        [{"block_id": change["id"], "new_content": change["content"],
+                          "new_updated_at": change["updated_at"], "new_revision": numbers.get(change["id"])}
+                         for change in changes]
+                    )
+                    if revisions:
+                        db.execute(insert(BlockRevision), revisions)
+                db.commit()
+            except Exception:
+                db.rollback()
+                document.mark_dirty(taken)
+                raise
+            finally:
+                db.close()
+            document.checkpointed(numbers, superseded)
+        block_cache.invalidate(space_id)
+        self.checkpoints += 1
+        self.rows_written += len(changes)
+
+    def checkpoint_all(self):
+        for space_id in list(self._documents):
+            self.checkpoint(space_id)
+
+    def _evict_idle(self):
+        if self.size <= self.max_bytes:
+            return
+        with self._lock:
+            idle = [document for space_id, document in self._documents.items() if space_id not in self._active]
+        for document in sorted(idle, key=lambda doc: doc.last_used):
+            if self.size <= self.max_bytes:
+                return
+            self.checkpoint(document.space_id)
+            with self._lock:
+                if document.space_id not in self._active and not document.dirty:
+                    self._documents.pop(document.space_id, None)
+                    self.evictions += 1
+
+    @property
+    def size(self) -> int:
+        return sum(document.size for document in list(self._documents.values()))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "documents": len(self._documents),
+            "active_documents": len(self._active),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "edits_applied": self.edits_applied,
+            "edit_apply_avg_us": self.edit_seconds_total / self.edits_applied * 1e6 if self.edits_applied else 0.0,
+            "edit_apply_max_us": self.edit_seconds_max * 1e6,
+            "checkpoints": self.checkpoints,
+            "rows_written": self.rows_written,
+            # each edit would otherwise have been its own UPDATE + COMMIT
+            "db_writes_saved": max(self.edits_applied - self.rows_written, 0),
+            "evictions": self.evictions,
+        }
+
+
+hot_documents = HotDocumentStore(
+    enabled=os.getenv("HOT_DOCUMENTS", "").lower() in ("1", "true", "yes"),
+    max_bytes=int(os.getenv("HOT_DOCUMENTS_MAX_BYTES", 256 * 1024 * 1024)),
+    checkpoint_seconds=float(os.getenv("HOT_DOCUMENTS_CHECKPOINT_SECONDS", 5)),
+)
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+# Finished jobs kept around for status lookups
+MAX_FINISHED_JOBS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, kind: str, owner_id: Optional[int]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner_id = owner_id
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if not self.started_at:
+            return None
+        end = self.finished_at or datetime.now(timezone.utc)
+        return (end - self.started_at).total_seconds()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": self.duration,
+        }
+
+
+class JobQueue:
+    """In-process queue with a small worker pool for long-running space operations.
+
+    Job functions receive the Job as their first argument and may update job.progress.
+    Jobs don't survive a restart; operations that must finish are resumed at startup.
+    """
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._durations = {}  # kind -> (count, total seconds, max seconds)
+
+    def submit(self, kind: str, fn: Callable, *args, owner_id: Optional[int] = None) -> Job:
+        job = Job(kind, owner_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple):
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            job.result = fn(job, *args)
+            job.status = "succeeded"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.exception("Job failed", extra={"job_kind": job.kind, "job_id": job.id})
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                count, total, longest = self._durations.get(job.kind, (0, 0.0, 0.0))
+                self._durations[job.kind] = (count + 1, total + elapsed, max(longest, elapsed))
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs_for(self, owner_id: int):
+        with self._lock:
+            return [job for job in self._jobs.values() if job.owner_id == owner_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            durations = {
+                kind: {"count": count, "avg_seconds": total / count, "max_seconds": longest}
+                for kind, (count, total, longest) in self._durations.items()
+            }
+        by_status = {}
+        for job in jobs:
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "queue_depth": by_status.get("queued", 0),
+            "running": by_status.get("running", 0),
+            "succeeded": by_status.get("succeeded", 0),
+            "failed": by_status.get("failed", 0),
+            "durations": durations,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_queue = JobQueue(int(os.getenv("JOB_WORKERS", 2)))
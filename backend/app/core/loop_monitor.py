@@ -0,0 +1,120 @@
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core import metrics
+
+# How often the watchdog wakes up on the loop; lag is how late that wake-up is
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", 0.05))
+# A loop stuck for longer than this gets the blocking call's stack logged
+LOOP_STALL_MS = float(os.getenv("LOOP_STALL_MS", 100))
+# Warn about sync DB and bcrypt calls made on the event loop thread
+LOOP_DEBUG_BLOCKING = os.getenv("LOOP_DEBUG_BLOCKING", "").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Event-loop watchdog.
+
+    A task on the loop records a heartbeat every interval and measures how late it
+    woke up (the lag metric). A separate thread watches the heartbeat: the loop can't
+    report its own stall while it is stuck, but the thread can, and it grabs the loop
+    thread's stack with sys._current_frames() while the blocking call is still running.
+    """
+
+    def __init__(self, interval: float, stall_seconds: float):
+        self.interval = interval
+        self.stall_seconds = stall_seconds
+        self.loop_thread_id: Optional[int] = None
+        self.last_beat = time.monotonic()
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+        self._stop.set()
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag = max(now - expected, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            self.last_beat = now
+            metrics.event_loop_lag.observe(self.lag)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self.last_beat
+            blocked = time.monotonic() - beat - self.interval
+            # One report per stall, taken while the loop is still stuck in the call
+            if blocked < self.stall_seconds or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            metrics.event_loop_stalls.inc()
+            frame = sys._current_frames().get(self.loop_thread_id)
+            logger.warning("Event loop blocked", extra={
+                "blocked_ms": round(blocked * 1000, 1),
+                "stack": "".join(traceback.format_stack(frame)) if frame is not None else None,
+            })
+
+    def on_loop_thread(self) -> bool:
+        return threading.get_ident() == self.loop_thread_id
+
+    def stats(self) -> dict:
+        return {
+            "lag_ms": self.lag * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+            "stalls": self.stalls,
+            "stall_threshold_ms": self.stall_seconds * 1000,
+        }
+
+
+loop_monitor = LoopMonitor(LOOP_MONITOR_INTERVAL, LOOP_STALL_MS / 1000)
+
+_flagged = set()  # (kind, coroutine) pairs already reported, so a hot path warns once
+
+
+def flag_blocking_call(kind: str):
+    """In LOOP_DEBUG_BLOCKING mode, warn when a blocking call (kind "db" or "bcrypt")
+    runs on the event loop thread instead of the threadpool."""
+    if not LOOP_DEBUG_BLOCKING or not loop_monitor.on_loop_thread():
+        return
+    # The innermost coroutine on the stack is the one that should have used the threadpool
+    frame = sys._getframe(1)
+    while frame is not None and not frame.f_code.co_flags & inspect.CO_COROUTINE:
+        frame = frame.f_back
+    if frame is None:
+        return
+    key = (kind, frame.f_code)
+    if key in _flagged:
+        return
+    _flagged.add(key)
+    logger.warning("Blocking call on the event loop", extra={
+        "call": kind,
+        "coroutine": f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}",
+        "stack": "".join(traceback.format_stack(sys._getframe(1))),
+    })
@@ -0,0 +1,132 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Seconds; covers sub-millisecond cache hits up to slow exports
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self._series: Dict[Tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(values)) for key, values in self._series.items()]
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {values[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {values[-1]}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback returning {label values: value}; costs nothing otherwise."""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str], collect: Callable[[], Dict[Tuple, float]]):
+        self.name, self.help, self.labels, self.collect = name, help, tuple(labels), collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self.collect().items())
+        return lines
+
+
+class Registry:
+    """Metrics are plain in-process counters; text is only built when /metrics is scraped."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ["method", "route", "status"])
+websocket_messages = registry.counter(
+    "websocket_messages_received_total", "Inbound websocket messages by type.", ["type"])
+websocket_broadcast_recipients = registry.histogram(
+    "websocket_broadcast_recipients", "Connections a broadcast was sent to.",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500))
+websocket_broadcast_duration = registry.histogram(
+    "websocket_broadcast_duration_seconds", "Time to send one broadcast to every recipient.")
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement kind.", ["kind"])
+password_verify_duration = registry.histogram(
+    "auth_password_verify_seconds", "bcrypt password verification time.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0))
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran the watchdog's periodic wake-up.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+event_loop_stalls = registry.counter(
+    "event_loop_stalls_total", "Times the event loop was blocked for longer than the stall threshold.")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,181 @@
+import random
+from typing import List, Optional
+
+# Block order keys are compared byte by byte ("C" collation) and made of two parts:
+#
+# - an integer part: a head character giving its length, then that many base62 digits.
+#   "a0".."az" are 0..61, "b00".."bzz" the next 3844 and so on; "Zz", "Zy", ... count
+#   down below "a0". Appending or prepending a block steps this integer, so keys only
+#   grow by a character each time the count of blocks at an end multiplies by 62.
+# - an optional fraction, for keys between two neighbours: "a0V" sits between "a0"
+#   and "a1", "a0k" between "a0V" and "a1", and so on.
+#
+# A new key can always be made between two existing ones, so inserting or moving a
+# block only ever writes that one block's row.
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+INTEGER_ZERO = "a0"
+# Lowest integer; not a valid key on its own, as nothing could be placed before it
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+# Fractions grow by a digit every few inserts into the same gap. Past this length
+# the space gets its keys renumbered.
+MAX_KEY_LENGTH = 32
+
+# Random digits appended to an end-of-space key after a concurrent append took the
+# same key, so the retry doesn't collide again.
+JITTER_DIGITS = 2
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid order key head: {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Invalid order key: {key!r}")
+    return key[:length]
+
+
+def _validate(key: str):
+    if not key or key == SMALLEST_INTEGER or any(c not in DIGITS for c in key[1:]):
+        raise ValueError(f"Invalid order key: {key!r}")
+    if key[len(_integer_part(key)):].endswith(DIGITS[0]):
+        raise ValueError(f"Invalid order key: {key!r}")
+
+
+def _increment(integer: str) -> Optional[str]:
+    # None past the largest integer ("z" followed by 26 "z"s)
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        value = DIGITS.index(digits[i]) + 1
+        if value < BASE:
+            digits[i] = DIGITS[value]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+    if head == "Z":
+        return INTEGER_ZERO
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement(integer: str) -> Optional[str]:
+    # None below the smallest integer
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        value = DIGITS.index(digits[i]) - 1
+        if value >= 0:
+            digits[i] = DIGITS[value]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    # Fractions only: a < b, neither ends in "0"; a == "" means the start, b None the end
+    prefix = ""
+    while True:
+        if b is not None:
+            n = 0
+            while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+                n += 1
+            if n > 0:
+                prefix += b[:n]
+                a, b = a[n:], b[n:]
+                continue
+
+        digit_a = DIGITS.index(a[0]) if a else 0
+        digit_b = DIGITS.index(b[0]) if b is not None else BASE
+        if digit_b - digit_a > 1:
+            return prefix + DIGITS[(digit_a + digit_b) // 2]
+        if b is not None and len(b) > 1:
+            return prefix + b[:1]
+        prefix += DIGITS[digit_a]
+        a, b = a[1:], None
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Return a key that sorts strictly between a and b (either may be None)."""
+    if a is not None:
+        _validate(a)
+    if b is not None:
+        _validate(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Order keys out of order: {a!r} >= {b!r}")
+
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+        integer_b = _integer_part(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", b[len(integer_b):])
+        if integer_b < b:
+            return integer_b  # b has a fraction, its bare integer sorts before it
+        before = _decrement(integer_b)
+        if before is None:
+            raise ValueError("Cannot make an order key before the smallest one")
+        return before
+
+    integer_a = _integer_part(a)
+    if b is None:
+        after = _increment(integer_a)
+        return after if after is not None else integer_a + _midpoint(a[len(integer_a):], None)
+
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(a[len(integer_a):], b[len(integer_b):])
+    after = _increment(integer_a)
+    if after is not None and after < b:
+        return after
+    return integer_a + _midpoint(a[len(integer_a):], None)
+
+
+def key_after(a: Optional[str]) -> str:
+    """Key for appending after a (the current last key).
+
+    The block_order_after() SQL function computes the same key.
+    """
+    return key_between(a, None)
+
+
+def jitter() -> str:
+    return "".join(random.choices(DIGITS[1:], k=JITTER_DIGITS))
+
+
+def with_jitter(key: str) -> str:
+    """An end-of-space key with random digits appended, for retrying an append that
+    lost the key to a concurrent one. Sorts after key and before its successor."""
+    return key + jitter()
+
+
+def spread_keys(count: int) -> List[str]:
+    """Return count consecutive integer keys, used when renumbering a space."""
+    keys, key = [], None
+    for _ in range(count):
+        key = key_after(key)
+        keys.append(key)
+    return keys
+
+
+def needs_rebalance(key: str) -> bool:
+    return len(key) > MAX_KEY_LENGTH
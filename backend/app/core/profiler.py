@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# Per-request profiles (X-Profile header) are only taken when the header carries this token
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+# Per-request profiles of faster requests are thrown away
+PROFILE_MIN_MS = float(os.getenv("PROFILE_MIN_MS", 0))
+DEFAULT_INTERVAL_SECONDS = 0.005
+
+# One sampler at a time per process, whether started by the endpoint or by a request
+_busy = threading.Lock()
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread (event loop and threadpool alike) from a
+    background thread, using sys._current_frames(). Nothing is hooked into the
+    profiled code, so the cost is one stack walk per thread per interval.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        names, names_at = {}, 0.0
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            if now - names_at > 1.0:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                names_at = now
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format: "thread;outer;...;inner count" per line,
+        readable by flamegraph.pl, speedscope and similar tools."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_for(seconds: float, interval: float = DEFAULT_INTERVAL_SECONDS) -> Optional[str]:
+    """Profile the whole process for seconds; None if a profile is already running."""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval).start()
+        time.sleep(seconds)
+        profiler.stop()
+        return profiler.collapsed()
+    finally:
+        _busy.release()
+
+
+def start_request_profile() -> Optional[SamplingProfiler]:
+    if not _busy.acquire(blocking=False):
+        return None
+    return SamplingProfiler().start()
+
+
+def finish_request_profile(profiler: SamplingProfiler, name: str, elapsed_ms: float) -> Optional[str]:
+    """Stop a per-request profile and write it to PROFILE_DIR if the request was slow enough."""
+    try:
+        profiler.stop()
+    finally:
+        _busy.release()
+    if elapsed_ms < PROFILE_MIN_MS:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{name}.collapsed")
+    with open(path, "w") as output:
+        output.write(profiler.collapsed())
+    return path
@@ -0,0 +1,134 @@
+import contextvars
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core import metrics, tracing
+from app.core.loop_monitor import flag_blocking_call
+
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Same statement this many times in one request looks like a lazy load in a loop
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+# Share of N+1 warnings logged: the same endpoint repeats them on every request
+N_PLUS_ONE_LOG_SAMPLE_RATE = float(os.getenv("N_PLUS_ONE_LOG_SAMPLE_RATE", 0.1))
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        # Statements count into every enclosing collector, e.g. a test's query_budget
+        # around a request and the request's own collector inside it
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        return [(statement, count) for statement, count in self.statements.items() if count >= threshold]
+
+
+# One QueryStats per request. The object is shared with the threadpool and any child
+# task through the copied context, so sync endpoints count into it too.
+_current: contextvars.ContextVar = contextvars.ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def collect_queries():
+    stats = QueryStats(_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Fail when the block issues more than max_queries statements.
+
+        with query_budget(2):
+            client.get(f"/blocks/space/{space_id}", headers=headers)
+    """
+    with collect_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"  {count} x {statement}" for statement, count in stats.statements.most_common())
+        raise AssertionError(f"{stats.count} queries issued, budget is {max_queries}:\n{statements}")
+
+
+def parameter_shape(parameters):
+    # Types only, never values: bound parameters can hold passwords and note content
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def statement_kind(statement: str) -> str:
+    # First keyword (SELECT, INSERT, ...); WITH ... for CTEs
+    head = statement.lstrip()[:10].split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    flag_blocking_call("db")
+    context._query_started = time.perf_counter()
+    # Leaf span: started and ended by hand, never made current
+    context._query_span = tracing.span("db." + statement_kind(statement), statement=statement).start()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    context._query_span.end()
+    metrics.db_query_duration.observe(elapsed, statement_kind(statement))
+    stats = _current.get()
+    while stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements[statement] += 1
+        stats = stats.parent
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query", extra={
+            "duration_ms": round(elapsed * 1000, 1), "statement": statement, "params": parameter_shape(parameters),
+        })
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    query_span = getattr(exception_context.execution_context, "_query_span", None)
+    if query_span is not None:
+        query_span.end(exception_context.original_exception)
+
+
+# COMMIT isn't a cursor execute, so it gets its span from the session
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    session.info["commit_span"] = tracing.span("db.COMMIT").start()
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _after_commit(session, *args):
+    commit_span = session.info.pop("commit_span", None)
+    if commit_span is not None:
+        commit_span.end()
+
+
+def report_request(path: str, stats: QueryStats):
+    for statement, count in stats.repeated():
+        logger.warning("Possible N+1", extra={
+            "path": path, "count": count, "statement": statement, "sample_rate": N_PLUS_ONE_LOG_SAMPLE_RATE,
+        })
@@ -0,0 +1,105 @@
+import json
+import os
+import zlib
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.models.block import Block
+
+# Every Nth revision of a block is stored in full, so rebuilding any version applies
+# at most N - 1 deltas on top of a snapshot.
+SNAPSHOT_EVERY = int(os.getenv("REVISION_SNAPSHOT_EVERY", 50))
+
+# Revisions older than this are folded into a single snapshot by compaction
+RETENTION_DAYS = int(os.getenv("REVISION_RETENTION_DAYS", 90))
+
+
+def make_delta(old: str, new: str) -> bytes:
+    """Compressed edit script turning old into new.
+
+    The script is a JSON list of [start, end] ranges copied from old and strings
+    inserted. Common prefix and suffix are cut first: most edits touch one spot, so
+    the matcher only sees the few characters around it.
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+
+    ops = [[0, prefix]] if prefix else []
+    old_middle, new_middle = old[prefix:len(old) - suffix], new[prefix:len(new) - suffix]
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_middle, new_middle, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([prefix + i1, prefix + i2])
+        elif tag in ("replace", "insert"):
+            ops.append(new_middle[j1:j2])
+    if suffix:
+        ops.append([len(old) - suffix, len(old)])
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode())
+
+
+def apply_delta(old: str, delta: bytes) -> str:
+    parts = []
+    for op in json.loads(zlib.decompress(delta)):
+        parts.append(old[op[0]:op[1]] if isinstance(op, list) else op)
+    return "".join(parts)
+
+
+def make_snapshot(content: str) -> bytes:
+    return zlib.compress(content.encode())
+
+
+def read_snapshot(data: bytes) -> str:
+    return zlib.decompress(data).decode()
+
+
+def rebuild(revisions: Iterable) -> Optional[str]:
+    """Content after the last of revisions, which must start with a snapshot."""
+    content = None
+    for revision in revisions:
+        content = read_snapshot(revision.data) if revision.is_snapshot else apply_delta(content, revision.data)
+    return content
+
+
+def revision_rows(block_id: int, revision: int, old: str, new: str, author_id: Optional[int], now) -> List[dict]:
+    """block_revisions rows recording the change from old to new as revision."""
+    rows = []
+    if revision == 1:
+        # History starts at the first edit: keep what the block was created with as revision 0
+        rows.append({"block_id": block_id, "revision": 0, "is_snapshot": True, "data": make_snapshot(old),
+                     "content_length": len(old), "author_id": None, "created_at": now})
+    snapshot = revision % SNAPSHOT_EVERY == 0
+    rows.append({
+        "block_id": block_id,
+        "revision": revision,
+        "is_snapshot": snapshot,
+        "data": make_snapshot(new) if snapshot else make_delta(old, new),
+        "content_length": len(new),
+        "author_id": author_id,
+        "created_at": now,
+    })
+    return rows
+
+
+def prepare_revisions(db, contents: Dict[int, str], authors: Dict[int, Optional[int]], now) -> Tuple[Dict[int, int], List[dict]]:
+    """Lock blocks about to get new content and build their revision rows.
+
+    The caller writes the blocks with the returned revision numbers and inserts the rows
+    in the same transaction. Blocks whose content doesn't actually change are left out.
+    """
+    current = db.execute(
+        select(Block.id, Block.content, Block.revision).where(Block.id.in_(contents)).with_for_update()
+    ).all()
+    numbers, rows = {}, []
+    for block_id, old, revision in current:
+        new = contents[block_id]
+        if new == old:
+            continue
+        numbers[block_id] = revision + 1
+        rows.extend(revision_rows(block_id, revision + 1, old, new, authors.get(block_id), now))
+    return numbers, rows
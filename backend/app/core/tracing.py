@@ -0,0 +1,194 @@
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional
+
+# Finished spans are appended to this file, one JSON object per line, using the
+# OpenTelemetry field names so a collector's file receiver or a script can load them.
+TRACE_FILE = os.getenv("TRACE_FILE")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+# Set to 0 when clients aren't trusted to pick trace ids or to ask for tracing
+TRACE_TRUST_TRACEPARENT = os.getenv("TRACE_TRUST_TRACEPARENT", "1") == "1"
+TRACING = bool(TRACE_FILE)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+_exporter = None
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = self.end_ns = 0
+        self.error = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def start(self):
+        self.start_ns = time.time_ns()
+        return self
+
+    def end(self, error: Optional[BaseException] = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _exporter.export(self)
+
+    def __enter__(self):
+        # Spans used as context managers become the parent of spans opened inside them
+        self._token = _current.set(self)
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_dict(self) -> dict:
+        entry = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+        }
+        if self.error:
+            entry["status"] = {"code": "ERROR", "message": self.error}
+        return entry
+
+
+class _NoSpan:
+    """Stands in for a span when the request isn't traced."""
+    def set(self, key, value):
+        pass
+
+    def start(self):
+        return self
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class FileExporter:
+    """Writes spans from a background thread so request threads never do file I/O."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def _run(self):
+        with open(self.path, "a") as output:
+            while True:
+                span = self._queue.get()
+                lines = [json.dumps(span.to_dict(), default=str)]
+                while not self._queue.empty() and len(lines) < 1000:
+                    lines.append(json.dumps(self._queue.get().to_dict(), default=str))
+                output.write("\n".join(lines) + "\n")
+                output.flush()
+
+
+if TRACING:
+    _exporter = FileExporter(TRACE_FILE)
+
+
+def _is_hex(value: str, length: int) -> bool:
+    return len(value) == length and all(char in "0123456789abcdef" for char in value)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace id, parent id, sampled) of a W3C traceparent, None when it isn't valid.
+
+    00-<32 hex trace id>-<16 hex parent id>-<2 hex flags>, lowercase; all-zero ids and
+    version ff are invalid. Later versions may append fields after the flags.
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or not _is_hex(parts[0], 2) or parts[0] == "ff" or (parts[0] == "00" and len(parts) != 4):
+        return None
+    version, trace_id, parent_id, flags = parts[:4]
+    if not _is_hex(trace_id, 32) or not _is_hex(parent_id, 16) or not _is_hex(flags, 2):
+        return None
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 0x01)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes):
+    """Root span of a request or websocket message; NO_SPAN when tracing is off or not sampled.
+
+    A valid incoming traceparent continues the caller's trace if its sampled flag is set,
+    and is not traced if it isn't. TRACE_SAMPLE_RATE applies either way, so callers
+    can't make every request traced.
+    """
+    if not TRACING:
+        return NO_SPAN
+    parent = parse_traceparent(traceparent) if TRACE_TRUST_TRACEPARENT else None
+    if (parent and not parent[2]) or random.random() >= TRACE_SAMPLE_RATE:
+        return NO_SPAN
+    if parent:
+        return Span(name, parent[0], parent[1], attributes)
+    return Span(name, "%032x" % random.getrandbits(128), None, attributes)
+
+
+def span(name: str, **attributes):
+    """Child of the current span; free when there is none."""
+    parent = _current.get()
+    if parent is None:
+        return NO_SPAN
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    parent = _current.get()
+    return parent.trace_id if parent is not None else None
+
+
+def traceparent_of(span_: Span) -> str:
+    return f"00-{span_.trace_id}-{span_.span_id}-01"
+
+
+def traced(name: Optional[str] = None):
+    """Decorator: run a (sync) function inside a child span named after it."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
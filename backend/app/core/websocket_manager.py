@@ -1,9 +1,11 @@
 # Create: app/core/websocket_manager.py
 import asyncio
+import time
 from fastapi import WebSocket
 from typing import Dict, List, Set
 import json
 from datetime import datetime
+from app.core import metrics, tracing
 
 class ConnectionManager:
     def __init__(self):
@@ -65,15 +67,26 @@ class ConnectionManager:
         if space_id not in self.active_connections:
             return
         
+        started = time.perf_counter()
+        trace_id = tracing.current_trace_id()
+        if trace_id:
+            # Lets receivers (and their logs) tie the event back to the edit that caused it
+            message = {**message, "trace_id": trace_id}
         message_str = json.dumps(message)
         disconnected = []
+        recipients = 0
         
-        for websocket in self.active_connections[space_id].copy():
-            if websocket != exclude_websocket:
-                try:
-                    await websocket.send_text(message_str)
-                except Exception:
-                    disconnected.append(websocket)
+        with tracing.span("broadcast_to_space", space_id=space_id) as broadcast_span:
+            for websocket in self.active_connections[space_id].copy():
+                if websocket != exclude_websocket:
+                    recipients += 1
+                    try:
+                        await websocket.send_text(message_str)
+                    except Exception:
+                        disconnected.append(websocket)
+            broadcast_span.set("recipients", recipients)
+        metrics.websocket_broadcast_recipients.observe(recipients)
+        metrics.websocket_broadcast_duration.observe(time.perf_counter() - started)
         
         # Clean up disconnected websockets
         for websocket in disconnected:
@@ -95,4 +108,9 @@ class ConnectionManager:
         return users
 
 # Global connection manager instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
+
+metrics.registry.gauge(
+    "websocket_connections", "Open websocket connections per space.", ["space_id"],
+    lambda: {(space_id,): len(connections) for space_id, connections in list(manager.active_connections.items())}
+)
\ No newline at end of file
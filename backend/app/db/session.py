@@ -1,19 +1,117 @@
+import math
 import os
-from sqlalchemy import create_engine
+import random
+import time
+from fastapi import Request, Response
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Comma separated, e.g. postgresql://app@replica-1/notes,postgresql://app@replica-2/notes
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 2))
+# How long a client keeps reading from the primary after its own write
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
 
 engine = create_engine(DATABASE_URL)
+replica_engines = [create_engine(url, pool_pre_ping=True) for url in REPLICA_DATABASE_URLS]
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+
+class ReplicaRouter:
+    """Chooses the engine for read-only requests.
+
+    A replica is used unless the client wrote recently (read-your-writes) or every
+    replica is lagging more than max_lag_seconds, in which case reads go to the primary.
+    Lag is checked at most once per check_interval per replica.
+    """
+
+    def __init__(self, primary, replicas, max_lag_seconds: float, sticky_seconds: float, check_interval: float = 1.0):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+        self._lag = {}  # engine -> (checked_at, lag_seconds)
+
+    def is_sticky(self, last_write_at: float = None) -> bool:
+        # Wall clock, as the time was set by whichever worker served the write
+        return last_write_at is not None and time.time() - last_write_at < self.sticky_seconds
+
+    def lag(self, replica) -> float:
+        now = time.monotonic()
+        checked = self._lag.get(replica)
+        if checked and now - checked[0] < self.check_interval:
+            return checked[1]
+        try:
+            lag = self.measure_lag(replica)
+        except Exception:
+            lag = float("inf")
+        self._lag[replica] = (now, lag)
+        return lag
+
+    def measure_lag(self, replica) -> float:
+        # Replay equal to receive says nothing once streaming stops, so compare with the primary
+        with self.primary.connect() as connection:
+            primary_lsn = connection.execute(text("SELECT pg_current_wal_flush_lsn()::text")).scalar()
+        with replica.connect() as connection:
+            caught_up, streaming, replay_age = connection.execute(text(
+                "SELECT pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn), "
+                "EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'), "
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+            ), {"primary_lsn": primary_lsn}).one()
+        if caught_up:
+            return 0.0
+        if not streaming or replay_age is None:
+            # Behind and not receiving (or not a standby at all): it won't catch up by itself
+            return float("inf")
+        return float(replay_age)
+
+    def choose(self, last_write_at: float = None):
+        if not self.replicas or self.is_sticky(last_write_at):
+            return self.primary
+        healthy = [replica for replica in self.replicas if self.lag(replica) <= self.max_lag_seconds]
+        return random.choice(healthy) if healthy else self.primary
+
+
+replica_router = ReplicaRouter(engine, replica_engines, REPLICA_MAX_LAG_SECONDS, REPLICA_STICKY_SECONDS)
+
+# Read-your-writes travels with the client, so it holds whichever worker serves the next read
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+def mark_write(response: Response, written_at: float = None):
+    """Tells the client when it last wrote, for it to send back on its reads."""
+    value = f"{time.time() if written_at is None else written_at:.3f}"
+    response.headers[LAST_WRITE_HEADER] = value
+    response.set_cookie(LAST_WRITE_COOKIE, value, max_age=math.ceil(REPLICA_STICKY_SECONDS), httponly=True, samesite="lax")
+
+
+def last_write(request: Request):
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints, bound to a replica when one is usable."""
+    db = SessionLocal(bind=replica_router.choose(last_write(request)))
+    try:
+        yield db
+    finally:
+        db.close()
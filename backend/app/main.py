@@ -1,9 +1,76 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, user, space, block, user_in_space
+from app.routers import auth, user, space, block, user_in_space, job
 from app.routers import websocket
+from app.core.block_cache import block_cache
+from app.core.hot_documents import hot_documents
+from app.core import query_stats, metrics, profiler, tracing
+from app.core.auth import get_admin_user, get_metrics_reader
+from app.core.log import setup_logging, shutdown_logging
+from app.core.jobs import job_queue
+from app.core.loop_monitor import loop_monitor
+from app.db.session import SessionLocal, mark_write
+from app.services.space import resume_space_purges
+from app.services.block_revision import start_revision_compaction
 
-app = FastAPI(title="App_API", version="1.0.0")
+# How often old block revisions are folded into snapshots
+REVISION_COMPACTION_HOURS = float(os.getenv("REVISION_COMPACTION_HOURS", 24))
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+async def checkpoint_hot_documents():
+    while True:
+        await asyncio.sleep(hot_documents.checkpoint_seconds)
+        try:
+            await run_in_threadpool(hot_documents.checkpoint_all)
+        except Exception:
+            logger.exception("Hot document checkpoint failed")
+
+
+async def compact_revisions():
+    while True:
+        await asyncio.sleep(REVISION_COMPACTION_HOURS * 3600)
+        start_revision_compaction()
+
+
+def resume_purges():
+    db = SessionLocal()
+    try:
+        resume_space_purges(db)
+    except Exception:
+        logger.exception("Could not resume space purges")
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    await run_in_threadpool(resume_purges)
+    checkpointer = asyncio.create_task(checkpoint_hot_documents()) if hot_documents.enabled else None
+    compactor = asyncio.create_task(compact_revisions())
+    yield
+    compactor.cancel()
+    loop_monitor.stop()
+    if checkpointer:
+        checkpointer.cancel()
+        await run_in_threadpool(hot_documents.checkpoint_all)
+    job_queue.shutdown()
+    shutdown_logging()
+
+
+app = FastAPI(title="App_API", version="1.0.0", lifespan=lifespan)
 
 # Updated CORS configuration with explicit methods and origins
 app.add_middleware(
@@ -11,32 +78,140 @@ app.add_middleware(
     allow_origins=["http://localhost:3000"],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With"],
-    expose_headers=["Content-Type", "Content-Length"],
+    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With", "If-None-Match", "X-Last-Write"],
+    expose_headers=["Content-Type", "Content-Length", "ETag", "X-DB-Query-Count", "X-DB-Time-Ms", "X-Last-Write"],
     max_age=600  # Cache preflight requests for 10 minutes
 )
 
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    # X-Profile: <PROFILE_TOKEN> samples every thread while this request runs and writes
+    # the stacks to PROFILE_DIR; the response names the file in X-Profile-File
+    if not profiler.PROFILE_TOKEN or request.headers.get("x-profile") != profiler.PROFILE_TOKEN:
+        return await call_next(request)
+
+    sampler = profiler.start_request_profile()
+    if sampler is None:
+        return await call_next(request)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        name = f"{request.method}{request.url.path}".replace("/", "_")
+        path = await run_in_threadpool(
+            profiler.finish_request_profile, sampler, name, (time.perf_counter() - started) * 1000
+        )
+    if path:
+        response.headers["X-Profile-File"] = path
+    return response
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route template, not the raw path, so ids don't explode the label set
+    route = request.scope.get("route")
+    metrics.http_request_duration.observe(
+        time.perf_counter() - started, request.method, route.path if route else "unmatched", response.status_code
+    )
+    return response
+
+
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    with query_stats.collect_queries() as stats:
+        response = await call_next(request)
+
+    query_stats.report_request(request.url.path, stats)
+    if query_stats.DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.1f}"
+    return response
+
+
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    response = await call_next(request)
+    # Read-your-writes: after a successful write the client reads from the primary for a while
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        mark_write(response)
+    return response
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    # Root span of the request; handler, service, SQL and commit spans nest under it.
+    # Declared last so it is the outermost middleware and times everything else.
+    request_span = tracing.start_trace(
+        f"{request.method} {request.url.path}", request.headers.get("traceparent"),
+        **{"http.method": request.method, "http.target": request.url.path},
+    )
+    if request_span is tracing.NO_SPAN:
+        return await call_next(request)
+    with request_span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            request_span.name = f"{request.method} {route.path}"
+            request_span.set("http.route", route.path)
+            request_span.set("handler", route.endpoint.__name__)
+        request_span.set("http.status_code", response.status_code)
+    response.headers["traceparent"] = tracing.traceparent_of(request_span)
+    return response
+
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(user.router, prefix="/users", tags=["users"])
 app.include_router(space.router, prefix="/spaces", tags=["spaces"])
 app.include_router(block.router, prefix="/blocks", tags=["blocks"])
 app.include_router(user_in_space.router, prefix="/user-in-space", tags=["user-in-space"])
+app.include_router(job.router, prefix="/jobs", tags=["jobs"])
 app.include_router(websocket.router)
 
+
+@app.get("/internal/stats", tags=["internal"])
+def internal_stats(admin: Annotated[object, Depends(get_admin_user)]):
+    return {
+        "block_cache": block_cache.stats(), "hot_documents": hot_documents.stats(), "jobs": job_queue.stats(),
+        "event_loop": loop_monitor.stats(),
+    }
+
+
+@app.get("/metrics", tags=["internal"], include_in_schema=False)
+def prometheus_metrics(reader: Annotated[object, Depends(get_metrics_reader)]):
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/internal/profile", tags=["internal"])
+def profile_process(
+    admin: Annotated[object, Depends(get_admin_user)],
+    seconds: Annotated[float, Query(gt=0, le=60)] = 10,
+    interval_ms: Annotated[float, Query(ge=1, le=100)] = 5
+):
+    # Runs in the threadpool, so the event loop keeps serving while it samples
+    stacks = profiler.profile_for(seconds, interval_ms / 1000)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return Response(content=stacks, media_type="text/plain",
+                    headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'})
+
+
 # Add global exception handler to ensure CORS headers are included in error responses
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    from fastapi.responses import JSONResponse
-    import traceback
-    
-    # Log the error for debugging
-    traceback_str = ''.join(traceback.format_exception(None, exc, exc.__traceback__))
-    print(f"Global exception handler caught: {traceback_str}")
-    
     # Return a standardized response
     status_code = 500
     if hasattr(exc, "status_code"):
         status_code = exc.status_code
+
+    if isinstance(exc, StarletteHTTPException) or status_code < 500:
+        # Expected errors (404, 403, ...): one line, no traceback
+        logger.info("HTTP error", extra={"status_code": status_code, "path": request.url.path, "detail": str(exc)})
+    else:
+        # The traceback is formatted on the logging thread, not here
+        logger.error("Unhandled exception", exc_info=exc, extra={"path": request.url.path, "method": request.method})
     
     response = JSONResponse(
         status_code=status_code,
@@ -3,5 +3,6 @@ from .user import User
 from .space import Space
 from .block import Block
 from .user_in_space import UserInSpace
+from .block_revision import BlockRevision
 
-__all__ = ["Base", "User", "Space", "Block", "UserInSpace"]
\ No newline at end of file
+__all__ = ["Base", "User", "Space", "Block", "UserInSpace", "BlockRevision"]
\ No newline at end of file
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, func, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, Text, DateTime, func, ForeignKey, Enum, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from .base import Base
 import enum
 
@@ -9,18 +10,36 @@ class BlockType(enum.Enum):
     BULLET_LIST = "BULLET_LIST"
     NUMBERED_LIST = "NUMBERED_LIST"
 
+# Text search configuration: no stemming or stop words, so any language matches as typed
+SEARCH_CONFIG = "simple"
+
 class Block(Base):
     __tablename__ = "blocks"
+    __table_args__ = (
+        UniqueConstraint("space_id", "order", name="uq_blocks_space_id_order"),
+        Index("ix_blocks_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     space_id = Column(Integer, ForeignKey("spaces.id", ondelete="CASCADE"), nullable=False)
     type = Column(Enum(BlockType), nullable=False)
+    # Stored compressed by TOAST (lz4) when its row passes about 2 kB; on disk only,
+    # reads get the plain text. See migration 741bf45db948
     content = Column(Text, nullable=False)
-    order = Column(Integer, default=0, nullable=False)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Fractional order key, see app/core/ordering.py. "C" collation so keys sort byte by byte.
+    order = Column(String(collation="C"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # Number of the latest entry in block_revisions; 0 until the content is first edited
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    # Maintained by Postgres on every write of content, only read by search queries
+    search_vector = deferred(Column(TSVECTOR, Computed(f"to_tsvector('{SEARCH_CONFIG}'::regconfig, content)", persisted=True)))
 
     # Relationships
     space = relationship("Space", back_populates="blocks")
-    owner = relationship("User", back_populates="blocks")
\ No newline at end of file
+    owner = relationship("User", back_populates="blocks")
+
+
+# Columns clients and in-memory copies deal with (everything but search_vector)
+BLOCK_ROW_COLUMNS = [column for column in Block.__table__.columns if column.key != "search_vector"]
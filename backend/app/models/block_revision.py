@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, Integer, Boolean, LargeBinary, DateTime, ForeignKey, UniqueConstraint, func
+from .base import Base
+
+class BlockRevision(Base):
+    """One version of a block's content, see app/core/revisions.py.
+
+    data is either a zlib compressed full copy (is_snapshot) or a compressed delta
+    against the previous revision. Rows are only ever inserted, except by compaction.
+    """
+    __tablename__ = "block_revisions"
+    __table_args__ = (
+        UniqueConstraint("block_id", "revision", name="uq_block_revisions_block_id_revision"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    block_id = Column(Integer, ForeignKey("blocks.id", ondelete="CASCADE"), nullable=False)
+    revision = Column(Integer, nullable=False)
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    data = Column(LargeBinary, nullable=False)
+    content_length = Column(Integer, nullable=False)
+    author_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
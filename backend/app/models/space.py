@@ -8,9 +8,10 @@ class Space(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Changed to owner_id
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)  # Changed to owner_id
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())  # Add this since it exists
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # soft delete, blocks purged by a background job
 
     # Relationships - keep these the same
     members = relationship("UserInSpace", back_populates="space")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, func, Boolean, Enum
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, func, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 import enum
@@ -10,6 +10,9 @@ class UserRole(enum.Enum):
 
 class UserInSpace(Base):
     __tablename__ = "users_in_spaces"
+    __table_args__ = (
+        Index("ix_users_in_spaces_space_id_user_id", "space_id", "user_id"),
+    )
 
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     space_id = Column(Integer, ForeignKey("spaces.id", ondelete="CASCADE"), primary_key=True)
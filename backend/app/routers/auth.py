@@ -17,7 +17,7 @@ SessionDependency = Annotated[Session, Depends(get_db)]
 
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: SessionDependency):
+def register(user_data: UserCreate, db: SessionDependency):
 
     existing_user = get_user_by_email(db, user_data.email)
     if existing_user:
@@ -30,7 +30,7 @@ async def register(user_data: UserCreate, db: SessionDependency):
 
 
 @router.post("/login", response_model=Token)
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: SessionDependency):
+def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: SessionDependency):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -1,120 +1,326 @@
+import base64
+import json
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
+from anyio import from_thread
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 from app.models.user import User
-from app.schemas.block import BlockCreate, BlockOut, BlockUpdate
-from app.services.block import (create_block, get_block_by_id, update_block, delete_block, get_blocks_in_space)
-from app.services.space import get_space_by_id
-from app.db.session import get_db
+from app.schemas.block import (BlockCreate, BlockOut, BlockUpdate, BlockMove, BlockBatch, BlockBatchResult, BlockPage, BlockSearchPage,
+                               BlockRevisionOut, BlockRevisionContent)
+from app.services.block import (create_block_for_member, apply_block_update, get_block_rows_in_space, block_out_row,
+                                move_block, rebalance_space_order, apply_block_batch, get_blocks_page,
+                                iter_block_batches, get_space_block_version, search_blocks, SEARCH_CANDIDATES)
+from app.services.block import delete_block as delete_block_by_id
+from app.services.block_revision import get_block_revisions, get_block_content_at, restore_block_revision
+from app.db.session import get_db, get_read_db, SessionLocal
 from app.core.auth import get_current_user
-from app.core.permissions import Permission, has_permission
+from app.core.permissions import Permission
+from app.core.access import SpaceAccess, SpaceAccessDependency, remember_access, resolve_space_access
+from app.core.ordering import needs_rebalance
+from app.core.etag import make_etag, is_not_modified, not_modified_response
+from app.core.block_cache import block_cache
+from app.core import fast_json
+from app.core.hot_documents import hot_documents
+from app.core.websocket_manager import manager
 from app.models.user_in_space import UserInSpace
+from app.models.space import Space
 from app.models.block import Block
 
 router = APIRouter(tags=["blocks"])
 
 SessionDependency = Annotated[Session, Depends(get_db)]
+ReadSessionDependency = Annotated[Session, Depends(get_read_db)]
 UserDependency = Annotated[User, Depends(get_current_user)]
 
-
 #functions to reduce repetition
-def get_space_membership(space_id: int, current_user: User, db: Session):
-    membership = db.query(UserInSpace).filter(UserInSpace.user_id == current_user.id,UserInSpace.space_id == space_id).first()
-    
-    if not membership:
-        raise HTTPException(status_code=403, detail="You are not a member of this space")
-    
-    return membership
-
-def get_block_membership(block_id: int, current_user: User, db: Session):
-    block = get_block_by_id(db, block_id)
-    if not block:
+def get_block_access(block_id: int, request: Request, db: SessionDependency, current_user: UserDependency):
+    # Block, its space's owner and the caller's membership in one query; FastAPI caches
+    # dependencies, so this runs once per request
+    row = db.query(Block, Space.owner_id, UserInSpace.role, UserInSpace.is_creator).join(
+        Space, and_(Space.id == Block.space_id, Space.deleted_at.is_(None))
+    ).outerjoin(
+        UserInSpace, and_(UserInSpace.space_id == Block.space_id, UserInSpace.user_id == current_user.id)
+    ).filter(Block.id == block_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Block not found")
-    
-    membership = get_space_membership(block.space_id, current_user, db)
-    return block, membership
 
-def check_permission(membership, permission: Permission):
-    if not has_permission(membership.role, permission, membership.is_creator):
-        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    block, owner_id, role, is_creator = row
+    access = remember_access(request, SpaceAccess(current_user, block.space_id, owner_id, role, is_creator))
+    return block, access.require_member()
+
+BlockAccessDependency = Annotated[tuple[Block, SpaceAccess], Depends(get_block_access)]
+
+def encode_cursor(block):
+    return base64.urlsafe_b64encode(json.dumps([block.order, block.id]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        order, block_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(order), int(block_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def stream_blocks(space_id: int, format: str):
+    # The response body is produced after the endpoint returns, so it needs its own session
+    db = SessionLocal()
+    try:
+        separator = b"\n" if format == "ndjson" else b","
+        if format == "json":
+            yield b"["
+        first = True
+        for batch in iter_block_batches(db, space_id):
+            chunk = separator.join(fast_json.dumps(dict(row._mapping)) for row in batch)
+            if format == "ndjson":
+                yield chunk + b"\n"
+            else:
+                yield chunk if first else b"," + chunk
+            first = False
+        if format == "json":
+            yield b"]"
+    finally:
+        db.close()
+
+def rebalance_in_background(space_id: int):
+    # Runs after the response is sent, so it can't use the request's session
+    db = SessionLocal()
+    try:
+        rebalance_space_order(db, space_id)
+    finally:
+        db.close()
 
 
 
 @router.post("/", response_model=BlockOut)
-def create_new_block(block_in: BlockCreate, db: SessionDependency, current_user: UserDependency):
-    space = get_space_by_id(db, block_in.space_id)
-    if not space:
-        raise HTTPException(status_code=404, detail="Space not found")
-    
-    membership = get_space_membership(block_in.space_id, current_user, db)
-    check_permission(membership, Permission.CREATE_BLOCKS)
+def create_new_block(block_in: BlockCreate, request: Request, background_tasks: BackgroundTasks, db: SessionDependency, current_user: UserDependency):
+    # Membership check, order key and insert in one statement
+    db_block = create_block_for_member(db, block_in, current_user.id)
+    if db_block is None:
+        # Nothing inserted: find out which check failed, off the hot path
+        resolve_space_access(request, db, current_user, block_in.space_id).require(Permission.CREATE_BLOCKS)
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    # Get max order for this space
-    max_order = db.query(func.max(Block.order)).filter(Block.space_id == block_in.space_id).scalar()
-    
-    now = datetime.now(timezone.utc)
-    
-    db_block = Block(
-        space_id=block_in.space_id,
-        content=block_in.content,
-        type=block_in.type,
-        owner_id=current_user.id,
-        order=(max_order or 0) + 1,
-        created_at=now,    # Explicit safety
-        updated_at=now     # Explicit safety ; database has no default
-    ) 
-    db.add(db_block)
-    db.commit()
-    db.refresh(db_block)
+    if needs_rebalance(db_block["order"]):
+        background_tasks.add_task(rebalance_in_background, db_block["space_id"])
     
     return db_block
 
 
+@router.get(
+    "/search",
+    response_model=BlockSearchPage,
+    description="Full-text search over the blocks of the caller's spaces, best match first. "
+                f"Only the newest {SEARCH_CANDIDATES} matching blocks are ranked: for a common "
+                "term, older blocks may be missing from the results.",
+)
+def search_my_blocks(
+    db: ReadSessionDependency,
+    current_user: UserDependency,
+    q: Annotated[str, Query(min_length=1, max_length=256)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    offset: Annotated[int, Query(ge=0, le=1000)] = 0
+):
+    # Declared before /{block_id} so "search" isn't taken for a block id
+    hits, has_more = search_blocks(db, current_user.id, q, limit, offset)
+    return {
+        "items": hits,
+        "next_offset": offset + limit if has_more else None
+    }
+
+
 @router.get("/{block_id}", response_model=BlockOut)
-def read_block(block_id: int, db: SessionDependency, current_user: UserDependency):
-    block, membership = get_block_membership(block_id, current_user, db)
-    check_permission(membership, Permission.VIEW_BLOCKS)
+def read_block(block_id: int, resolved: BlockAccessDependency):
+    block, access = resolved
+    access.require(Permission.VIEW_BLOCKS)
+    document = hot_documents.get(block.space_id)
+    if document:
+        # Hot space: memory has edits the table only gets at the next checkpoint
+        return document.get(block_id) or block
     return block
 
 
 @router.get("/space/{space_id}", response_model=list[BlockOut])
-def read_blocks_for_space(space_id: int, db: SessionDependency, current_user: UserDependency):
-    membership = get_space_membership(space_id, current_user, db)
-    check_permission(membership, Permission.VIEW_BLOCKS)
-    return get_blocks_in_space(db, space_id=space_id)
+def read_blocks_for_space(space_id: int, request: Request, db: ReadSessionDependency, current_user: UserDependency):
+    # Membership and list version come back together, so a 304 costs a single query
+    version = get_space_block_version(db, space_id, current_user.id)
+    if not version:
+        raise HTTPException(status_code=403, detail="You are not a member of this space")
+    access = remember_access(request, SpaceAccess(current_user, space_id, None, version.role, version.is_creator))
+    access.require(Permission.VIEW_BLOCKS)
+
+    document = hot_documents.get(space_id)
+    if document:
+        etag = make_etag("hot", space_id, id(document), document.revision)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        body = fast_json.dumps([block_out_row(row) for row in document.snapshot()])
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    etag = make_etag("blocks", space_id, version.block_count, version.last_updated)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    body = block_cache.get(space_id, etag)
+    if body is None:
+        # Columns straight to JSON bytes: no ORM objects, no per-row model validation
+        body = fast_json.dumps(get_block_rows_in_space(db, space_id))
+        block_cache.put(space_id, etag, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/space/{space_id}/stream")
+def stream_blocks_for_space(space_id: int, access: SpaceAccessDependency, format: Literal["ndjson", "json"] = "ndjson"):
+    # Full dump for large spaces: rows are serialized batch by batch as they come off the cursor
+    access.require(Permission.VIEW_BLOCKS)
+    hot_documents.checkpoint(space_id)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(stream_blocks(space_id, format), media_type=media_type)
+
+
+@router.get("/space/{space_id}/page", response_model=BlockPage)
+def read_blocks_page(
+    space_id: int,
+    db: SessionDependency,
+    access: SpaceAccessDependency,
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+    cursor: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    # Keyset pagination on (order, id); start/end restrict to an order window, e.g. the viewport
+    access.require(Permission.VIEW_BLOCKS)
+    hot_documents.checkpoint(space_id)
+
+    after = decode_cursor(cursor) if cursor else None
+    blocks, has_more = get_blocks_page(db, space_id, limit, after=after, start=start, end=end)
+    return {
+        "items": blocks,
+        "next_cursor": encode_cursor(blocks[-1]) if has_more else None
+    }
 
 
 @router.put("/{block_id}", response_model=BlockOut)
-def update_existing_block(block_id: int, block_in: BlockUpdate, db: SessionDependency, current_user: UserDependency):
-    block, membership = get_block_membership(block_id, current_user, db)
-    check_permission(membership, Permission.EDIT_BLOCKS)
+def update_existing_block(block_id: int, block_in: BlockUpdate, db: SessionDependency, resolved: BlockAccessDependency):
+    block, access = resolved
+    access.require(Permission.EDIT_BLOCKS)
 
-    updated_block = update_block(db, block_id, block_in)
-    if not updated_block:
-        raise HTTPException(status_code=404, detail="Block not found")
-    return updated_block
+    # Reuses the resolved block: no re-fetch before the UPDATE, no refresh after
+    return apply_block_update(db, block, block_in, author_id=access.user.id)
+
+
+@router.put("/{block_id}/move", response_model=BlockOut)
+def move_existing_block(block_id: int, move: BlockMove, background_tasks: BackgroundTasks, db: SessionDependency, resolved: BlockAccessDependency):
+    block, access = resolved
+    access.require(Permission.REORDER_BLOCKS)
+
+    moved_block = move_block(db, block, move)
+    if needs_rebalance(moved_block.order):
+        background_tasks.add_task(rebalance_in_background, moved_block.space_id)
+    return moved_block
+
+
+@router.get("/{block_id}/revisions", response_model=list[BlockRevisionOut])
+def read_block_revisions(
+    block_id: int,
+    resolved: BlockAccessDependency,
+    db: SessionDependency,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    before: Optional[int] = None
+):
+    block, access = resolved
+    access.require(Permission.VIEW_BLOCKS)
+    # Pending in-memory edits become a revision first
+    hot_documents.checkpoint(block.space_id)
+    return get_block_revisions(db, block_id, limit, before)
+
+
+@router.get("/{block_id}/revisions/{revision}", response_model=BlockRevisionContent)
+def read_block_revision(block_id: int, revision: int, resolved: BlockAccessDependency, db: SessionDependency):
+    block, access = resolved
+    access.require(Permission.VIEW_BLOCKS)
+    hot_documents.checkpoint(block.space_id)
+    db.refresh(block)
+
+    content = get_block_content_at(db, block, revision)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"revision": revision, "content": content}
+
+
+@router.post("/{block_id}/revisions/{revision}/restore", response_model=BlockOut)
+def restore_revision(block_id: int, revision: int, resolved: BlockAccessDependency, db: SessionDependency, current_user: UserDependency):
+    block, access = resolved
+    access.require(Permission.EDIT_BLOCKS)
+    hot_documents.checkpoint(block.space_id)
+    db.refresh(block)
+
+    restored = restore_block_revision(db, block, revision, current_user.id)
+    if restored is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    from_thread.run(manager.broadcast_to_space, restored.space_id, {
+        "type": "block_updated",
+        "block_id": block_id,
+        "content": restored.content,
+        "updated_by": current_user.id,
+        "updated_by_username": current_user.username,
+        "timestamp": datetime.now().isoformat()
+    })
+    return restored
+
+
+BATCH_PERMISSIONS = {
+    "create": Permission.CREATE_BLOCKS,
+    "update": Permission.EDIT_BLOCKS,
+    "move": Permission.REORDER_BLOCKS,
+    "delete": Permission.DELETE_BLOCKS,
+}
+
+@router.post("/space/{space_id}/batch", response_model=BlockBatchResult)
+def apply_batch(space_id: int, batch: BlockBatch, background_tasks: BackgroundTasks, db: SessionDependency, current_user: UserDependency, access: SpaceAccessDependency):
+    # Also for an empty batch, which would otherwise still be broadcast to the space
+    access.require(Permission.VIEW_BLOCKS)
+    for op in {operation.op for operation in batch.operations}:
+        access.require(BATCH_PERMISSIONS[op])
+
+    result, rebalance = apply_block_batch(db, space_id, current_user.id, batch.operations)
+    if rebalance:
+        background_tasks.add_task(rebalance_in_background, space_id)
+
+    result = BlockBatchResult.model_validate(result)
+    # One event for the whole batch; sync endpoint, so hop back onto the event loop to send it
+    from_thread.run(manager.broadcast_to_space, space_id, {
+        "type": "blocks_batch",
+        **result.model_dump(mode="json"),
+        "updated_by": current_user.id,
+        "updated_by_username": current_user.username,
+        "timestamp": datetime.now().isoformat()
+    })
+    return result
 
 
 @router.delete("/{block_id}")
-async def delete_block(
-    block_id: int, 
+def delete_block(
+    block_id: int,
+    resolved: BlockAccessDependency,
     current_user: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
+    _, access = resolved
+    access.require(Permission.DELETE_BLOCKS)
+
     # Delete the block from database
-    block = db.query(Block).filter(Block.id == block_id).first()
+    block = delete_block_by_id(db, block_id)
     if not block:
         raise HTTPException(status_code=404, detail="Block not found")
     
-    space_id = block.space_id  # Get space_id before deleting
-    db.delete(block)
-    db.commit()
+    space_id = block.space_id
     
-    # IMPORTANT: Broadcast the deletion to other users
-    from app.core.websocket_manager import manager
-    await manager.broadcast_to_space(space_id, {
+    # IMPORTANT: Broadcast the deletion to other users (sync endpoint, so hop onto the event loop)
+    from_thread.run(manager.broadcast_to_space, space_id, {
         "type": "block_deleted",
         "block_id": block_id,
         "deleted_by": current_user.id,
@@ -126,12 +332,8 @@ async def delete_block(
 
 
 @router.post("/space/{space_id}/refresh-order")
-def refresh_block_order(space_id: int, db: SessionDependency, current_user: UserDependency):
-    membership = get_space_membership(space_id, current_user, db)
-    check_permission(membership, Permission.REORDER_BLOCKS)
-
-    blocks = db.query(Block).filter(Block.space_id == space_id).order_by(Block.order).all()
-    for idx, block in enumerate(blocks):
-        block.order = idx
-    db.commit()
+def refresh_block_order(space_id: int, db: SessionDependency, access: SpaceAccessDependency):
+    access.require(Permission.REORDER_BLOCKS)
+
+    rebalance_space_order(db, space_id)
     return {"detail": "Block order refreshed"}
\ No newline at end of file
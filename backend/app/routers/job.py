@@ -0,0 +1,23 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException
+from app.models.user import User
+from app.core.auth import get_current_user
+from app.core.jobs import job_queue
+
+router = APIRouter(tags=["jobs"])
+
+UserDependency = Annotated[User, Depends(get_current_user)]
+
+
+@router.get("/")
+def get_my_jobs(current_user: UserDependency):
+    return [job.to_dict() for job in job_queue.jobs_for(current_user.id)]
+
+
+@router.get("/{job_id}")
+def get_job_status(job_id: str, current_user: UserDependency):
+    job = job_queue.get(job_id)
+    # Someone else's job is reported as missing, not forbidden
+    if job is None or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -1,42 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Annotated, List
 
 from app.models.user import User
 from app.schemas.space import SpaceCreate, SpaceOut, SpaceUpdate
-from app.services.space import create_space, get_space_by_id, get_spaces_by_user, get_user_spaces_with_roles, update_space, delete_space, get_spaces_by_owner
-from app.db.session import get_db
+from app.services.space import create_space, get_space_by_id, get_space_rows_by_user, get_user_spaces_with_roles, update_space, delete_space, start_space_purge, get_spaces_by_owner, get_user_spaces_version, iter_space_export, start_space_import
+from app.db.session import get_db, get_read_db, SessionLocal
 from app.core.auth import get_current_user  # adjust with the auth module
+from app.core.etag import make_etag, is_not_modified, not_modified_response
+from app.core.hot_documents import hot_documents
+from app.core.fast_json import FastJSONResponse
+from app.core.access import SpaceAccessDependency
 
 router = APIRouter(tags=["spaces"])
 SessionDependency = Annotated[Session, Depends(get_db)]
+ReadSessionDependency = Annotated[Session, Depends(get_read_db)]
 UserDependency = Annotated[User, Depends(get_current_user)]
 
+# Uploads are kept in memory up to this size, then spooled to a temporary file
+IMPORT_SPOOL_BYTES = 16 * 1024 * 1024
+# Larger uploads are refused with 413
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 512 * 1024 * 1024))
+# Received chunks are gathered up to this size before each write to the spool file
+IMPORT_WRITE_BYTES = 1024 * 1024
+
 @router.post("/", response_model=SpaceOut)
 def create_new_space(space_in: SpaceCreate, db: SessionDependency, current_user: UserDependency):
     return create_space(db=db, space_in=space_in, owner_id=current_user.id)
     #creator automatically becomes an admin of the space.
     
+def import_too_large():
+    return HTTPException(status_code=413, detail=f"Import is larger than {IMPORT_MAX_BYTES} bytes")
+
+
+@router.post("/import")
+async def import_space_from_ndjson(request: Request, current_user: UserDependency):
+    # Body is a space export (application/x-ndjson); loading happens in a background job.
+    # The body is read on the event loop as it arrives, but written in the threadpool:
+    # past IMPORT_SPOOL_BYTES the writes go to disk.
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > IMPORT_MAX_BYTES:
+        raise import_too_large()
+
+    upload = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    try:
+        received, buffer = 0, bytearray()
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > IMPORT_MAX_BYTES:
+                raise import_too_large()
+            buffer += chunk
+            if len(buffer) >= IMPORT_WRITE_BYTES:
+                await run_in_threadpool(upload.write, buffer)
+                buffer.clear()
+        await run_in_threadpool(upload.write, buffer)
+        await run_in_threadpool(upload.seek, 0)
+    except BaseException:
+        upload.close()
+        raise
+    job = start_space_import(upload, current_user.id)
+    return {"detail": "Import started", "job_id": job.id}
+
+
 @router.get("/my-spaces", response_model=List[SpaceOut])
 def get_my_spaces(db: SessionDependency, current_user: UserDependency):
-    return get_spaces_by_user(db, current_user.id)
+    return FastJSONResponse(get_space_rows_by_user(db, current_user.id))
 
 
 @router.get("/my-spaces-with-roles")
-def get_my_spaces_with_roles(db: SessionDependency, current_user: UserDependency):
+def get_my_spaces_with_roles(request: Request, response: Response, db: ReadSessionDependency, current_user: UserDependency):
+    etag = make_etag("spaces", current_user.id, get_user_spaces_version(db, current_user.id))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    response.headers["ETag"] = etag
     return get_user_spaces_with_roles(db, current_user.id)
 
 
 @router.get("/{space_id}", response_model=SpaceOut)
-def read_space(space_id: int, db: SessionDependency, current_user: UserDependency):
-    space = get_space_by_id(db, space_id)
-    if not space:
-        raise HTTPException(status_code=404, detail="Space not found")
-    
-    if space.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    return space
+def read_space(space_id: int, db: SessionDependency, access: SpaceAccessDependency):
+    access.require_owner()
+    return get_space_by_id(db, space_id)
+
+
+def stream_space_export(space_id: int):
+    # The body is produced after the endpoint returns, so it needs its own session
+    db = SessionLocal()
+    try:
+        yield from iter_space_export(db, space_id)
+    finally:
+        db.close()
+
+
+@router.get("/{space_id}/export")
+def export_space(space_id: int, access: SpaceAccessDependency):
+    access.require_owner()
+
+    hot_documents.checkpoint(space_id)
+    return StreamingResponse(
+        stream_space_export(space_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="space-{space_id}.ndjson"'}
+    )
 
 
 @router.get("/", response_model=list[SpaceOut])
@@ -45,27 +114,19 @@ def read_spaces(db: SessionDependency, current_user: UserDependency):
 
 
 @router.put("/{space_id}", response_model=SpaceOut)
-def update_existing_space(space_id: int, space_in: SpaceUpdate, db: SessionDependency, current_user: UserDependency):
-    db_space = get_space_by_id(db, space_id)
-    if not db_space:
-        raise HTTPException(status_code=404, detail="Space not found")
-
-    if db_space.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
+def update_existing_space(space_id: int, space_in: SpaceUpdate, db: SessionDependency, access: SpaceAccessDependency):
+    access.require_owner()
     return update_space(db, space_id, space_in)
 
 
 @router.delete("/{space_id}")
-def delete_existing_space(space_id: int, db: SessionDependency, current_user: UserDependency):
-    db_space = get_space_by_id(db, space_id)
-    if not db_space:
-        raise HTTPException(status_code=404, detail="Space not found")
-    if db_space.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
+def delete_existing_space(space_id: int, db: SessionDependency, current_user: UserDependency, access: SpaceAccessDependency):
+    access.require_owner()
 
     deleted_space = delete_space(db, space_id)
     if not deleted_space:
         raise HTTPException(status_code=404, detail="Space not found")
-    return {"detail": "Space deleted successfully"}
+    # Blocks are removed in the background; poll /jobs/{job_id} for progress
+    job = start_space_purge(space_id, owner_id=current_user.id)
+    return {"detail": "Space deleted successfully", "job_id": job.id}
 
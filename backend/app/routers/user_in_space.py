@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session, joinedload
 from typing import Annotated, List
@@ -5,58 +6,30 @@ from app.models.user import User
 from app.models.user_in_space import UserRole, UserInSpace
 from app.schemas.user_in_space import UserInSpaceCreate, UserInSpaceOut, UserInSpaceUpdate
 from app.services.user_in_space import (
-    add_user_to_space, get_users_in_space_with_details, remove_user_from_space, 
-    update_user_role as service_update_user_role, check_user_permission
+    add_user_to_space, get_member_rows_in_space, remove_user_from_space, 
+    update_user_role as service_update_user_role
 )
-from app.services.space import get_space_by_id
 from app.services.user import get_user_by_email
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.core.auth import get_current_user
+from app.core.access import SpaceAccessDependency
+from app.core.fast_json import FastJSONResponse
+from app.core.permissions import Permission
 
 router = APIRouter(tags=["user-in-space"])
+logger = logging.getLogger(__name__)
 
 SessionDependency = Annotated[Session, Depends(get_db)]
+ReadSessionDependency = Annotated[Session, Depends(get_read_db)]
 UserDependency = Annotated[User, Depends(get_current_user)]
 
-def check_admin_permission(current_user: User, space_id: int, db: Session):
-    space = get_space_by_id(db, space_id)
-    if not space:
-        raise HTTPException(status_code=404, detail="Space not found")
-    
-    if space.owner_id == current_user.id:
-        return space
-    
-    # Check if user is admin in this space
-    if not check_user_permission(db, current_user.id, space_id, UserRole.ADMIN):
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    return space
-
 @router.get("/space/{space_id}/users", response_model=List[UserInSpaceOut])
-def get_space_members(space_id: int, db: SessionDependency, current_user: UserDependency):
+def get_space_members(space_id: int, db: ReadSessionDependency, access: SpaceAccessDependency):
     # Check if user can view space members
-    if not check_user_permission(db, current_user.id, space_id, UserRole.VISITOR):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Get members with user details loaded
-    members = db.query(UserInSpace).options(
-        joinedload(UserInSpace.user)
-    ).filter(UserInSpace.space_id == space_id).all()
-    
-    # Format response with user details
-    result = []
-    for member in members:
-        result.append(UserInSpaceOut(
-            user_id=member.user_id,
-            space_id=member.space_id,
-            role=member.role,
-            is_creator=member.is_creator,
-            joined_at=member.joined_at,
-            username=member.user.username if member.user else None,
-            email=member.user.email if member.user else None
-        ))
+    access.require(Permission.VIEW_SPACE, "Access denied")
     
-    return result
+    # Members and their user details as plain rows, serialized without building models
+    return FastJSONResponse(get_member_rows_in_space(db, space_id))
 
 @router.put("/space/{space_id}/user/{user_id}/role", response_model=UserInSpaceOut)
 def change_user_role(
@@ -64,12 +37,12 @@ def change_user_role(
     user_id: int, 
     role_update: UserInSpaceUpdate, 
     db: SessionDependency, 
-    current_user: UserDependency
+    access: SpaceAccessDependency
 ):
     # Check admin permissions
-    space = check_admin_permission(current_user, space_id, db)
+    access.require(Permission.MANAGE_MEMBERS, "Admin access required")
     
-    if user_id == current_user.id and current_user.id == space.owner_id:
+    if user_id == access.user.id and access.is_owner:
         if role_update.is_creator is False:
             raise HTTPException(status_code=400, detail="Space creator cannot remove their own creator status")
     
@@ -78,7 +51,7 @@ def change_user_role(
     if not updated_membership:
         raise HTTPException(status_code=404, detail="User not found in space")
     
-    # Reload with user details - FIXED TO USE COMPOSITE KEY
+    # Reload with user details - FIXED TO USE COMPOSITE KEY (the service doesn't refresh, this is the only reload)
     updated_membership = db.query(UserInSpace).options(
         joinedload(UserInSpace.user)
     ).filter(
@@ -101,11 +74,11 @@ def invite_user_to_space(
     space_id: int,
     user_email: str,
     db: SessionDependency,
-    current_user: UserDependency,
+    access: SpaceAccessDependency,
     role: UserRole = UserRole.PARTICIPANT
 ):
     # Check admin permissions
-    check_admin_permission(current_user, space_id, db)
+    access.require(Permission.MANAGE_MEMBERS, "Admin access required")
     
     # Find user by email
     invited_user = get_user_by_email(db, user_email)
@@ -121,20 +94,16 @@ def invite_user_to_space(
     if existing:
         raise HTTPException(status_code=400, detail="User already in space")
     
-    # Add user to space
+    # Add user to space with the requested role
     user_in_space_data = UserInSpaceCreate(
         user_id=invited_user.id,
-        space_id=space_id
+        space_id=space_id,
+        role=role.value
     )
     
-    new_membership = add_user_to_space(db, user_in_space_data)
-    
-    # Set the role
-    if role != UserRole.PARTICIPANT:
-        update_data = UserInSpaceUpdate(role=role)
-        new_membership = service_update_user_role(db, space_id, invited_user.id, update_data)
+    add_user_to_space(db, user_in_space_data)
     
-    # Reload with user details - FIXED TO USE COMPOSITE KEY
+    # Reload with user details - FIXED TO USE COMPOSITE KEY (the service doesn't refresh, this is the only reload)
     new_membership = db.query(UserInSpace).options(
         joinedload(UserInSpace.user)
     ).filter(
@@ -157,44 +126,36 @@ def remove_user_from_space_endpoint(
     space_id: int, 
     user_id: int, 
     db: SessionDependency, 
-    current_user: UserDependency
+    access: SpaceAccessDependency
 ):
-    from app.services.space import delete_space
+    from app.services.space import delete_space, start_space_purge
+    current_user = access.user
     
     try:
-        print(f"REMOVE REQUEST: User {current_user.id} trying to remove user {user_id} from space {space_id}")
-        
-        space = get_space_by_id(db, space_id)
-        if not space:
-            raise HTTPException(status_code=404, detail="Space not found")
-            
-        is_owner = user_id == space.owner_id
+        is_owner = user_id == access.owner_id
         is_self_action = current_user.id == user_id
-        
-        print(f"Space owner: {space.owner_id}, Is user the owner: {is_owner}, Is self action: {is_self_action}")
+        logger.debug("Remove member request", extra={
+            "space_id": space_id, "user_id": user_id, "requested_by": current_user.id,
+            "is_owner": is_owner, "is_self_action": is_self_action,
+        })
         
         # Case 1: User is trying to leave and is the owner
         if is_self_action and is_owner:
-            print(f"Owner {user_id} is leaving space {space_id}, deleting space")
+            logger.info("Owner left, deleting space", extra={"space_id": space_id, "user_id": user_id})
             # Delete the space when the owner leaves
             delete_space(db, space_id)
-            return {"detail": "You have left the space and it has been deleted since you were the owner"}
+            job = start_space_purge(space_id, owner_id=user_id)
+            return {"detail": "You have left the space and it has been deleted since you were the owner", "job_id": job.id}
         
         # Case 2: User is trying to leave and is not the owner
         elif is_self_action:
-            print(f"User {user_id} is leaving space {space_id}")
             remove_user_from_space(db, space_id, user_id)
             return {"detail": "You have left the space successfully"}
         
         # Case 3: Admin is trying to remove someone else
         else:
-            print(f"User {current_user.id} is trying to remove user {user_id} from space {space_id}")
             # Check admin permissions
-            try:
-                space = check_admin_permission(current_user, space_id, db)
-            except Exception as e:
-                print(f"Permission check failed: {str(e)}")
-                raise HTTPException(status_code=403, detail="You don't have permission to remove users from this space")
+            access.require(Permission.MANAGE_MEMBERS, "You don't have permission to remove users from this space")
             
             # Don't allow admins to remove the space owner
             if is_owner:
@@ -203,8 +164,10 @@ def remove_user_from_space_endpoint(
             # Remove the user
             remove_user_from_space(db, space_id, user_id)
             return {"detail": "User removed from space successfully"}
-    except Exception as e:
-        print(f"Error in remove_user_from_space_endpoint: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error removing member", extra={"space_id": space_id, "user_id": user_id})
         raise
 
 
@@ -1,6 +1,9 @@
 from fastapi import WebSocket, APIRouter, WebSocketDisconnect, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.core.websocket_manager import manager
+from app.core.hot_documents import hot_documents
+from app.core import metrics, tracing
 from app.core.auth import get_current_user_websocket
 from app.db.session import get_db
 from app.models.user_in_space import UserInSpace
@@ -8,10 +11,15 @@ from app.core.permissions import has_permission, Permission
 from app.services.block import update_block
 from app.schemas.block import BlockUpdate
 import json
-from datetime import datetime
+import logging
+import time
+from datetime import datetime, timezone
 
 router = APIRouter()
 
+MESSAGE_TYPES = {"block_update", "block_deleted", "cursor_position", "user_typing", "block_selection"}
+logger = logging.getLogger(__name__)
+
 @router.websocket("/ws/space/{space_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
@@ -20,22 +28,20 @@ async def websocket_endpoint(
     db: Session = Depends(get_db)
 ):
     try:
-        # Authenticate user
-        current_user = await get_current_user_websocket(token, db)
+        # Authenticate user and check space membership (DB work, so off the event loop)
+        current_user, membership = await run_in_threadpool(authenticate_member, token, space_id, db)
         if not current_user:
             await websocket.close(code=4001, reason="Authentication failed")
             return
         
-        # Check space membership
-        membership = db.query(UserInSpace).filter(
-            UserInSpace.user_id == current_user.id,
-            UserInSpace.space_id == space_id
-        ).first()
-        
         if not membership:
             await websocket.close(code=4003, reason="Not a member of this space")
             return
         
+        # First connection loads the space into memory in hot-document mode
+        if hot_documents.enabled:
+            await run_in_threadpool(hot_documents.open, db, space_id)
+
         # Connect user to space
         await manager.connect(websocket, space_id, current_user.id, current_user.username)
         
@@ -51,15 +57,39 @@ async def websocket_endpoint(
         # Handle incoming messages
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            await handle_websocket_message(message, websocket, current_user, membership, space_id, db)
+            # One trace per message, started after the receive so idle time isn't counted
+            with tracing.start_trace("ws.message", None, space_id=space_id, user_id=current_user.id) as message_span:
+                with tracing.span("ws.parse", bytes=len(data)):
+                    message = json.loads(data)
+                message_type = message.get("type")
+                # Clients pick the type, so unknown ones share a label
+                label = message_type if message_type in MESSAGE_TYPES else "other"
+                metrics.websocket_messages.inc(label)
+                message_span.set("message.type", label)
+
+                await handle_websocket_message(message, websocket, current_user, membership, space_id, db)
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-    except Exception as e:
-        print(f"WebSocket error: {e}")
-        manager.disconnect(websocket)
+        await leave_space(websocket, space_id)
+    except Exception:
+        logger.exception("WebSocket error", extra={"space_id": space_id})
+        await leave_space(websocket, space_id)
+
+def authenticate_member(token: str, space_id: int, db: Session):
+    current_user = get_current_user_websocket(token, db)
+    if not current_user:
+        return None, None
+    membership = db.query(UserInSpace).filter(
+        UserInSpace.user_id == current_user.id,
+        UserInSpace.space_id == space_id
+    ).first()
+    return current_user, membership
+
+async def leave_space(websocket: WebSocket, space_id: int):
+    manager.disconnect(websocket)
+    # Last user gone: write the hot document back now rather than at the next checkpoint
+    if hot_documents.enabled and space_id not in manager.active_connections:
+        await run_in_threadpool(hot_documents.release, space_id)
 
 async def handle_websocket_message(message: dict, websocket: WebSocket, current_user, membership, space_id: int, db: Session):
     message_type = message.get("type")
@@ -86,16 +116,36 @@ async def handle_block_update(message: dict, websocket: WebSocket, current_user,
         if not block_id or new_content is None:
             return
         
-        if not has_permission(membership.role, Permission.EDIT_BLOCKS, membership.is_creator):
+        with tracing.span("has_permission"):
+            allowed = has_permission(membership.role, Permission.EDIT_BLOCKS, membership.is_creator)
+        if not allowed:
             await manager.send_personal_message({
                 "type": "error",
                 "message": "Insufficient permissions to edit blocks"
             }, websocket)
             return
         
-        # Update block in database
-        block_update = BlockUpdate(content=new_content)
-        updated_block = update_block(db, block_id, block_update)
+        if hot_documents.enabled and hot_documents.get(space_id):
+            # Applied in memory, written back by the next checkpoint
+            with tracing.span("hot_documents.apply_edit"):
+                updated_block = hot_documents.apply_edit(space_id, block_id, new_content, datetime.now(timezone.utc), current_user.id)
+            if not updated_block:
+                await manager.send_personal_message({
+                    "type": "error",
+                    "message": "Block not found"
+                }, websocket)
+                return
+        else:
+            # Update block in database
+            block_update = BlockUpdate(content=new_content)
+            updated_block = await run_in_threadpool(update_block, db, block_id, block_update, author_id=current_user.id)
+            if updated_block:
+                # No response to set the cookie on: the client sends this back as X-Last-Write
+                await manager.send_personal_message({
+                    "type": "block_saved",
+                    "block_id": block_id,
+                    "last_write": f"{time.time():.3f}"
+                }, websocket)
         
         if updated_block:
             # Broadcast to all users in space (except sender)
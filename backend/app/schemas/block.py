@@ -1,7 +1,7 @@
 import enum
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 from enum import Enum
 
 
@@ -21,7 +21,10 @@ class BlockCreate(BlockBase):
 class BlockUpdate(BaseModel):
     content: Optional[str] = None
     type: Optional[BlockType] = None
-    order: Optional[int] = None
+
+class BlockMove(BaseModel):
+    after_id: Optional[int] = None
+    before_id: Optional[int] = None
     
 class BlockOut(BlockBase):
     id: int 
@@ -29,6 +32,67 @@ class BlockOut(BlockBase):
     space_id: int
     created_at: datetime
     updated_at: datetime
-    order: int  # Add this - your database has it!
+    order: str  # fractional order key, compare as plain strings
+
+    model_config = {"from_attributes": True}
+
+
+class BlockOperation(BaseModel):
+    op: Literal["create", "update", "move", "delete"]
+    block_id: Optional[int] = None  # update, move and delete
+    content: Optional[str] = None  # create and update
+    type: Optional[BlockType] = None  # create and update
+    after_id: Optional[int] = None  # move, same meaning as BlockMove
+    before_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_required_fields(self):
+        if self.op == "create" and self.content is None:
+            raise ValueError("content is required for create")
+        if self.op != "create" and self.block_id is None:
+            raise ValueError(f"block_id is required for {self.op}")
+        return self
+
+class BlockBatch(BaseModel):
+    operations: List[BlockOperation]
+
+class BlockOrderOut(BaseModel):
+    id: int
+    order: str
+
+class BlockChangeOut(BaseModel):
+    id: int
+    content: Optional[str] = None
+    type: Optional[BlockType] = None
+
+class BlockBatchResult(BaseModel):
+    created: List[BlockOut] = []
+    updated: List[BlockChangeOut] = []
+    moved: List[BlockOrderOut] = []
+    deleted: List[int] = []
+
+class BlockPage(BaseModel):
+    items: List[BlockOut]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page, None on the last
+
+class BlockSearchHit(BlockOut):
+    rank: float
+    highlight: str  # content excerpt with matches wrapped in <mark></mark>
+
+class BlockSearchPage(BaseModel):
+    items: List[BlockSearchHit]
+    next_offset: Optional[int] = None  # pass back as ?offset= for the next page, None on the last
+
+class BlockRevisionOut(BaseModel):
+    revision: int
+    is_snapshot: bool
+    content_length: int
+    stored_bytes: int  # compressed size of the snapshot or delta
+    author_id: Optional[int] = None
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
 
-    model_config = {"from_attributes": True}
\ No newline at end of file
+class BlockRevisionContent(BaseModel):
+    revision: int
+    content: str
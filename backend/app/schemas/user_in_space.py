@@ -11,6 +11,7 @@ class UserRole(str, Enum):
 class UserInSpaceCreate(BaseModel):
     user_id: int
     space_id: int
+    role: UserRole = UserRole.PARTICIPANT
 
 class UserInSpaceUpdate(BaseModel):
     role: Optional[UserRole] = None
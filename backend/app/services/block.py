@@ -1,61 +1,567 @@
-from sqlalchemy import func
+import csv
+import io
+from sqlalchemy import and_, cast, func, insert, literal, or_, update, delete, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
-from app.models.block import Block
-from app.schemas.block import BlockCreate, BlockUpdate
-from app.core.permissions import has_permission, Permission
+from app.models.block import Block, BlockType, BLOCK_ROW_COLUMNS, SEARCH_CONFIG
+from app.models.user import User
+from app.models.user_in_space import UserInSpace
+from app.models.space import Space
+from app.schemas.block import BlockCreate, BlockUpdate, BlockMove, BlockOperation, BlockOut
+from app.core.permissions import has_permission, Permission, roles_with_permission
+from app.core.ordering import key_after, key_between, spread_keys, needs_rebalance, jitter, with_jitter
+from app.core.block_cache import block_cache
+from app.core.hot_documents import hot_documents, block_row
+from app.core.revisions import prepare_revisions
+from app.models.block_revision import BlockRevision
 from fastapi import HTTPException
-from typing import List
+from typing import List, Optional
+from app.core.tracing import traced
 
 
+# Unique (space_id, order). Two writers that pick the same key at the same time (two
+# appends reading the same last key, two moves into one gap) are told apart by it: the
+# second waits for the first to commit and then gets a unique violation. It is checked
+# row by row, so writes that hand keys on between rows go through SCRATCH_PREFIX.
+ORDER_CONSTRAINT = "uq_blocks_space_id_order"
+ORDER_KEY_ATTEMPTS = 3
+# Not a base62 digit, so "~" + an existing key is unique and never a real key
+SCRATCH_PREFIX = "~"
+
+
+def _retry_on_order_collision(db: Session, error: IntegrityError, attempt: int):
+    # Roll back a write whose order key a concurrent write took first, so the caller can
+    # pick another key; anything else, or the last attempt, is re-raised
+    db.rollback()
+    diag = getattr(error.orig, "diag", None)
+    if attempt + 1 == ORDER_KEY_ATTEMPTS or getattr(diag, "constraint_name", None) != ORDER_CONSTRAINT:
+        raise error
+
+
+def _written(space_id: int, upserts=(), deletes=()):
+    # Bring the in-process copies of the space in line with a committed write
+    block_cache.invalidate(space_id)
+    hot_documents.patch(space_id, upserts, deletes)
+
+
+def get_last_order_key(db: Session, space_id: int, exclude_block_id: Optional[int] = None):
+    query = db.query(Block.order).filter(Block.space_id == space_id)
+    if exclude_block_id is not None:
+        query = query.filter(Block.id != exclude_block_id)
+    return query.order_by(Block.order.desc()).limit(1).scalar()
+
+
+@traced()
 def create_block(db: Session, block_in: BlockCreate, owner_id: int, space_id: int):
-    max_order = db.query(func.max(Block.order)).filter(Block.space_id == space_id).scalar()
-    next_order = (max_order or 0) + 1
-    
-    db_block = Block(
-        space_id=space_id,
-        type=block_in.type,
-        content=block_in.content,
-        order=next_order,
-        owner_id=owner_id,
-        created_at=datetime.now(timezone.utc),
-        updated_at=datetime.now(timezone.utc)
-    )
-    db.add(db_block)
-    db.commit()
+    for attempt in range(ORDER_KEY_ATTEMPTS):
+        key = key_after(get_last_order_key(db, space_id))
+        db_block = Block(
+            space_id=space_id,
+            type=block_in.type,
+            content=block_in.content,
+            order=with_jitter(key) if attempt else key,
+            owner_id=owner_id,
+            created_at=datetime.now(timezone.utc),
+            updated_at=datetime.now(timezone.utc)
+        )
+        db.add(db_block)
+        try:
+            db.commit()
+            break
+        except IntegrityError as error:
+            _retry_on_order_collision(db, error, attempt)
     db.refresh(db_block)
+    _written(space_id, upserts=[block_row(db_block)])
     return db_block
 
 
+@traced()
+def create_block_for_member(db: Session, block_in: BlockCreate, user_id: int):
+    """Append a block in one INSERT ... SELECT ... RETURNING round trip.
+
+    The SELECT only yields a row when the space exists and user_id is a member whose
+    role may create blocks; the order key is computed in SQL by block_order_after().
+    If a concurrent append took that key, the insert is retried with random digits
+    after it. Returns the inserted row as a dict, or None when nothing was inserted (the caller
+    works out which check failed).
+    """
+    blocks = Block.__table__
+    memberships = UserInSpace.__table__
+    spaces = Space.__table__
+
+    last_key = (
+        select(blocks.c.order).where(blocks.c.space_id == block_in.space_id)
+        .order_by(blocks.c.order.desc()).limit(1).scalar_subquery()
+    )
+    columns = ["space_id", "type", "content", "order", "owner_id", "created_at", "updated_at"]
+    for attempt in range(ORDER_KEY_ATTEMPTS):
+        key = func.block_order_after(last_key)
+        source = (
+            select(
+                literal(block_in.space_id),
+                cast(literal(block_in.type.value), blocks.c.type.type),
+                literal(block_in.content),
+                key.concat(jitter()) if attempt else key,
+                literal(user_id),
+                func.now(),
+                func.now(),
+            )
+            .select_from(memberships.join(spaces, spaces.c.id == memberships.c.space_id))
+            .where(
+                memberships.c.user_id == user_id,
+                memberships.c.space_id == block_in.space_id,
+                memberships.c.role.in_(roles_with_permission(Permission.CREATE_BLOCKS)),
+            )
+        )
+        try:
+            row = db.execute(insert(blocks).from_select(columns, source).returning(*BLOCK_ROW_COLUMNS)).mappings().first()
+            break
+        except IntegrityError as error:
+            _retry_on_order_collision(db, error, attempt)
+    if row is None:
+        db.rollback()
+        return None
+
+    db.commit()
+    row = dict(row)
+    _written(block_in.space_id, upserts=[row])
+    return row
+
+
 def get_block_by_id(db: Session, block_id: int):
     return db.query(Block).filter(Block.id == block_id).first()
 
 
+@traced()
 def get_blocks_in_space(db: Session, space_id: int):
-    return db.query(Block).filter(Block.space_id == space_id).order_by(Block.order).all()
+    return db.query(Block).filter(Block.space_id == space_id).order_by(Block.order, Block.id).all()
 
 
-def update_block(db: Session, block_id: int, block_in: BlockUpdate):
-    db_block = get_block_by_id(db, block_id)
-    if not db_block:
-        raise HTTPException(status_code=404, detail="Block not found")
+# Columns of BlockOut, for endpoints that serialize rows without building models. In
+# BlockOut's field order, so the JSON is byte for byte what the model would give.
+BLOCK_OUT_COLUMNS = [Block.content, Block.type, Block.id, Block.owner_id, Block.space_id,
+                     Block.created_at, Block.updated_at, Block.order]
+
+
+def block_out_row(row) -> dict:
+    return {column.key: row[column.key] for column in BLOCK_OUT_COLUMNS}
+
+
+@traced()
+def get_block_rows_in_space(db: Session, space_id: int):
+    """get_blocks_in_space as plain dicts of the BlockOut columns, no ORM objects."""
+    return [dict(row) for row in db.execute(
+        select(*BLOCK_OUT_COLUMNS).where(Block.space_id == space_id).order_by(Block.order, Block.id)
+    ).mappings()]
+
+
+def iter_block_batches(db: Session, space_id: int, batch_size: int = 1000):
+    """Yield a space's blocks in order, batch_size rows at a time.
+
+    Plain rows (no ORM objects) over a server-side cursor, so memory stays bounded
+    by one batch however large the space is.
+    """
+    result = db.execute(
+        select(*BLOCK_OUT_COLUMNS).where(Block.space_id == space_id).order_by(Block.order, Block.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for batch in result.partitions():
+        yield batch
+
+
+def iter_block_export_batches(db: Session, space_id: int, batch_size: int = 5000):
+    """Like iter_block_batches, with the owner's email instead of the environment specific id."""
+    result = db.execute(
+        select(Block.type, Block.content, Block.order, User.email.label("owner_email"),
+               Block.created_at, Block.updated_at)
+        .join(User, User.id == Block.owner_id)
+        .where(Block.space_id == space_id).order_by(Block.order, Block.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for batch in result.partitions():
+        yield batch
+
+
+COPY_COLUMNS = ["space_id", "type", "content", "order", "owner_id", "created_at", "updated_at"]
+
+
+def copy_blocks(db: Session, rows: List[tuple]):
+    """Bulk load rows (values in COPY_COLUMNS order) with COPY, inside the session's transaction.
+
+    Several times faster than INSERT for large imports: one round trip, no per-row
+    statement. Nothing else is updated, callers invalidate caches themselves.
+    """
+    buffer = io.StringIO()
+    # Quoted so an empty string stays an empty string rather than NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buffer.seek(0)
+    columns = ", ".join(f'"{column}"' for column in COPY_COLUMNS)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY blocks ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+@traced()
+def get_space_block_version(db: Session, space_id: int, user_id: int):
+    """Caller's membership plus the version of the space's block list, in one query.
+
+    Returns None when the user is not a member. Every block write bumps updated_at or
+    changes the count, so (block_count, last_updated) identifies the list's contents.
+    """
+    block_count = select(func.count(Block.id)).where(Block.space_id == space_id).scalar_subquery()
+    last_updated = select(func.max(Block.updated_at)).where(Block.space_id == space_id).scalar_subquery()
+    return db.query(
+        UserInSpace.role, UserInSpace.is_creator,
+        block_count.label("block_count"), last_updated.label("last_updated")
+    ).filter(UserInSpace.user_id == user_id, UserInSpace.space_id == space_id).first()
+
+
+@traced()
+def get_blocks_page(db: Session, space_id: int, limit: int, after: Optional[tuple] = None,
+                    start: Optional[str] = None, end: Optional[str] = None):
+    """Keyset page of a space's blocks in (order, id) order.
+
+    after is the (order, id) of the last block of the previous page; start/end restrict
+    the page to order keys in [start, end). Fetches one extra row to tell whether more
+    pages follow; returns (blocks, has_more).
+    """
+    query = db.query(Block).filter(Block.space_id == space_id)
+    if after is not None:
+        query = query.filter(tuple_(Block.order, Block.id) > tuple_(*after))
+    if start is not None:
+        query = query.filter(Block.order >= start)
+    if end is not None:
+        query = query.filter(Block.order < end)
+
+    blocks = query.order_by(Block.order, Block.id).limit(limit + 1).all()
+    return blocks[:limit], len(blocks) > limit
+
+
+# Matched words are wrapped in these; content is not HTML escaped, render it as text
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+# Matches ranked per search. Ranking reads every match's tsvector, so a word found in
+# most blocks would otherwise cost a pass over all of them; past this many matches the
+# results are the best of the newest ones. Taking the newest means walking blocks by id
+# until this many match, which for a word in 1 of 40 blocks is 80,000 rows. Kept just
+# above the deepest page the endpoint serves (offset 1000 + limit 100).
+SEARCH_CANDIDATES = 2000
 
+
+@traced()
+def search_blocks(db: Session, user_id: int, query: str, limit: int, offset: int = 0):
+    """Full-text search over the blocks of every space the user can view.
+
+    Matches come from the GIN index on search_vector. Only the newest SEARCH_CANDIDATES
+    of them (by id) are ranked with ts_rank_cd, so an older block that would rank higher
+    is left out once a term has more matches than that. Highlights are only built for
+    the rows of the requested page. Returns (rows, has_more). Edits still held by a hot
+    document show up after its next checkpoint.
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    candidates = (
+        select(Block.id, Block.search_vector)
+        .join(UserInSpace, and_(UserInSpace.space_id == Block.space_id, UserInSpace.user_id == user_id))
+        .where(
+            Block.search_vector.op("@@")(tsquery),
+            or_(UserInSpace.role.in_(roles_with_permission(Permission.VIEW_BLOCKS)), UserInSpace.is_creator),
+        )
+        .order_by(Block.id.desc())
+        .limit(SEARCH_CANDIDATES)
+        .subquery()
+    )
+    rank = func.ts_rank_cd(candidates.c.search_vector, tsquery).label("rank")
+    matches = (
+        select(candidates.c.id, rank)
+        .order_by(rank.desc(), candidates.c.id)
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery()
+    )
+    statement = (
+        select(*BLOCK_ROW_COLUMNS, matches.c.rank,
+               func.ts_headline(SEARCH_CONFIG, Block.content, tsquery, HEADLINE_OPTIONS).label("highlight"))
+        .join(matches, matches.c.id == Block.id)
+        .order_by(matches.c.rank.desc(), Block.id)
+    )
+    rows = db.execute(statement).mappings().all()
+    return rows[:limit], len(rows) > limit
+
+
+@traced()
+def apply_block_update(db: Session, db_block: Block, block_in: BlockUpdate, author_id: Optional[int] = None):
+    """Update an already loaded block without fetching it again.
+
+    The result is taken from the flushed object before COMMIT expires it, so there is
+    no refresh SELECT afterwards. A content change is recorded in block_revisions.
+    """
+    now = datetime.now(timezone.utc)
+    revisions = []
     if block_in.type is not None:
         db_block.type = block_in.type
     if block_in.content is not None:
+        numbers, revisions = prepare_revisions(db, {db_block.id: block_in.content}, {db_block.id: author_id}, now)
         db_block.content = block_in.content
+        db_block.revision = numbers.get(db_block.id, db_block.revision)
         
-    db_block.updated_at = datetime.now(timezone.utc)
+    db_block.updated_at = now
+    db.flush()
+    if revisions:
+        db.execute(insert(BlockRevision), revisions)
+    row = block_row(db_block)
     db.commit()
-    db.refresh(db_block)
-    return db_block
+    _written(row["space_id"], upserts=[row])
+    return BlockOut.model_validate(row)
+
+
+@traced()
+def update_block(db: Session, block_id: int, block_in: BlockUpdate, author_id: Optional[int] = None):
+    db_block = get_block_by_id(db, block_id)
+    if not db_block:
+        raise HTTPException(status_code=404, detail="Block not found")
+    return apply_block_update(db, db_block, block_in, author_id)
 
 
+@traced()
 def delete_block(db: Session, block_id: int):
     db_block = db.query(Block).filter(Block.id == block_id).first()
     if not db_block:
         return None
 
+    space_id = db_block.space_id
     db.delete(db_block)
     db.commit()
-    return db_block
\ No newline at end of file
+    _written(space_id, deletes=[block_id])
+    return db_block
+
+
+def _get_order_key(db: Session, space_id: int, block_id: int):
+    key = db.query(Block.order).filter(Block.id == block_id, Block.space_id == space_id).scalar()
+    if key is None:
+        raise HTTPException(status_code=404, detail=f"Block {block_id} not found in this space")
+    return key
+
+
+def _get_neighbour_key(db: Session, space_id: int, key: str, exclude_block_id: int, before: bool):
+    query = db.query(Block.order).filter(Block.space_id == space_id, Block.id != exclude_block_id)
+    if before:
+        query = query.filter(Block.order < key).order_by(Block.order.desc())
+    else:
+        query = query.filter(Block.order > key).order_by(Block.order)
+    return query.limit(1).scalar()
+
+
+@traced()
+def move_block(db: Session, db_block: Block, move: BlockMove):
+    """Give db_block a key between its new neighbours. Only this block's row is written.
+
+    With after_id the block goes right after that block, with before_id right before it,
+    with both between the two, and with neither at the end of the space. If a concurrent
+    move took the same key, the neighbours are read again and another key is picked.
+    """
+    space_id, block_id = db_block.space_id, db_block.id
+    for attempt in range(ORDER_KEY_ATTEMPTS):
+        if move.after_id is not None:
+            after_key = _get_order_key(db, space_id, move.after_id)
+            if move.before_id is not None:
+                before_key = _get_order_key(db, space_id, move.before_id)
+            else:
+                before_key = _get_neighbour_key(db, space_id, after_key, block_id, before=False)
+        elif move.before_id is not None:
+            before_key = _get_order_key(db, space_id, move.before_id)
+            after_key = _get_neighbour_key(db, space_id, before_key, block_id, before=True)
+        else:
+            after_key, before_key = get_last_order_key(db, space_id, exclude_block_id=block_id), None
+
+        try:
+            db_block.order = key_between(after_key, before_key)
+        except ValueError:
+            # before_id doesn't come after after_id (e.g. another move got in between)
+            raise HTTPException(status_code=409, detail="Block order is inconsistent, refresh the order and retry")
+
+        db_block.updated_at = datetime.now(timezone.utc)
+        try:
+            db.flush()
+            break
+        except IntegrityError as error:
+            _retry_on_order_collision(db, error, attempt)
+    row = block_row(db_block)
+    db.commit()
+    _written(space_id, upserts=[{"id": row["id"], "order": row["order"], "updated_at": row["updated_at"]}])
+    return BlockOut.model_validate(row)
+
+
+@traced()
+def rebalance_space_order(db: Session, space_id: int):
+    """Renumber the order keys of a space as consecutive integers, keeping the current order.
+
+    Every row's updated_at moves too, so the space's version (and ETag) changes and
+    clients holding the old keys fetch the list again.
+    """
+    now = datetime.now(timezone.utc)
+    rows = db.query(Block.id).filter(Block.space_id == space_id).order_by(Block.order, Block.id).with_for_update().all()
+    changes = [{"id": row.id, "order": key, "updated_at": now} for row, key in zip(rows, spread_keys(len(rows)))]
+    if changes:
+        # A new key can still belong to a row later in the list, so every key is moved
+        # out of the way first
+        db.execute(update(Block).where(Block.space_id == space_id)
+                   .values(order=SCRATCH_PREFIX + Block.order).execution_options(synchronize_session=False))
+        db.execute(update(Block), changes)
+    db.commit()
+    _written(space_id, upserts=changes)
+    return len(rows)
+
+
+@traced()
+def apply_block_batch(db: Session, space_id: int, owner_id: int, operations: List[BlockOperation]):
+    """Apply a list of block operations to one space in a single transaction.
+
+    Operations are validated and ordered in memory first, then written with one bulk
+    INSERT, one bulk UPDATE and one DELETE. Nothing is written if any operation is invalid.
+    Returns the batch result and whether the space's order keys need a rebalance.
+    A batch that collides with a concurrent write's order keys is replayed from scratch.
+    """
+    for attempt in range(ORDER_KEY_ATTEMPTS):
+        try:
+            return _write_block_batch(db, space_id, owner_id, operations, jitter_appends=attempt > 0)
+        except IntegrityError as error:
+            _retry_on_order_collision(db, error, attempt)
+
+
+def _write_block_batch(db: Session, space_id: int, owner_id: int, operations: List[BlockOperation],
+                       jitter_appends: bool):
+    now = datetime.now(timezone.utc)
+
+    referenced = set()
+    for operation in operations:
+        if operation.op == "create":
+            continue
+        # BlockOperation makes sure block_id is set
+        referenced.update({operation.block_id, operation.after_id, operation.before_id})
+    referenced.discard(None)
+
+    if referenced:
+        found = {row.id for row in db.query(Block.id).filter(Block.space_id == space_id, Block.id.in_(referenced))}
+        missing = referenced - found
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Blocks not found in this space: {sorted(missing)}")
+
+    # Moves need the neighbours' keys, so the space's ordering is loaded once (keys and ids
+    # only) and every create/move/delete is replayed on it. Without moves, creates just
+    # chain from the current last key.
+    keys, ids = None, None
+    last_key = None
+    if any(operation.op == "move" for operation in operations):
+        rows = db.query(Block.order, Block.id).filter(Block.space_id == space_id).order_by(Block.order, Block.id).all()
+        keys, ids = [row.order for row in rows], [row.id for row in rows]
+    elif any(operation.op == "create" for operation in operations):
+        last_key = get_last_order_key(db, space_id)
+
+    new_blocks, changes, moved, deleted = [], {}, {}, set()
+    try:
+        for operation in operations:
+            if operation.op == "create":
+                key = key_after(keys[-1] if keys else None) if keys is not None else key_after(last_key)
+                if jitter_appends:
+                    key = with_jitter(key)
+                if keys is not None:
+                    keys.append(key)
+                    ids.append(None)
+                else:
+                    last_key = key
+                new_blocks.append({
+                    "space_id": space_id,
+                    "type": operation.type or BlockType.TEXT,
+                    "content": operation.content,
+                    "order": key,
+                    "owner_id": owner_id,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+
+            elif operation.op == "update":
+                change = changes.setdefault(operation.block_id, {"id": operation.block_id})
+                if operation.type is not None:
+                    change["type"] = operation.type
+                if operation.content is not None:
+                    change["content"] = operation.content
+
+            elif operation.op == "move":
+                index = ids.index(operation.block_id)
+                del keys[index], ids[index]
+                if operation.after_id is not None:
+                    position = ids.index(operation.after_id) + 1
+                    after_key = keys[position - 1]
+                    if operation.before_id is not None:
+                        before_key = keys[ids.index(operation.before_id)]
+                    else:
+                        before_key = keys[position] if position < len(keys) else None
+                elif operation.before_id is not None:
+                    position = ids.index(operation.before_id)
+                    after_key = keys[position - 1] if position > 0 else None
+                    before_key = keys[position]
+                else:
+                    position = len(keys)
+                    after_key, before_key = (keys[-1] if keys else None), None
+                key = key_between(after_key, before_key)
+                keys.insert(position, key)
+                ids.insert(position, operation.block_id)
+                moved[operation.block_id] = key
+
+            elif operation.op == "delete":
+                deleted.add(operation.block_id)
+                if ids is not None:
+                    index = ids.index(operation.block_id)
+                    del keys[index], ids[index]
+    except ValueError:
+        # ids.index() on a block deleted earlier in the batch, or before_id not after after_id
+        raise HTTPException(status_code=409, detail="Batch refers to deleted blocks or inconsistent block order")
+
+    updates = {}
+    for block_id, change in changes.items():
+        if block_id not in deleted and len(change) > 1:
+            updates[block_id] = dict(change)
+    for block_id, key in moved.items():
+        if block_id not in deleted:
+            updates.setdefault(block_id, {"id": block_id})["order"] = key
+    for values in updates.values():
+        values["updated_at"] = now
+
+    revisions = []
+    contents = {block_id: values["content"] for block_id, values in updates.items() if "content" in values}
+    if contents:
+        numbers, revisions = prepare_revisions(db, contents, dict.fromkeys(contents, owner_id), now)
+        for block_id, number in numbers.items():
+            updates[block_id]["revision"] = number
+
+    created = []
+    # Within the batch a key may pass from a moved or deleted block to another one: deleted
+    # rows go first and moved rows give up their old keys before any new key is written
+    if deleted:
+        db.execute(delete(Block).where(Block.id.in_(deleted)).execution_options(synchronize_session=False))
+    if moved.keys() - deleted:
+        db.execute(update(Block).where(Block.id.in_(moved.keys() - deleted))
+                   .values(order=SCRATCH_PREFIX + Block.order).execution_options(synchronize_session=False))
+    if updates:
+        db.execute(update(Block), list(updates.values()))
+    if new_blocks:
+        created = [BlockOut.model_validate(block)
+                   for block in db.scalars(insert(Block).returning(Block), new_blocks).all()]
+    if revisions:
+        db.execute(insert(BlockRevision), revisions)
+    db.commit()
+    _written(space_id,
+             upserts=[block.model_dump() for block in created] + list(updates.values()),
+             deletes=deleted)
+
+    result = {
+        "created": created,
+        "updated": [change for block_id, change in changes.items() if block_id not in deleted and len(change) > 1],
+        "moved": [{"id": block_id, "order": key} for block_id, key in moved.items() if block_id not in deleted],
+        "deleted": sorted(deleted),
+    }
+    new_keys = [block.order for block in created] + list(moved.values())
+    return result, any(needs_rebalance(key) for key in new_keys)
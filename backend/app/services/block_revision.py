@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from app.models.block import Block
+from app.models.block_revision import BlockRevision
+from app.schemas.block import BlockUpdate
+from app.services.block import apply_block_update
+from app.core.revisions import RETENTION_DAYS, make_snapshot, rebuild
+from app.core.jobs import job_queue
+from app.db.session import SessionLocal
+from app.core.tracing import traced
+
+# Blocks handled per transaction by compaction
+COMPACTION_BATCH_SIZE = 500
+
+
+@traced()
+def get_block_revisions(db: Session, block_id: int, limit: int, before: Optional[int] = None):
+    """Newest first; before is the revision number the previous page ended at."""
+    query = db.query(
+        BlockRevision.revision, BlockRevision.is_snapshot, BlockRevision.content_length,
+        func.length(BlockRevision.data).label("stored_bytes"),
+        BlockRevision.author_id, BlockRevision.created_at
+    ).filter(BlockRevision.block_id == block_id)
+    if before is not None:
+        query = query.filter(BlockRevision.revision < before)
+    return query.order_by(BlockRevision.revision.desc()).limit(limit).all()
+
+
+@traced()
+def get_block_content_at(db: Session, db_block: Block, revision: int) -> Optional[str]:
+    """Content of the block as of revision, or None if that revision isn't kept.
+
+    Loads the closest snapshot at or below revision and the deltas after it.
+    """
+    if revision == db_block.revision:
+        return db_block.content
+
+    base = db.query(func.max(BlockRevision.revision)).filter(
+        BlockRevision.block_id == db_block.id,
+        BlockRevision.revision <= revision,
+        BlockRevision.is_snapshot,
+    ).scalar()
+    if base is None:
+        return None
+
+    rows = db.query(BlockRevision.revision, BlockRevision.is_snapshot, BlockRevision.data).filter(
+        BlockRevision.block_id == db_block.id,
+        BlockRevision.revision.between(base, revision),
+    ).order_by(BlockRevision.revision).all()
+    if rows[-1].revision != revision:
+        return None
+    return rebuild(rows)
+
+
+@traced()
+def restore_block_revision(db: Session, db_block: Block, revision: int, author_id: int):
+    """Make an old version current again. History is kept: the restore is a new revision."""
+    content = get_block_content_at(db, db_block, revision)
+    if content is None:
+        return None
+    return apply_block_update(db, db_block, BlockUpdate(content=content), author_id)
+
+
+def compact_block_revisions(db: Session, retention_days: int = RETENTION_DAYS, job=None):
+    """Fold revisions older than the retention window into one snapshot per block.
+
+    For each block the newest expired revision becomes a full snapshot and everything
+    before it is deleted, so every version inside the window can still be rebuilt.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    # Blocks with more than one expired revision, i.e. something to fold
+    candidates = select(BlockRevision.block_id).where(BlockRevision.created_at < cutoff) \
+        .group_by(BlockRevision.block_id).having(func.count() > 1)
+    block_ids = list(db.scalars(candidates))
+    db.commit()
+
+    removed = 0
+    for start in range(0, len(block_ids), COMPACTION_BATCH_SIZE):
+        for block_id in block_ids[start:start + COMPACTION_BATCH_SIZE]:
+            keep = db.query(func.max(BlockRevision.revision)).filter(
+                BlockRevision.block_id == block_id, BlockRevision.created_at < cutoff
+            ).scalar()
+            rows = db.query(BlockRevision.revision, BlockRevision.is_snapshot, BlockRevision.data).filter(
+                BlockRevision.block_id == block_id, BlockRevision.revision <= keep
+            ).order_by(BlockRevision.revision).all()
+            snapshots = [i for i, row in enumerate(rows) if row.is_snapshot]
+            if not snapshots:
+                continue
+            content = rebuild(rows[snapshots[-1]:])
+            db.execute(
+                update(BlockRevision)
+                .where(BlockRevision.block_id == block_id, BlockRevision.revision == keep)
+                .values(is_snapshot=True, data=make_snapshot(content))
+            )
+            removed += db.execute(
+                delete(BlockRevision).where(BlockRevision.block_id == block_id, BlockRevision.revision < keep)
+            ).rowcount
+        db.commit()
+        if job:
+            job.progress = {"blocks": min(start + COMPACTION_BATCH_SIZE, len(block_ids)),
+                            "of": len(block_ids), "revisions_removed": removed}
+    return {"blocks_compacted": len(block_ids), "revisions_removed": removed}
+
+
+def _compact_revisions_job(job):
+    db = SessionLocal()
+    try:
+        return compact_block_revisions(db, job=job)
+    finally:
+        db.close()
+
+
+def start_revision_compaction():
+    return job_queue.submit("revision_compaction", _compact_revisions_job)
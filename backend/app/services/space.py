@@ -1,11 +1,33 @@
+import json
+import logging
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Session
 from app.models.space import Space
+from app.models.block import Block, BlockType
+from app.models.user import User
 from app.schemas.space import SpaceCreate, SpaceUpdate
 from datetime import datetime, timezone
 from app.models.user_in_space import UserInSpace, UserRole
-from typing import List, Dict, Any
+from app.db.session import SessionLocal
+from app.core.block_cache import block_cache
+from app.core.hot_documents import hot_documents
+from app.core.jobs import job_queue
+from app.core.ordering import key_after
+from app.services.block import iter_block_export_batches, copy_blocks
+from typing import IO, Iterable, Iterator, List, Dict, Any, Optional
+from app.core.tracing import traced
 
+logger = logging.getLogger(__name__)
 
+PURGE_BATCH_SIZE = 5000
+# Blocks per COPY (and per transaction) when importing
+IMPORT_BATCH_SIZE = 5000
+# Version of the NDJSON export format, written in the first line
+EXPORT_FORMAT = 1
+
+
+@traced()
 def create_space(db: Session, space_in: SpaceCreate, owner_id: int):
     db_space = Space(
         name=space_in.name,
@@ -31,20 +53,31 @@ def create_space(db: Session, space_in: SpaceCreate, owner_id: int):
 
 
 def get_space_by_id(db: Session, space_id: int):
-   return db.query(Space).filter(Space.id == space_id).first()
+   return db.query(Space).filter(Space.id == space_id, Space.deleted_at.is_(None)).first()
 
 
 def get_spaces_by_owner(db: Session, owner_id: int):
-    return db.query(Space).filter(Space.owner_id == owner_id).all()
+    return db.query(Space).filter(Space.owner_id == owner_id, Space.deleted_at.is_(None)).all()
 
 
+@traced()
 def get_spaces_by_user(db:Session, user_id:int):
-    spaces = db.query(Space).join(UserInSpace).filter(UserInSpace.user_id == user_id).all()
+    spaces = db.query(Space).join(UserInSpace).filter(UserInSpace.user_id == user_id, Space.deleted_at.is_(None)).all()
     return spaces
 
 
+@traced()
+def get_space_rows_by_user(db: Session, user_id: int):
+    """get_spaces_by_user as plain dicts of the SpaceOut columns."""
+    return [dict(row) for row in db.execute(
+        select(Space.id, Space.name, Space.owner_id, Space.created_at, Space.updated_at)
+        .join(UserInSpace).where(UserInSpace.user_id == user_id, Space.deleted_at.is_(None))
+    ).mappings()]
+
+
+@traced()
 def update_space(db: Session, space_id: int, space_in: SpaceUpdate):
-    db_space = db.query(Space).filter(Space.id == space_id).first()
+    db_space = db.query(Space).filter(Space.id == space_id, Space.deleted_at.is_(None)).first()
     if not db_space:
         return None
     
@@ -59,8 +92,9 @@ def update_space(db: Session, space_id: int, space_in: SpaceUpdate):
     return db_space
 
 
+@traced()
 def delete_space(db: Session, space_id: int):
-    """Delete a space and all related records.
+    """Delete a space: mark it deleted and cut access now, purge its blocks later.
     
     Args:
         db: Database session
@@ -70,32 +104,209 @@ def delete_space(db: Session, space_id: int):
         bool: True if space was deleted, False if it was not found
     """
     try:
-        print(f"Deleting space {space_id}")
-        db_space = db.query(Space).filter(Space.id == space_id).first()
+        db_space = db.query(Space).filter(Space.id == space_id, Space.deleted_at.is_(None)).first()
         if db_space:
-            # First delete all related records (CASCADE should handle this but just to be safe)
-            from sqlalchemy import text
+            db_space.deleted_at = datetime.now(timezone.utc)
             
-            # Delete any blocks in this space
-            db.execute(text(f"DELETE FROM blocks WHERE space_id = {space_id}"))
-            
-            # Delete any user memberships for this space
-            db.execute(text(f"DELETE FROM users_in_spaces WHERE space_id = {space_id}"))
-            
-            # Finally delete the space
-            db.delete(db_space)
+            # Memberships are few, removing them right away revokes every member's access
+            db.query(UserInSpace).filter(UserInSpace.space_id == space_id).delete(synchronize_session=False)
             db.commit()
-            print(f"Space {space_id} deleted successfully")
+
+            block_cache.invalidate(space_id)
+            hot_documents.discard(space_id)
+            logger.info("Space marked deleted", extra={"space_id": space_id})
             return True
         else:
-            print(f"Space {space_id} not found")
+            logger.debug("Space to delete not found", extra={"space_id": space_id})
             return False
-    except Exception as e:
-        print(f"Error deleting space: {str(e)}")
+    except Exception:
+        logger.exception("Error deleting space", extra={"space_id": space_id})
         db.rollback()
         raise
 
 
+def purge_space(db: Session, space_id: int, batch_size: int = PURGE_BATCH_SIZE, job=None):
+    """Remove a soft-deleted space's blocks in bounded batches, then the space itself.
+
+    Each batch is its own short transaction, so a huge space never holds long locks.
+    """
+    purged = 0
+    while True:
+        batch = select(Block.id).where(Block.space_id == space_id).limit(batch_size).scalar_subquery()
+        deleted = db.execute(delete(Block).where(Block.id.in_(batch))).rowcount
+        db.commit()
+        purged += deleted
+        if job:
+            job.progress = {"blocks_purged": purged}
+        if deleted < batch_size:
+            break
+
+    db.query(UserInSpace).filter(UserInSpace.space_id == space_id).delete(synchronize_session=False)
+    db.query(Space).filter(Space.id == space_id, Space.deleted_at.isnot(None)).delete(synchronize_session=False)
+    db.commit()
+    return {"space_id": space_id, "blocks_purged": purged}
+
+
+def _purge_space_job(job, space_id: int):
+    db = SessionLocal()
+    try:
+        return purge_space(db, space_id, job=job)
+    finally:
+        db.close()
+
+
+def start_space_purge(space_id: int, owner_id: Optional[int] = None):
+    return job_queue.submit("space_purge", _purge_space_job, space_id, owner_id=owner_id)
+
+
+def resume_space_purges(db: Session):
+    """Requeue purges interrupted by a restart."""
+    for (space_id,) in db.query(Space.id).filter(Space.deleted_at.isnot(None)).all():
+        start_space_purge(space_id)
+
+
+@traced()
 def get_user_spaces_with_roles(db: Session, user_id: int):
     result = db.query(Space, UserInSpace.role, UserInSpace.is_creator).join(UserInSpace).filter(UserInSpace.user_id == user_id).all()
-    return [{"space": space, "role": role.value, "is_creator": is_creator} for space, role, is_creator in result]
\ No newline at end of file
+    return [{"space": space, "role": role.value, "is_creator": is_creator} for space, role, is_creator in result]
+
+
+@traced()
+def get_user_spaces_version(db: Session, user_id: int):
+    """Hash of everything get_user_spaces_with_roles returns, computed in the database."""
+    row = func.concat_ws(":", Space.id, Space.name, Space.owner_id, Space.updated_at,
+                         UserInSpace.role, UserInSpace.is_creator)
+    return db.query(
+        func.md5(func.string_agg(row, aggregate_order_by(literal_column("','"), Space.id)))
+    ).select_from(Space).join(UserInSpace).filter(UserInSpace.user_id == user_id).scalar()
+
+
+def _export_line(record: dict) -> bytes:
+    return json.dumps(record, default=str, ensure_ascii=False).encode() + b"\n"
+
+
+def iter_space_export(db: Session, space_id: int) -> Iterator[bytes]:
+    """NDJSON dump of a space: one "space" line, then its "member" lines, then "block" lines.
+
+    Users are referred to by email, so the file can be imported into another
+    environment. Blocks come off a server-side cursor in batches.
+    """
+    space = get_space_by_id(db, space_id)
+    yield _export_line({"kind": "space", "format": EXPORT_FORMAT, "name": space.name})
+
+    members = db.query(User.email, UserInSpace.role, UserInSpace.is_creator) \
+        .join(UserInSpace, UserInSpace.user_id == User.id).filter(UserInSpace.space_id == space_id)
+    for email, role, is_creator in members:
+        yield _export_line({"kind": "member", "email": email, "role": role.value, "is_creator": bool(is_creator)})
+
+    for batch in iter_block_export_batches(db, space_id):
+        yield b"".join(_export_line({
+            "kind": "block",
+            "type": row.type.value,
+            "content": row.content,
+            "order": row.order,
+            "owner_email": row.owner_email,
+            "created_at": row.created_at.isoformat(),
+            "updated_at": row.updated_at.isoformat(),
+        }) for row in batch)
+
+
+def import_space(db: Session, lines: Iterable[bytes], owner_id: int, batch_size: int = IMPORT_BATCH_SIZE, job=None):
+    """Create a new space owned by owner_id from an iter_space_export dump.
+
+    Members are matched by email and skipped when no such user exists here; blocks of
+    unknown users are given to the importer. Blocks are loaded with COPY, one batch per
+    transaction. If the import fails the half-imported space is deleted again.
+    """
+    lines = (line for line in lines if line.strip())
+    try:
+        header = json.loads(next(lines))
+    except (StopIteration, ValueError):
+        raise ValueError("Export is empty or its first line is not JSON")
+    if header.get("kind") != "space" or header.get("format") != EXPORT_FORMAT:
+        raise ValueError(f"Unsupported export, expected a space line with format {EXPORT_FORMAT}")
+
+    space = create_space(db, SpaceCreate(name=header["name"]), owner_id)
+    space_id = space.id
+    now = datetime.now(timezone.utc)
+    user_ids = {}  # email -> id, looked up as new emails appear
+    members = {}  # email -> role
+    pending, imported, last_key = [], 0, None
+
+    def user_id_for(email: str) -> Optional[int]:
+        if email not in user_ids:
+            user_ids[email] = db.query(User.id).filter(User.email == email).scalar()
+        return user_ids[email]
+
+    def flush_blocks():
+        nonlocal imported
+        copy_blocks(db, pending)
+        db.commit()
+        imported += len(pending)
+        pending.clear()
+        if job:
+            job.progress = {"space_id": space_id, "blocks_imported": imported}
+
+    try:
+        for number, line in enumerate(lines, start=2):
+            record = json.loads(line)
+            kind = record.get("kind")
+            if kind == "member":
+                if members is None:
+                    raise ValueError(f"Line {number}: member records must come before blocks")
+                members[record["email"]] = UserRole(record["role"])
+            elif kind == "block":
+                if members is not None:
+                    _add_imported_members(db, space_id, owner_id, members, user_id_for)
+                    members = None  # members come before blocks; no more expected
+                # Blocks are exported in order; fresh keys keep it whatever key format the dump has
+                last_key = key_after(last_key)
+                pending.append((
+                    space_id,
+                    BlockType(record.get("type", "TEXT")).value,
+                    record.get("content") or "",
+                    last_key,
+                    user_id_for(record.get("owner_email")) or owner_id,
+                    record.get("created_at") or now,
+                    record.get("updated_at") or now,
+                ))
+                if len(pending) >= batch_size:
+                    flush_blocks()
+            else:
+                raise ValueError(f"Line {number}: unknown record kind {kind!r}")
+        if members is not None:
+            _add_imported_members(db, space_id, owner_id, members, user_id_for)
+        if pending:
+            flush_blocks()
+    except Exception:
+        db.rollback()
+        delete_space(db, space_id)
+        start_space_purge(space_id)
+        raise
+
+    block_cache.invalidate(space_id)
+    return {"space_id": space_id, "blocks_imported": imported}
+
+
+def _add_imported_members(db: Session, space_id: int, owner_id: int, members: Dict[str, UserRole], user_id_for):
+    rows = []
+    for email, role in members.items():
+        user_id = user_id_for(email)
+        if user_id is not None and user_id != owner_id:
+            rows.append({"user_id": user_id, "space_id": space_id, "role": role, "is_creator": False})
+    if rows:
+        db.execute(insert(UserInSpace), rows)
+        db.commit()
+
+
+def _import_space_job(job, upload: IO[bytes], owner_id: int):
+    db = SessionLocal()
+    try:
+        return import_space(db, upload, owner_id, job=job)
+    finally:
+        db.close()
+        upload.close()
+
+
+def start_space_import(upload: IO[bytes], owner_id: int):
+    return job_queue.submit("space_import", _import_space_job, upload, owner_id, owner_id=owner_id)
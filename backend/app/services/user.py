@@ -1,12 +1,15 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
+from app.core.tracing import traced
 
 
+@traced()
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
 
+@traced()
 def create_user(db: Session, user: UserCreate):
     from app.core.auth import get_password_hash
     hashed_password = get_password_hash(user.password)
@@ -29,6 +32,7 @@ def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(User).offset(skip).limit(limit).all()
 
 
+@traced()
 def update_user_db(db: Session, user_id: int, user_update: UserUpdate):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -48,6 +52,7 @@ def update_user_db(db: Session, user_id: int, user_update: UserUpdate):
     return user
     
 
+@traced()
 def delete_user_db(db: Session, user_id: int):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -1,10 +1,16 @@
+import logging
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, timezone
 from app.models.user_in_space import UserInSpace, UserRole
 from app.models.user import User
 from app.schemas.user_in_space import UserInSpaceCreate, UserInSpaceUpdate
 from fastapi import HTTPException
+from app.core.tracing import traced
 
+logger = logging.getLogger(__name__)
+
+@traced()
 def add_user_to_space(db: Session, user_in_space_in: UserInSpaceCreate):
     existing = db.query(UserInSpace).filter(
         UserInSpace.user_id == user_in_space_in.user_id,
@@ -28,19 +34,34 @@ def add_user_to_space(db: Session, user_in_space_in: UserInSpaceCreate):
     )
     db.add(db_membership)
     db.commit()
-    db.refresh(db_membership)
+    # No refresh: callers reload the membership together with its user
     return db_membership
 
 
 def get_users_in_space(db: Session, space_id: int):
     return db.query(UserInSpace).filter(UserInSpace.space_id == space_id).all()
 
+@traced()
 def get_users_in_space_with_details(db: Session, space_id: int):
     return db.query(UserInSpace).options(
         joinedload(UserInSpace.user)
     ).filter(UserInSpace.space_id == space_id).all()
 
 
+@traced()
+def get_member_rows_in_space(db: Session, space_id: int):
+    """Members with their username and email as plain dicts shaped like UserInSpaceOut."""
+    rows = db.execute(
+        select(UserInSpace.user_id, UserInSpace.space_id, UserInSpace.role,
+               func.coalesce(UserInSpace.is_creator, False).label("is_creator"), UserInSpace.joined_at,
+               User.username, User.email)
+        .outerjoin(User, User.id == UserInSpace.user_id)
+        .where(UserInSpace.space_id == space_id)
+    ).mappings()
+    return [{**row, "user": None} for row in rows]
+
+
+@traced()
 def remove_user_from_space(db: Session, space_id: int, user_id: int):
     """Remove a user from a space.
     
@@ -52,26 +73,26 @@ def remove_user_from_space(db: Session, space_id: int, user_id: int):
     Returns the removed membership or None if not found.
     """
     try:
-        print(f"Removing user {user_id} from space {space_id}")
+        logger.debug("Removing user from space", extra={"user_id": user_id, "space_id": space_id})
         membership = db.query(UserInSpace).filter(
             UserInSpace.user_id == user_id,
             UserInSpace.space_id == space_id
         ).first()
         
         if membership:
-            print(f"Found membership: {membership.user_id} in space {membership.space_id}")
             db.delete(membership)
             db.commit()
             return membership
         else:
-            print(f"No membership found for user {user_id} in space {space_id}")
+            logger.debug("No membership to remove", extra={"user_id": user_id, "space_id": space_id})
             return None
-    except Exception as e:
-        print(f"Error removing user from space: {str(e)}")
+    except Exception:
+        logger.exception("Error removing user from space", extra={"user_id": user_id, "space_id": space_id})
         db.rollback()
         raise
 
 
+@traced()
 def update_user_role(db: Session, space_id: int, user_id: int, updates: UserInSpaceUpdate):
     user_in_space = db.query(UserInSpace).filter(
         UserInSpace.space_id == space_id,
@@ -83,13 +104,14 @@ def update_user_role(db: Session, space_id: int, user_id: int, updates: UserInSp
     
     # Update role if provided
     if updates.role is not None:
-        user_in_space.role = updates.role
+        # The schema's enum, not the model's: convert by value
+        user_in_space.role = UserRole(updates.role)
     
     if updates.is_creator is not None:
         user_in_space.is_creator = updates.is_creator
     
     db.commit()
-    db.refresh(user_in_space)
+    # No refresh: callers reload the membership together with its user
     return user_in_space
 
 def check_user_permission(db: Session, user_id: int, space_id: int, required_role: UserRole = UserRole.VISITOR):
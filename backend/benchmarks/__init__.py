@@ -0,0 +1,8 @@
+"""REST benchmark suite, run from the backend directory against a migrated local database:
+
+    DATABASE_URL=postgresql://postgres@localhost/notes_bench python -m benchmarks --blocks 10000 -o bench.json
+
+Seeds users, spaces, memberships and blocks through the services, boots the app with
+uvicorn and measures throughput and latency percentiles per endpoint. Results (with the
+git commit they were taken at) go to a JSON file, so runs can be compared across commits.
+"""
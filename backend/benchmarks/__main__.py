@@ -0,0 +1,590 @@
+import json
+import logging
+import os
+import platform
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueListener
+from typing import Dict, List
+
+import click
+import requests
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import text
+
+from app.core import fast_json
+from app.core.log import JSONFormatter, NonBlockingQueueHandler
+from app.db.session import SessionLocal
+from app.models.block import Block, BlockType
+from app.schemas.block import BlockCreate, BlockOut, BlockUpdate
+from app.services.block import create_block, get_block_rows_in_space, get_blocks_in_space, update_block
+from benchmarks.harness import MemorySampler, Server, measure
+from benchmarks.seed import (CORPUS_VOCABULARY, PASSWORD, WORDS, cleanup, corpus_content, corpus_word,
+                             random_content, seed, seed_space)
+
+SCENARIOS = (
+    "login", "list_blocks", "list_blocks_not_modified", "create_block", "update_block", "delete_block",
+    "members_list", "member_role_update", "member_invite", "member_remove", "search", "revisions",
+    "export", "import",
+    # Each of these seeds or starts what it needs itself
+    "batch_vs_single", "stream_memory", "fast_json", "search_corpus", "revision_history", "content_storage",
+    "logging_overhead",
+)
+# Search terms by how many blocks of the corpus contain them
+SEARCH_BANDS = {"common": range(0, 10), "medium": range(100, 1000), "rare": range(5000, CORPUS_VOCABULARY)}
+# Repeats of each in-process measurement; the median is reported
+ROUNDS = 5
+# content_storage: words per block (about 8 bytes each), so blocks run from 1 kB to 30 kB
+CONTENT_WORDS = (150, 300, 600, 1200, 2400, 4000)
+# (name, compression, toast_tuple_target, storage); None keeps the Postgres default
+CONTENT_STORAGE_VARIANTS = (
+    ("uncompressed", None, None, "EXTERNAL"),
+    ("pglz", "pglz", None, None),
+    ("pglz_target_512", "pglz", 512, None),
+    ("lz4", "lz4", None, None),
+    ("lz4_target_512", "lz4", 512, None),
+)
+
+
+def git_commit() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], capture_output=True, text=True).stdout)
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def postgres_version(db) -> str:
+    return db.execute(text("SHOW server_version")).scalar()
+
+
+def edit_content(rng: random.Random, content: str) -> str:
+    # One typing step: a word inserted, removed or replaced somewhere in the text
+    words = content.split(" ")
+    position = rng.randrange(len(words))
+    action = rng.random()
+    if action < 0.5:
+        words.insert(position, rng.choice(WORDS))
+    elif action < 0.7 and len(words) > 1:
+        del words[position]
+    else:
+        words[position] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def percentile_ms(timings: List[float], percent: int) -> float:
+    ordered = sorted(timings)
+    return round(ordered[min(len(ordered) - 1, len(ordered) * percent // 100)] * 1000, 3)
+
+
+def median_ms(call, rounds: int = ROUNDS):
+    """Median wall time of call() over rounds, and its last result."""
+    timings, result = [], None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = call()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2), result
+
+
+def log_call_costs(calls: int) -> dict:
+    """Time spent in the calling thread per log line: print() as the code did before,
+    against a logger behind the app's queue handler. Both write to a temporary file."""
+    try:
+        {}["block"]
+    except KeyError:
+        exc_info = sys.exc_info()
+    fields = {"space_id": 1, "user_id": 2, "requested_by": 3}
+
+    with tempfile.TemporaryFile("w") as output:
+        def print_line():
+            print(f"Remove member request: {fields}", file=output, flush=True)
+
+        def print_traceback():
+            # The exception handler used to format a traceback even for a 404
+            print("".join(traceback.format_exception(*exc_info)), file=output, flush=True)
+
+        handler = NonBlockingQueueHandler(queue.SimpleQueue())
+        stream = logging.StreamHandler(output)
+        stream.setFormatter(JSONFormatter())
+        listener = QueueListener(handler.queue, stream)
+        logger = logging.getLogger("benchmarks.log_cost")
+        logger.propagate = False
+        logger.handlers[:] = [handler]
+        logger.setLevel(logging.DEBUG)
+        listener.start()
+        try:
+            costs = {}
+            for name, call in (
+                ("print_us", print_line),
+                ("print_traceback_us", print_traceback),
+                ("queue_handler_us", lambda: logger.debug("Remove member request", extra=fields)),
+                ("queue_handler_error_us", lambda: logger.info("HTTP error", extra={"status_code": 404})),
+                ("level_disabled_us", lambda: logger.log(5, "Remove member request", extra=fields)),
+            ):
+                started = time.perf_counter()
+                for _ in range(calls):
+                    call()
+                costs[name] = round((time.perf_counter() - started) / calls * 1e6, 2)
+        finally:
+            listener.stop()
+    return costs
+
+
+def storage_stats(db) -> dict:
+    # Table sizes include TOAST, so content compression shows up here
+    row = db.execute(text(
+        "SELECT pg_total_relation_size('blocks'), pg_total_relation_size('block_revisions'), "
+        "(SELECT avg(pg_column_size(content)) FROM blocks), (SELECT avg(octet_length(content)) FROM blocks)"
+    )).one()
+    return {
+        "blocks_bytes": row[0],
+        "block_revisions_bytes": row[1],
+        "avg_content_stored_bytes": round(float(row[2] or 0), 1),
+        "avg_content_raw_bytes": round(float(row[3] or 0), 1),
+    }
+
+
+class Suite:
+    """The scenarios, run in order against one server; later ones use what earlier ones created."""
+
+    def __init__(self, server: Server, db, data, block_ids: List[int], config: dict, env: Dict[str, str]):
+        self.server = server
+        self.url = server.url
+        self.db = db
+        self.data = data
+        self.space_id = data.spaces[0]
+        self.block_ids = block_ids
+        self.config = config
+        self.env = env
+        self.requests_total = config["requests_total"]
+        self.login_requests = config["login_requests"]
+        self.concurrency = config["concurrency"]
+        self.rng = random.Random(config["seed_value"])
+        self.owner_headers = {}
+        self.created_ids: List[int] = []
+        self.exported = b""
+
+    def login(self, email: str) -> str:
+        response = requests.post(f"{self.url}/auth/login", data={"username": email, "password": PASSWORD})
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    def spare_users(self) -> List[int]:
+        members = {user_id for user_ids in self.data.members.values() for user_id in user_ids}
+        return [user["id"] for user in self.data.users[1:] if user["id"] not in members]
+
+    def run(self, name: str) -> dict:
+        # Fresh token per scenario: a long run outlives one
+        self.owner_headers = {"Authorization": f"Bearer {self.login(self.data.owner['email'])}"}
+        return getattr(self, f"bench_{name}")()
+
+    def new_space(self, name: str) -> int:
+        response = requests.post(f"{self.url}/spaces/", headers=self.owner_headers,
+                                 json={"name": f"bench-{self.data.run_id}-{name}"})
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def bench_login(self):
+        # bcrypt dominates; fewer requests than the other scenarios
+        users = self.data.users
+        return measure(lambda session, n: session.post(
+            f"{self.url}/auth/login", data={"username": users[n % len(users)]["email"], "password": PASSWORD}
+        ), self.login_requests, self.concurrency)
+
+    def bench_list_blocks(self):
+        # Served from the block cache after the first request, like a busy space in production
+        return measure(lambda session, n: session.get(
+            f"{self.url}/blocks/space/{self.space_id}", headers=self.owner_headers
+        ), self.requests_total, self.concurrency, warmup=1)
+
+    def bench_list_blocks_not_modified(self):
+        etag = requests.get(f"{self.url}/blocks/space/{self.space_id}", headers=self.owner_headers).headers.get("ETag")
+        headers = {**self.owner_headers, "If-None-Match": etag or ""}
+        return measure(lambda session, n: session.get(
+            f"{self.url}/blocks/space/{self.space_id}", headers=headers
+        ), self.requests_total, self.concurrency)
+
+    def bench_create_block(self):
+        def create(session, n):
+            response = session.post(f"{self.url}/blocks/", headers=self.owner_headers, json={
+                "space_id": self.space_id, "type": "TEXT", "content": f"benchmark block {n}",
+            })
+            if response.ok:
+                self.created_ids.append(response.json()["id"])
+            return response
+        return measure(create, self.requests_total, self.concurrency)
+
+    def bench_update_block(self):
+        block_ids = self.block_ids
+        return measure(lambda session, n: session.put(
+            f"{self.url}/blocks/{block_ids[n % len(block_ids)]}", headers=self.owner_headers,
+            json={"content": f"updated {n} " + " ".join(WORDS[:n % len(WORDS)])},
+        ), self.requests_total, self.concurrency)
+
+    def bench_delete_block(self):
+        created = list(self.created_ids)
+        return measure(lambda session, n: session.delete(
+            f"{self.url}/blocks/{created[n]}", headers=self.owner_headers
+        ), len(created), self.concurrency)
+
+    def bench_members_list(self):
+        return measure(lambda session, n: session.get(
+            f"{self.url}/user-in-space/space/{self.space_id}/users", headers=self.owner_headers
+        ), self.requests_total, self.concurrency)
+
+    def bench_member_role_update(self):
+        members = self.data.members[self.space_id]
+        if not members:
+            return None
+        return measure(lambda session, n: session.put(
+            f"{self.url}/user-in-space/space/{self.space_id}/user/{members[n % len(members)]}/role",
+            headers=self.owner_headers, json={"role": "admin" if n % 2 else "participant"},
+        ), self.requests_total, self.concurrency)
+
+    def _membership_pairs(self):
+        return [(space_id, user_id) for space_id in self.data.spaces for user_id in self.spare_users()]
+
+    def bench_member_invite(self):
+        # Every user that isn't a member yet, into every space; needs --users > --members + 1
+        pairs = self._membership_pairs()
+        emails = {user["id"]: user["email"] for user in self.data.users}
+        if not pairs:
+            return None
+        return measure(lambda session, n: session.post(
+            f"{self.url}/user-in-space/space/{pairs[n][0]}/invite", headers=self.owner_headers,
+            params={"user_email": emails[pairs[n][1]], "role": "participant"},
+        ), len(pairs), self.concurrency)
+
+    def bench_member_remove(self):
+        pairs = self._membership_pairs()
+        if not pairs:
+            return None
+        return measure(lambda session, n: session.delete(
+            f"{self.url}/user-in-space/space/{pairs[n][0]}/user/{pairs[n][1]}", headers=self.owner_headers
+        ), len(pairs), self.concurrency)
+
+    def bench_search(self):
+        return measure(lambda session, n: session.get(
+            f"{self.url}/blocks/search", headers=self.owner_headers, params={"q": WORDS[n % len(WORDS)]}
+        ), self.requests_total, self.concurrency)
+
+    def bench_revisions(self):
+        # The blocks update_block wrote to, so there is history to list
+        block_ids = self.block_ids
+        return measure(lambda session, n: session.get(
+            f"{self.url}/blocks/{block_ids[n % len(block_ids)]}/revisions", headers=self.owner_headers
+        ), self.requests_total, self.concurrency)
+
+    def bench_export(self):
+        started = time.perf_counter()
+        response = requests.get(f"{self.url}/spaces/{self.space_id}/export", headers=self.owner_headers)
+        response.raise_for_status()
+        elapsed = time.perf_counter() - started
+        self.exported = response.content
+        return {"seconds": round(elapsed, 3), "bytes": len(self.exported),
+                "mb_per_second": round(len(self.exported) / elapsed / 1e6, 2) if elapsed else 0.0}
+
+    def bench_batch_vs_single(self):
+        # The same pasted document written both ways, each into a new space
+        count = self.config["batch_blocks"]
+        contents = [f"pasted line {n} " + random_content(self.rng, 10) for n in range(count)]
+        single_space, batch_space = self.new_space("single"), self.new_space("batch")
+        session = requests.Session()
+
+        started = time.perf_counter()
+        for content in contents:
+            session.post(f"{self.url}/blocks/", headers=self.owner_headers, json={
+                "space_id": single_space, "type": "TEXT", "content": content,
+            }).raise_for_status()
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        session.post(f"{self.url}/blocks/space/{batch_space}/batch", headers=self.owner_headers, json={
+            "operations": [{"op": "create", "type": "TEXT", "content": content} for content in contents],
+        }).raise_for_status()
+        batch = time.perf_counter() - started
+        return {"blocks": count, "single_seconds": round(single, 3), "batch_seconds": round(batch, 3),
+                "single_blocks_per_second": round(count / single), "batch_blocks_per_second": round(count / batch),
+                "speedup": round(single / batch, 1)}
+
+    def bench_stream_memory(self):
+        # Server memory while it sends a large space whole: streamed first, then the full
+        # list (which also lands in the block cache), since freed memory isn't given back
+        words = self.config["words"]
+        space_id = seed_space(self.db, self.data, "stream", self.config["stream_blocks"],
+                              lambda: random_content(self.rng, words))
+        results = {"blocks": self.config["stream_blocks"]}
+        for name, path in (("stream", f"/blocks/space/{space_id}/stream"), ("list", f"/blocks/space/{space_id}")):
+            with MemorySampler(self.server.pid) as memory:
+                started = time.perf_counter()
+                with requests.get(f"{self.url}{path}", headers=self.owner_headers, stream=True) as response:
+                    response.raise_for_status()
+                    size = sum(len(chunk) for chunk in response.iter_content(1 << 16))
+                elapsed = time.perf_counter() - started
+            results[name] = {"seconds": round(elapsed, 3), "bytes": size,
+                             "rss_before_mb": round(memory.baseline / 1e6, 1),
+                             "rss_peak_mb": round(memory.peak / 1e6, 1),
+                             "rss_growth_mb": round((memory.peak - memory.baseline) / 1e6, 1)}
+        return results
+
+    def bench_fast_json(self):
+        # In process on the first seeded space: rows to JSON bytes (the list endpoint's path
+        # on a cache miss) against ORM objects validated through BlockOut and encoded the
+        # way FastAPI does for a response_model. A new session per round, nothing cached.
+        adapter = TypeAdapter(List[BlockOut])
+
+        def fast():
+            with SessionLocal() as db:
+                return fast_json.dumps(get_block_rows_in_space(db, self.space_id))
+
+        def model():
+            with SessionLocal() as db:
+                blocks = adapter.validate_python(get_blocks_in_space(db, self.space_id), from_attributes=True)
+                return json.dumps(jsonable_encoder(blocks), ensure_ascii=False, separators=(",", ":")).encode()
+
+        fast_ms, fast_body = median_ms(fast)
+        model_ms, model_body = median_ms(model)
+        return {"blocks": len(json.loads(fast_body)), "encoder": "orjson" if fast_json.orjson else "json",
+                "fast_ms": fast_ms, "model_ms": model_ms, "speedup": round(model_ms / fast_ms, 1),
+                "fast_bytes": len(fast_body), "model_bytes": len(model_body)}
+
+    def bench_search_corpus(self):
+        # A corpus of Zipf-distributed words spread over spaces of the owner; one query at a
+        # time, so the latencies are the query's own
+        total, spaces, words = self.config["search_blocks"], self.config["search_spaces"], self.config["words"]
+        started = time.perf_counter()
+        for n in range(spaces):
+            seed_space(self.db, self.data, f"search-{n}", total // spaces, lambda: corpus_content(self.rng, words))
+        # As autovacuum would have by now; with stale membership counts the planner can
+        # walk all blocks by space instead of using the search index
+        self.db.execute(text("ANALYZE blocks, users_in_spaces"))
+        self.db.commit()
+        results = {"blocks": total // spaces * spaces, "seed_seconds": round(time.perf_counter() - started, 1)}
+
+        for band, ranks in SEARCH_BANDS.items():
+            terms = [corpus_word(rank) for rank in ranks]
+            results[band] = measure(lambda session, n: session.get(
+                f"{self.url}/blocks/search", headers=self.owner_headers, params={"q": terms[n * 7919 % len(terms)]}
+            ), min(self.requests_total, 200), 1, warmup=5)
+            results[band]["p99_under_100ms"] = results[band]["p99_ms"] < 100
+        return results
+
+    def bench_revision_history(self):
+        # One block edited revisions times through the service, then rebuilt at random revisions
+        count = self.config["revisions"]
+        owner_id = self.data.owner["id"]
+        content = random_content(self.rng, 300)
+        block_id = create_block(self.db, BlockCreate(space_id=self.space_id, type=BlockType.TEXT, content=content),
+                                owner_id, self.space_id).id
+        table_before = self.db.execute(text("SELECT pg_total_relation_size('block_revisions')")).scalar()
+
+        started = time.perf_counter()
+        for _ in range(count):
+            content = edit_content(self.rng, content)
+            update_block(self.db, block_id, BlockUpdate(content=content), author_id=owner_id)
+        edit_seconds = time.perf_counter() - started
+
+        row = self.db.execute(text(
+            "SELECT count(*), sum(octet_length(data)), avg(content_length), count(*) FILTER (WHERE is_snapshot), "
+            "max(revision), pg_total_relation_size('block_revisions') FROM block_revisions WHERE block_id = :block_id"
+        ), {"block_id": block_id}).one()
+        self.db.commit()
+        rows, data_bytes, content_length, snapshots, latest, table_after = row
+        # Edits that leave the content as it was don't add a revision
+        rebuild = measure(lambda session, n: session.get(
+            f"{self.url}/blocks/{block_id}/revisions/{n * 7919 % (latest + 1)}", headers=self.owner_headers
+        ), min(self.requests_total, 500), 1, warmup=5)
+        return {
+            "revisions": count, "rows": rows, "snapshots": snapshots,
+            "edits_per_second": round(count / edit_seconds),
+            "avg_content_bytes": round(float(content_length)),
+            "data_bytes_per_edit": round(data_bytes / rows, 1),
+            "table_bytes_per_edit": round((table_after - table_before) / count, 1),
+            "rebuild": rebuild,
+        }
+
+    def bench_content_storage(self):
+        # In process: the same multi-kB contents written to a scratch table under each TOAST
+        # setting the compression migration can leave blocks.content with. Reports size on
+        # disk, write time, reads of single rows by id and a pass over every row; a read
+        # decompresses the value, length() makes the scan do so too.
+        count = self.config["content_blocks"]
+        # Zipf-distributed words: closer to prose than random_content's 18 words, which
+        # would compress far better than real notes
+        contents = [corpus_content(self.rng, self.rng.choice(CONTENT_WORDS)) for _ in range(count)]
+        raw_bytes = sum(len(content.encode()) for content in contents)
+        table = f"bench_content_{self.data.run_id}"
+        results = {"blocks": count, "avg_raw_bytes": round(raw_bytes / count)}
+        for name, compression, target, storage in CONTENT_STORAGE_VARIANTS:
+            column = f"content text COMPRESSION {compression}" if compression else "content text"
+            options = f" WITH (toast_tuple_target = {target})" if target else ""
+            try:
+                self.db.execute(text(f"CREATE TABLE {table} (id serial PRIMARY KEY, {column}){options}"))
+            except Exception as error:
+                # lz4 needs a server built --with-lz4
+                self.db.rollback()
+                results[name] = {"error": str(getattr(error, "orig", error)).strip()}
+                continue
+            try:
+                if storage:
+                    self.db.execute(text(f"ALTER TABLE {table} ALTER COLUMN content SET STORAGE {storage}"))
+                started = time.perf_counter()
+                for start in range(0, count, 500):
+                    self.db.execute(text(f"INSERT INTO {table} (content) VALUES (:content)"),
+                                    [{"content": content} for content in contents[start:start + 500]])
+                self.db.commit()
+                write_seconds = time.perf_counter() - started
+                self.db.execute(text(f"ANALYZE {table}"))
+                table_bytes, stored_bytes = self.db.execute(text(
+                    f"SELECT pg_total_relation_size('{table}'), sum(pg_column_size(content)) FROM {table}"
+                )).one()
+
+                reads = []
+                for n in range(min(count, 2000)):
+                    started = time.perf_counter()
+                    self.db.execute(text(f"SELECT content FROM {table} WHERE id = :id"),
+                                    {"id": n * 7919 % count + 1}).scalar()
+                    reads.append(time.perf_counter() - started)
+                scan_ms, _ = median_ms(lambda: self.db.execute(text(f"SELECT sum(length(content)) FROM {table}")).scalar())
+                self.db.commit()
+                results[name] = {
+                    "table_bytes": table_bytes,
+                    "stored_ratio": round(float(stored_bytes) / raw_bytes, 3),
+                    "write_seconds": round(write_seconds, 3),
+                    "read_p50_ms": percentile_ms(reads, 50),
+                    "read_p99_ms": percentile_ms(reads, 99),
+                    "scan_ms": scan_ms,
+                }
+            finally:
+                self.db.rollback()
+                self.db.execute(text(f"DROP TABLE IF EXISTS {table}"))
+                self.db.commit()
+        return results
+
+    def bench_logging_overhead(self):
+        # Caller-side cost per log line, print() (before) against the queue handler (after),
+        # then a request that logs three DEBUG lines (removing a non-member) on two more
+        # servers, with those lines dropped (INFO) and written to a file (DEBUG). One client
+        # thread, so the difference isn't lost in queueing.
+        results = {"per_call": log_call_costs(10000)}
+        spare = self.spare_users()
+        if not spare:
+            return results
+        path = f"/user-in-space/space/{self.space_id}/user/{spare[0]}"
+        for level in ("INFO", "DEBUG"):
+            with tempfile.NamedTemporaryFile(suffix=".log") as log:
+                with Server(self.config["workers"], {**self.env, "LOG_LEVEL": level}, log.name) as server:
+                    results[level] = measure(lambda session, n: session.delete(
+                        f"{server.url}{path}", headers=self.owner_headers
+                    ), self.requests_total * 2, 1, warmup=20)
+                results[level]["log_bytes"] = os.path.getsize(log.name)
+        results["debug_overhead_ms"] = round(results["DEBUG"]["mean_ms"] - results["INFO"]["mean_ms"], 3)
+        return results
+
+    def bench_import(self):
+        if not self.exported:
+            self.bench_export()
+        started = time.perf_counter()
+        response = requests.post(f"{self.url}/spaces/import", data=self.exported, headers={
+            **self.owner_headers, "Content-Type": "application/x-ndjson",
+        })
+        response.raise_for_status()
+        # Jobs live in the worker that accepted them, so this needs --workers 1
+        job_url = f"{self.url}/jobs/{response.json()['job_id']}"
+        while True:
+            job = requests.get(job_url, headers=self.owner_headers).json()
+            if job.get("status") in ("succeeded", "failed") or "detail" in job:
+                break
+            time.sleep(0.2)
+        elapsed = time.perf_counter() - started
+        blocks = (job.get("result") or {}).get("blocks_imported", 0)
+        return {"status": job.get("status"), "seconds": round(elapsed, 3), "blocks": blocks,
+                "blocks_per_minute": round(blocks / elapsed * 60) if elapsed else 0}
+
+
+@click.command()
+@click.option("--users", default=20, show_default=True, help="Users to create; the first owns every space.")
+@click.option("--spaces", default=2, show_default=True)
+@click.option("--members", default=10, show_default=True, help="Members per space besides the owner.")
+@click.option("--blocks", default=10000, show_default=True, help="Blocks per space.")
+@click.option("--words", default=30, show_default=True, help="Words of content per block.")
+@click.option("--requests", "requests_total", default=500, show_default=True, help="Requests per scenario.")
+@click.option("--login-requests", default=100, show_default=True)
+@click.option("--concurrency", default=8, show_default=True, help="Client threads.")
+@click.option("--workers", default=1, show_default=True, help="uvicorn worker processes.")
+@click.option("--batch-blocks", default=1000, show_default=True, help="Blocks written by batch_vs_single.")
+@click.option("--stream-blocks", default=100_000, show_default=True, help="Blocks of the stream_memory space.")
+@click.option("--search-blocks", default=1_000_000, show_default=True, help="Blocks of the search_corpus.")
+@click.option("--search-spaces", default=10, show_default=True, help="Spaces the search corpus is spread over.")
+@click.option("--revisions", default=10_000, show_default=True, help="Edits of the revision_history block.")
+@click.option("--content-blocks", default=5000, show_default=True, help="Blocks written by content_storage.")
+@click.option("--only", multiple=True, type=click.Choice(SCENARIOS), help="Run only these scenarios (repeatable).")
+@click.option("--server-env", multiple=True, metavar="KEY=VALUE",
+              help="Extra server environment, e.g. HOT_DOCUMENTS=1. DEBUG=1 is set unless given, "
+                   "for the query counts.")
+@click.option("--seed", "seed_value", default=0, show_default=True, help="Random seed for generated content.")
+@click.option("--keep", is_flag=True, help="Leave the seeded data in the database.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), default="bench-results.json", show_default=True)
+def main(users, spaces, members, blocks, words, requests_total, login_requests, concurrency, workers, batch_blocks,
+         stream_blocks, search_blocks, search_spaces, revisions, content_blocks, only, server_env, seed_value, keep,
+         output):
+    """Seed a local database, boot the app and benchmark its REST endpoints."""
+    if members >= users:
+        raise click.BadParameter("needs more users than members per space", param_hint="--members")
+    config = {key: value for key, value in locals().items() if key not in ("output", "keep")}
+    # DEBUG=1 only adds the X-DB-Query-Count/X-DB-Time-Ms headers
+    env = {"DEBUG": "1", **dict(item.split("=", 1) for item in server_env)}
+
+    db = SessionLocal()
+    data = None
+    try:
+        started = time.perf_counter()
+        data = seed(db, users, spaces, members, blocks, words, seed_value)
+        seed_seconds = time.perf_counter() - started
+        click.echo(f"Seeded {users} users, {spaces} spaces x {blocks} blocks in {seed_seconds:.1f}s", err=True)
+        block_ids = [block_id for (block_id,) in db.query(Block.id).filter(Block.space_id == data.spaces[0])
+                     .order_by(Block.order).limit(1000)]
+
+        results = {}
+        with Server(workers, env) as server:
+            suite = Suite(server, db, data, block_ids, config, env)
+            for name in only or SCENARIOS:
+                click.echo(f"  {name} ...", err=True)
+                results[name] = suite.run(name)
+                if results[name] and "p50_ms" in results[name]:
+                    click.echo(f"    {results[name]['throughput_rps']} req/s, p50 {results[name]['p50_ms']} ms, "
+                               f"p99 {results[name]['p99_ms']} ms, {results[name]['errors']} errors", err=True)
+                elif results[name]:
+                    click.echo(f"    {json.dumps(results[name])}", err=True)
+
+        report = {
+            **git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "postgres": postgres_version(db),
+            "config": {**config, "only": list(only), "server_env": env},
+            "seed_seconds": round(seed_seconds, 3),
+            "storage": storage_stats(db),
+            "scenarios": results,
+        }
+        with open(output, "w") as result_file:
+            json.dump(report, result_file, indent=2)
+        click.echo(f"Results written to {output}", err=True)
+    finally:
+        if data is not None and not keep:
+            cleanup(db, data)
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """The app under uvicorn in a child process, so client and server don't share a GIL.
+
+    With log_path the app's log lines (stdout) go to that file instead of the terminal.
+    """
+
+    def __init__(self, workers: int = 1, env: Optional[Dict[str, str]] = None, log_path: Optional[str] = None):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.workers = workers
+        self.env = {**os.environ, **(env or {})}
+        self.log_path = log_path
+        self._process: Optional[subprocess.Popen] = None
+        self._log = None
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    def __enter__(self):
+        self._log = open(self.log_path, "ab") if self.log_path else None
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning", "--no-access-log"],
+            env=self.env, stdout=self._log,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self._process.returncode}")
+            try:
+                requests.get(f"{self.url}/openapi.json", timeout=1)
+                return self
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError("Server did not start within 30s")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        if self._log:
+            self._log.close()
+        return False
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident memory of a process and its children (uvicorn workers), from /proc; Linux only."""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            total += sum(rss_bytes(int(child)) for child in children.read().split())
+    except FileNotFoundError:
+        pass
+    return total
+
+
+class MemorySampler:
+    """Polls rss_bytes(pid) in a thread while the with block runs and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.01):
+        self.pid = pid
+        self.interval = interval
+        self.baseline = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline = self.peak = rss_bytes(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes(self.pid))
+        return False
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    # Nearest rank
+    if not sorted_values:
+        return 0.0
+    index = min(int(share * len(sorted_values) + 0.5), len(sorted_values)) - 1
+    return sorted_values[max(index, 0)]
+
+
+def summarize(latencies: List[float], errors: Counter, elapsed: float, query_counts: Optional[List[int]] = None) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    queries = {}
+    if query_counts:
+        # X-DB-Query-Count, only sent when the server runs with DEBUG=1
+        queries = {"queries_per_request": round(sum(query_counts) / len(query_counts), 2),
+                   "max_queries": max(query_counts)}
+    return {
+        **queries,
+        "requests": count,
+        "errors": sum(errors.values()),
+        # Status code (or "connection") -> count, for the requests that failed
+        "error_statuses": dict(errors),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+def measure(call: Callable[[requests.Session, int], requests.Response], requests_total: int,
+            concurrency: int, warmup: int = 0) -> dict:
+    """Run call(session, n) for n in range(requests_total) from concurrency threads.
+
+    Each thread has its own keep-alive session. A response with a 4xx/5xx status counts
+    as an error and its latency is left out of the percentiles.
+    """
+    local = threading.local()
+    latencies: List[float] = []
+    query_counts: List[int] = []
+    errors = Counter()
+    lock = threading.Lock()
+
+    def one(n: int, record: bool = True):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        queries = None
+        try:
+            response = call(session, n)
+            ok, status, queries = response.ok, response.status_code, response.headers.get("X-DB-Query-Count")
+        except requests.RequestException:
+            ok, status = False, "connection"
+        elapsed = time.perf_counter() - started
+        if record:
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                    if queries is not None:
+                        query_counts.append(int(queries))
+                else:
+                    errors[status] += 1
+
+    for n in range(warmup):
+        one(requests_total + n, record=False)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_total)))
+    return summarize(latencies, errors, time.perf_counter() - started, query_counts)
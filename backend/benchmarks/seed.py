@@ -0,0 +1,114 @@
+import itertools
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from sqlalchemy.orm import Session
+
+from app.core.ordering import spread_keys
+from app.models.space import Space
+from app.schemas.space import SpaceCreate
+from app.schemas.user import UserCreate
+from app.schemas.user_in_space import UserInSpaceCreate, UserRole
+from app.services.block import copy_blocks
+from app.services.space import create_space, delete_space, purge_space
+from app.services.user import create_user, delete_user_db
+from app.services.user_in_space import add_user_to_space
+
+PASSWORD = "bench-password"
+# Words for generated content; a few are rare so searches have both broad and narrow hits
+WORDS = ("note", "meeting", "budget", "design", "review", "release", "draft", "todo", "idea", "customer",
+         "roadmap", "invoice", "schema", "latency", "deploy", "backlog", "zephyr", "quartz")
+# Blocks per COPY
+SEED_BATCH_SIZE = 5000
+# Distinct words of the search corpus; word n is drawn with weight 1 / (n + 1) (Zipf),
+# so a few words are in most blocks and most words in very few, as in real text
+CORPUS_VOCABULARY = 20000
+CORPUS_CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(CORPUS_VOCABULARY)))
+
+
+class SeededData:
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.users: List[dict] = []  # {"id", "email"}
+        self.spaces: List[int] = []
+        self.members: dict = {}  # space id -> member user ids (owner excluded)
+
+    @property
+    def owner(self) -> dict:
+        return self.users[0]
+
+
+def random_content(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def corpus_word(rank: int) -> str:
+    return f"term{rank}"
+
+
+def corpus_content(rng: random.Random, words: int) -> str:
+    ranks = rng.choices(range(CORPUS_VOCABULARY), cum_weights=CORPUS_CUM_WEIGHTS, k=words)
+    return " ".join(corpus_word(rank) for rank in ranks)
+
+
+def seed_blocks(db: Session, space_id: int, owner_id: int, count: int, content: Callable[[], str]):
+    """Load count blocks into a space with COPY, SEED_BATCH_SIZE per transaction."""
+    now = datetime.now(timezone.utc)
+    keys = spread_keys(count)
+    for start in range(0, count, SEED_BATCH_SIZE):
+        copy_blocks(db, [
+            (space_id, "TEXT", content(), key, owner_id, now, now)
+            for key in keys[start:start + SEED_BATCH_SIZE]
+        ])
+        db.commit()
+
+
+def seed_space(db: Session, data: SeededData, name: str, blocks: int, content: Callable[[], str]) -> int:
+    """An extra space of the run's owner (removed by cleanup) with blocks and no members."""
+    space_id = create_space(db, SpaceCreate(name=f"bench-{data.run_id}-{name}"), data.owner["id"]).id
+    seed_blocks(db, space_id, data.owner["id"], blocks, content)
+    return space_id
+
+
+def seed(db: Session, users: int, spaces: int, members: int, blocks: int, words: int = 30,
+         seed_value: int = 0) -> SeededData:
+    """Create users, spaces owned by the first user, members and blocks per space.
+
+    Everything is tagged with a run id in the emails and space names so it can be removed
+    afterwards without touching other data.
+    """
+    rng = random.Random(seed_value)
+    data = SeededData(uuid.uuid4().hex[:8])
+    for n in range(users):
+        email = f"bench-{data.run_id}-{n}@example.com"
+        user = create_user(db, UserCreate(username=f"bench{n}", email=email, password=PASSWORD))
+        data.users.append({"id": user.id, "email": email})
+
+    owner_id = data.owner["id"]
+    for n in range(spaces):
+        space_id = create_space(db, SpaceCreate(name=f"bench-{data.run_id}-{n}"), owner_id).id
+        data.spaces.append(space_id)
+
+        member_ids = [user["id"] for user in data.users[1:members + 1]]
+        for index, user_id in enumerate(member_ids):
+            # Every third member an admin, so role checks see both roles
+            role = UserRole.ADMIN if index % 3 == 0 else UserRole.PARTICIPANT
+            add_user_to_space(db, UserInSpaceCreate(user_id=user_id, space_id=space_id, role=role))
+        data.members[space_id] = member_ids
+
+        seed_blocks(db, space_id, owner_id, blocks, lambda: random_content(rng, words))
+    return data
+
+
+def cleanup(db: Session, data: SeededData):
+    """Remove everything a run created, including spaces imported during it."""
+    user_ids = [user["id"] for user in data.users]
+    space_ids = [space_id for (space_id,) in db.query(Space.id).filter(Space.owner_id.in_(user_ids))]
+    for space_id in space_ids:
+        delete_space(db, space_id)
+        purge_space(db, space_id)
+    for user_id in user_ids:
+        delete_user_db(db, user_id)
+
@@ -0,0 +1,107 @@
+"""Fixtures for tests that need Postgres.
+
+The tests run against TEST_DATABASE_URL (a throwaway database: its tables are dropped
+and recreated) and are skipped when it can't be reached:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/notes_test python -m pytest tests
+"""
+import importlib.util
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "postgresql://postgres@localhost:5432/notes_test")
+# Before anything imports app.db.session, which creates its engine at import time
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ.setdefault("SECRET", "test-secret")
+os.environ.setdefault("ADMIN_EMAILS", "admin@example.com")
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.auth import create_access_token
+from app.core.ordering import spread_keys
+from app.db.session import SessionLocal, engine as app_engine
+from app.main import app
+from app.models import Base, Space, User, UserInSpace
+from app.models.user_in_space import UserRole
+from app.services.block import copy_blocks
+
+MIGRATIONS = Path(__file__).resolve().parent.parent / "alembic" / "versions"
+# Schema objects the models don't declare, created by running these migrations' upgrade()
+SQL_MIGRATIONS = [
+    "abfb1785041a_add_block_order_after_function.py",
+]
+
+
+def run_migration(connection, filename: str):
+    spec = importlib.util.spec_from_file_location(filename[:-3], MIGRATIONS / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    with Operations.context(MigrationContext.configure(connection)):
+        module.upgrade()
+
+
+@pytest.fixture(scope="session")
+def engine():
+    try:
+        app_engine.connect().close()
+    except OperationalError:
+        pytest.skip(f"Postgres not reachable at {TEST_DATABASE_URL}")
+    Base.metadata.drop_all(app_engine)
+    Base.metadata.create_all(app_engine)
+    with app_engine.begin() as connection:
+        for filename in SQL_MIGRATIONS:
+            run_migration(connection, filename)
+    return app_engine
+
+
+@pytest.fixture
+def db(engine):
+    session = SessionLocal()
+    yield session
+    session.close()
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+
+@pytest.fixture
+def client(engine):
+    # No lifespan: background workers stay off, requests are served as usual
+    return TestClient(app)
+
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+
+
+def make_user(db, name: str) -> User:
+    # No bcrypt: tests that log in hash a password themselves
+    user = User(username=name, email=f"{name}@example.com", hashed_password="-", is_active=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def make_space(db, owner: User, members=(), role: UserRole = UserRole.PARTICIPANT) -> Space:
+    space = Space(name=f"space of {owner.username}", owner_id=owner.id)
+    db.add(space)
+    db.flush()
+    db.add(UserInSpace(user_id=owner.id, space_id=space.id, role=UserRole.ADMIN, is_creator=True))
+    for member in members:
+        db.add(UserInSpace(user_id=member.id, space_id=space.id, role=role, is_creator=False))
+    db.commit()
+    return space
+
+
+def make_blocks(db, space: Space, count: int, content: str = "block"):
+    now = datetime.now(timezone.utc)
+    copy_blocks(db, [(space.id, "TEXT", f"{content} {n}", key, space.owner_id, now, now)
+                     for n, key in enumerate(spread_keys(count))])
+    db.commit()
@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.access import SpaceAccess
+from app.core.permissions import Permission
+from app.models import Space, UserInSpace
+from app.models.block import Block
+from app.models.user_in_space import UserRole
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+
+def block_ids(db, space):
+    return [block_id for (block_id,) in db.query(Block.id).filter(Block.space_id == space.id).order_by(Block.id)]
+
+
+def membership(db, user, space) -> UserInSpace:
+    return db.query(UserInSpace).filter(UserInSpace.user_id == user.id, UserInSpace.space_id == space.id).one()
+
+
+@pytest.mark.parametrize("role, allowed", [
+    (UserRole.VISITOR, False),
+    (UserRole.PARTICIPANT, True),
+    (UserRole.ADMIN, True),
+])
+def test_block_writes_follow_the_role(client, db, role, allowed):
+    owner, member = make_user(db, "owner"), make_user(db, "member")
+    space = make_space(db, owner, members=[member], role=role)
+    make_blocks(db, space, 2)
+    edited, deleted = block_ids(db, space)
+    headers = auth_headers(member)
+
+    responses = [
+        client.post("/blocks/", headers=headers, json={"space_id": space.id, "content": "new"}),
+        client.put(f"/blocks/{edited}", headers=headers, json={"content": "edited"}),
+        client.delete(f"/blocks/{deleted}", headers=headers),
+    ]
+
+    assert [response.status_code for response in responses] == [200 if allowed else 403] * 3
+    assert client.get(f"/blocks/space/{space.id}", headers=headers).status_code == 200
+
+
+def test_an_owner_who_left_manages_the_space_but_not_its_blocks(client, db):
+    owner, guest = make_user(db, "owner"), make_user(db, "guest")
+    space = make_space(db, owner)
+    make_blocks(db, space, 1)
+    db.delete(membership(db, owner, space))
+    db.commit()
+    headers = auth_headers(owner)
+
+    assert client.get(f"/spaces/{space.id}", headers=headers).status_code == 200
+    invited = client.post(f"/user-in-space/space/{space.id}/invite", headers=headers, params={"user_email": guest.email})
+    assert invited.status_code == 200
+    assert client.post("/blocks/", headers=headers, json={"space_id": space.id, "content": "new"}).status_code == 403
+    assert client.put(f"/blocks/{block_ids(db, space)[0]}", headers=headers, json={"content": "x"}).status_code == 403
+
+    access = SpaceAccess(owner, space.id, owner.id, None, False)
+    assert access.can(Permission.MANAGE_MEMBERS) and not access.can(Permission.VIEW_BLOCKS)
+
+
+def test_a_creator_demoted_to_visitor_manages_members_but_cannot_edit(client, db):
+    owner, guest = make_user(db, "owner"), make_user(db, "guest")
+    space = make_space(db, owner)
+    make_blocks(db, space, 1)
+    membership(db, owner, space).role = UserRole.VISITOR
+    db.commit()
+    headers = auth_headers(owner)
+
+    invited = client.post(f"/user-in-space/space/{space.id}/invite", headers=headers, params={"user_email": guest.email})
+    assert invited.status_code == 200
+    assert client.get(f"/blocks/space/{space.id}", headers=headers).status_code == 200
+    assert client.put(f"/blocks/{block_ids(db, space)[0]}", headers=headers, json={"content": "x"}).status_code == 403
+    assert client.post("/blocks/", headers=headers, json={"space_id": space.id, "content": "new"}).status_code == 403
+
+
+def test_a_non_member_cannot_delete_a_block(client, db):
+    owner, outsider = make_user(db, "owner"), make_user(db, "outsider")
+    space = make_space(db, owner)
+    make_blocks(db, space, 1)
+    (block_id,) = block_ids(db, space)
+
+    assert client.delete(f"/blocks/{block_id}", headers=auth_headers(outsider)).status_code == 403
+    assert block_ids(db, space) == [block_id]
+
+
+def test_a_deleted_space_is_not_found(client, db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 1)
+    (block_id,) = block_ids(db, space)
+    db.query(Space).filter(Space.id == space.id).update({"deleted_at": datetime.now(timezone.utc)})
+    db.commit()
+    headers = auth_headers(owner)
+
+    assert client.get(f"/spaces/{space.id}", headers=headers).status_code == 404
+    assert client.post(f"/user-in-space/space/{space.id}/invite", headers=headers,
+                       params={"user_email": owner.email}).status_code == 404
+    assert client.delete(f"/blocks/{block_id}", headers=headers).status_code == 404
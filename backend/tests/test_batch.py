@@ -0,0 +1,30 @@
+import pytest
+
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "create"},
+    {"op": "update", "content": "no block"},
+    {"op": "move"},
+    {"op": "delete"},
+])
+def test_incomplete_operations_are_rejected(client, db, operation):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+
+    response = client.post(f"/blocks/space/{space.id}/batch", headers=auth_headers(owner),
+                           json={"operations": [operation]})
+
+    assert response.status_code == 422
+
+
+def test_batch_needs_a_member_even_when_empty(client, db):
+    owner, outsider = make_user(db, "owner"), make_user(db, "outsider")
+    space = make_space(db, owner)
+    make_blocks(db, space, 2)
+    url = f"/blocks/space/{space.id}/batch"
+
+    assert client.post(url, headers=auth_headers(outsider), json={"operations": []}).status_code == 403
+    response = client.post(url, headers=auth_headers(owner), json={"operations": [{"op": "create", "content": "new"}]})
+    assert response.status_code == 200 and response.json()["created"][0]["content"] == "new"
@@ -0,0 +1,100 @@
+import json
+from functools import partial
+
+import pytest
+
+from app.models.block import Block
+from app.routers import block as block_router
+from app.services import block as block_service
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+
+def walk_pages(client, headers, space_id: int, limit: int, cursor: str = None, **window) -> list:
+    """Follows next_cursor from the given page to the last, checking each page is full."""
+    items, pages = [], 0
+    while True:
+        params = {"limit": limit, **window, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/blocks/space/{space_id}/page", headers=headers, params=params)
+        assert response.status_code == 200
+        page = response.json()
+        items.extend(page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+        assert len(page["items"]) == limit and pages < 100
+
+
+def test_walking_the_pages_returns_every_block_once_in_order(client, db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 23)
+    make_blocks(db, make_space(db, owner), 5)
+    headers = auth_headers(owner)
+    listed = client.get(f"/blocks/space/{space.id}", headers=headers).json()
+
+    for limit in (1, 5, 23, 100):
+        assert walk_pages(client, headers, space.id, limit) == listed
+    keys = [block["order"] for block in listed]
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+
+
+def test_walking_a_window_returns_exactly_its_blocks(client, db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 20)
+    headers = auth_headers(owner)
+    listed = client.get(f"/blocks/space/{space.id}", headers=headers).json()
+    start, end = listed[4]["order"], listed[15]["order"]
+
+    assert walk_pages(client, headers, space.id, 3, start=start, end=end) == listed[4:15]
+    assert walk_pages(client, headers, space.id, 3, start=listed[-1]["order"]) == listed[-1:]
+    assert walk_pages(client, headers, space.id, 3, end=listed[0]["order"]) == []
+
+
+def test_blocks_added_during_a_walk_do_not_repeat_rows(client, db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 10)
+    headers = auth_headers(owner)
+    listed = client.get(f"/blocks/space/{space.id}", headers=headers).json()
+    url = f"/blocks/space/{space.id}/page"
+
+    def insert_after(position: int) -> int:
+        created = client.post("/blocks/", headers=headers, json={"space_id": space.id, "content": "added"}).json()
+        moved = client.put(f"/blocks/{created['id']}/move", headers=headers, json={"after_id": listed[position]["id"]})
+        assert moved.status_code == 200
+        return created["id"]
+
+    first = client.get(url, headers=headers, params={"limit": 4}).json()
+    # One block lands before the cursor, one after it
+    insert_after(0)
+    late = insert_after(7)
+    rest = walk_pages(client, headers, space.id, 4, cursor=first["next_cursor"])
+
+    ids = [block["id"] for block in first["items"] + rest]
+    assert len(ids) == len(set(ids)) == 11
+    assert ids == [block["id"] for block in listed[:8]] + [late] + [block["id"] for block in listed[8:]]
+
+
+@pytest.mark.parametrize("count", [0, 1, 7])
+def test_both_stream_formats_match_the_block_list(client, db, monkeypatch, count):
+    # Batches of three, so the body is made of several chunks
+    monkeypatch.setattr(block_router, "iter_block_batches", partial(block_service.iter_block_batches, batch_size=3))
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, count)
+    db.query(Block).filter(Block.space_id == space.id).update(
+        {"content": Block.content + ' "quoted"\nnext line\t ünïcode ☕ \\ </script>'}, synchronize_session=False)
+    db.commit()
+    headers, url = auth_headers(owner), f"/blocks/space/{space.id}"
+    listed = client.get(url, headers=headers).json()
+
+    ndjson = client.get(f"{url}/stream", headers=headers)
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert ndjson.text.endswith("\n") or not listed
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == listed
+
+    array = client.get(f"{url}/stream", headers=headers, params={"format": "json"})
+    assert array.headers["content-type"] == "application/json"
+    assert json.loads(array.text) == listed
@@ -0,0 +1,89 @@
+"""Query budgets of the block endpoints, counted with app.core.query_stats.query_budget.
+
+Every authenticated request spends one query in get_current_user; the budgets below
+include it.
+"""
+from app.core.query_stats import query_budget
+from app.models.user_in_space import UserRole
+from app.services.block import get_last_order_key
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+
+def test_space_block_list_revalidation_costs_one_query(client, db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 50)
+    url, headers = f"/blocks/space/{space.id}", auth_headers(owner)
+
+    with query_budget(3):  # user, membership + version, rows
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200 and len(response.json()) == 50
+    etag = response.headers["ETag"]
+
+    with query_budget(2) as stats:  # user, membership + version; no rows loaded
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["ETag"] == etag
+    assert not any("blocks.content" in statement for statement in stats.statements)
+
+    block_id = client.get(url, headers=headers).json()[0]["id"]
+    assert client.put(f"/blocks/{block_id}", headers=headers, json={"content": "edited"}).status_code == 200
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert response.json()[0]["content"] == "edited"
+
+
+def test_space_listing_revalidation_costs_one_query(client, db):
+    owner = make_user(db, "owner")
+    make_space(db, owner)
+    headers = auth_headers(owner)
+
+    response = client.get("/spaces/my-spaces-with-roles", headers=headers)
+    assert response.status_code == 200 and len(response.json()) == 1
+
+    with query_budget(2):  # user, version
+        response = client.get("/spaces/my-spaces-with-roles",
+                              headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+def test_create_block_is_one_round_trip(client, db):
+    owner, visitor = make_user(db, "owner"), make_user(db, "visitor")
+    space = make_space(db, owner, [visitor], role=UserRole.VISITOR)
+    make_blocks(db, space, 10)
+    space_id, owner_headers, visitor_headers = space.id, auth_headers(owner), auth_headers(visitor)
+    block = {"space_id": space_id, "type": "TEXT", "content": "new"}
+
+    with query_budget(2) as stats:  # user, INSERT ... SELECT ... RETURNING
+        response = client.post("/blocks/", headers=owner_headers, json=block)
+    assert response.status_code == 200
+    assert [statement.split(None, 1)[0] for statement in stats.statements] == ["SELECT", "INSERT"]
+    created = response.json()
+    assert created["content"] == "new" and created["order"] > get_last_order_key(db, space_id, created["id"])
+
+    # Refusals take the slow path to find out why, writing nothing
+    assert client.post("/blocks/", headers=visitor_headers, json=block).status_code == 403
+    assert client.post("/blocks/", headers=owner_headers, json={**block, "space_id": space_id + 1}).status_code == 404
+
+
+def test_update_block_resolves_once_and_skips_refresh(client, db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 10)
+    headers = auth_headers(owner)
+    block_id = client.get(f"/blocks/space/{space.id}", headers=headers).json()[3]["id"]
+
+    # The first edit also records the original content as revision 0
+    with query_budget(6):
+        assert client.put(f"/blocks/{block_id}", headers=headers, json={"content": "first"}).status_code == 200
+
+    # user, block joined with membership, revision lock, UPDATE, revision INSERT
+    with query_budget(5) as stats:
+        response = client.put(f"/blocks/{block_id}", headers=headers, json={"content": "edited"})
+    assert response.status_code == 200 and response.json()["content"] == "edited"
+    kinds = [statement.split(None, 1)[0] for statement in stats.statements]
+    assert kinds == ["SELECT", "SELECT", "SELECT", "UPDATE", "INSERT"]
+    assert "users_in_spaces" in list(stats.statements)[1]
+
+    with query_budget(3):  # user, block joined with membership, UPDATE: no content, no revision
+        response = client.put(f"/blocks/{block_id}", headers=headers, json={"type": "HEADING"})
+    assert response.status_code == 200 and response.json()["type"] == "HEADING"
@@ -0,0 +1,83 @@
+import pytest
+from pydantic import TypeAdapter
+
+from app.core import fast_json
+from app.core.hot_documents import HotDocumentStore
+from app.models import Space, UserInSpace
+from app.models.block import Block
+from app.routers import block as block_router
+from app.schemas.block import BlockOut
+from app.schemas.space import SpaceOut
+from app.schemas.user_in_space import UserInSpaceOut
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+# Content the encoders could disagree on: escapes, non-ASCII, HTML, control characters
+CONTENT = 'say "hi"\n\tünïcode ☕ 𝄞 \\ </script> \u2028 \x01'
+
+
+def model_json(model, rows) -> bytes:
+    return TypeAdapter(list[model]).dump_json([model.model_validate(row) for row in rows])
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    # Both the orjson path and the stdlib fallback must give the same bytes
+    if request.param == "json":
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+@pytest.fixture
+def space(db):
+    owner, member = make_user(db, "owner"), make_user(db, "mémber")
+    space = make_space(db, owner, members=[member])
+    make_blocks(db, space, 5, content=CONTENT)
+    return space
+
+
+def blocks_of(db, space):
+    return db.query(Block).filter(Block.space_id == space.id).order_by(Block.order, Block.id).all()
+
+
+def test_block_list(client, db, encoder, space):
+    response = client.get(f"/blocks/space/{space.id}", headers=auth_headers(space.creator))
+
+    assert response.content == model_json(BlockOut, blocks_of(db, space))
+
+
+def test_block_list_of_a_hot_document(client, db, encoder, space, monkeypatch):
+    store = HotDocumentStore(enabled=True, max_bytes=1 << 30, checkpoint_seconds=60)
+    store.open(db, space.id)
+    monkeypatch.setattr(block_router, "hot_documents", store)
+
+    response = client.get(f"/blocks/space/{space.id}", headers=auth_headers(space.creator))
+
+    assert response.content == model_json(BlockOut, blocks_of(db, space))
+
+
+def test_block_stream(client, db, encoder, space):
+    response = client.get(f"/blocks/space/{space.id}/stream", headers=auth_headers(space.creator))
+
+    expected = [BlockOut.model_validate(block).model_dump_json().encode() for block in blocks_of(db, space)]
+    assert response.content.splitlines() == expected
+
+
+def test_space_members(client, db, encoder, space):
+    response = client.get(f"/user-in-space/space/{space.id}/users", headers=auth_headers(space.creator))
+
+    # Same order as the response; the model's user field is left empty, as the endpoint does
+    members = [db.query(UserInSpace).filter_by(space_id=space.id, user_id=item["user_id"]).one()
+               for item in response.json()]
+    rows = [{"user_id": member.user_id, "space_id": member.space_id, "role": member.role,
+             "is_creator": member.is_creator, "joined_at": member.joined_at,
+             "username": member.user.username, "email": member.user.email} for member in members]
+    assert len(rows) == 2 and response.content == model_json(UserInSpaceOut, rows)
+
+
+def test_my_spaces(client, db, encoder, space):
+    response = client.get("/spaces/my-spaces", headers=auth_headers(space.creator))
+
+    spaces = [db.get(Space, item["id"]) for item in response.json()]
+    assert response.content == model_json(SpaceOut, spaces)
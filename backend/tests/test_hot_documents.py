@@ -0,0 +1,100 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.core import hot_documents
+from app.core.hot_documents import HotDocumentStore
+from app.models.block import Block
+from app.schemas.block import BlockUpdate
+from app.services.block import update_block
+from tests.conftest import make_blocks, make_space, make_user
+
+
+def make_document(db, blocks: int = 2):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, blocks)
+    # Not the app's store: REST writes don't patch it, as for a document in another worker
+    store = HotDocumentStore(enabled=True, max_bytes=1 << 30, checkpoint_seconds=60)
+    document = store.open(db, space.id)
+    return store, document, owner.id, sorted(document.blocks)
+
+
+def stored(db, block_id: int):
+    db.expire_all()
+    return db.execute(select(Block.content, Block.revision).where(Block.id == block_id)).one()
+
+
+def edit(store, document, block_id: int, content: str, author_id: int):
+    store.apply_edit(document.space_id, block_id, content, datetime.now(timezone.utc), author_id)
+
+
+def test_checkpoints_write_each_edit_on_top_of_the_last(db):
+    store, document, owner_id, (block_id, _) = make_document(db)
+
+    edit(store, document, block_id, "first", owner_id)
+    store.checkpoint(document.space_id)
+    edit(store, document, block_id, "second", owner_id)
+    store.checkpoint(document.space_id)
+
+    assert tuple(stored(db, block_id)) == ("second", 2)
+    assert document.get(block_id)["revision"] == 2 and not document.dirty
+
+
+def test_a_rest_write_since_the_edit_wins_over_the_document(db):
+    store, document, owner_id, (block_id, other_id) = make_document(db)
+    edit(store, document, block_id, "typed in memory", owner_id)
+    edit(store, document, other_id, "untouched elsewhere", owner_id)
+
+    update_block(db, block_id, BlockUpdate(content="saved over REST"), author_id=owner_id)
+    store.checkpoint(document.space_id)
+
+    # The table keeps the REST write and the document now agrees with it
+    assert tuple(stored(db, block_id)) == ("saved over REST", 1)
+    assert document.get(block_id)["content"] == "saved over REST" and not document.dirty
+    assert tuple(stored(db, other_id)) == ("untouched elsewhere", 1)
+
+    edit(store, document, block_id, "typed after", owner_id)
+    store.checkpoint(document.space_id)
+    assert tuple(stored(db, block_id)) == ("typed after", 2)
+
+
+def test_overlapping_checkpoints_keep_the_newer_edit(db, monkeypatch):
+    store, document, owner_id, (block_id, _) = make_document(db)
+    writing, resume = threading.Event(), threading.Event()
+    prepare_revisions = hot_documents.prepare_revisions
+
+    def slow_prepare(*args):
+        if not writing.is_set():
+            writing.set()
+            resume.wait(5)
+        return prepare_revisions(*args)
+
+    monkeypatch.setattr(hot_documents, "prepare_revisions", slow_prepare)
+    edit(store, document, block_id, "older", owner_id)
+    first = threading.Thread(target=store.checkpoint, args=(document.space_id,))
+    first.start()
+    writing.wait(5)
+    edit(store, document, block_id, "newer", owner_id)
+    second = threading.Thread(target=store.checkpoint, args=(document.space_id,))
+    second.start()
+    time.sleep(0.1)
+    resume.set()
+    first.join()
+    second.join()
+
+    assert tuple(stored(db, block_id)) == ("newer", 2)
+    assert document.get(block_id)["content"] == "newer" and not document.dirty
+
+
+def test_a_block_deleted_meanwhile_is_dropped(db):
+    store, document, owner_id, (block_id, _) = make_document(db)
+    edit(store, document, block_id, "typed in memory", owner_id)
+
+    db.query(Block).filter(Block.id == block_id).delete()
+    db.commit()
+    store.checkpoint(document.space_id)
+
+    assert not document.dirty and store.rows_written == 0
@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event, text
+
+from app.services.block import get_block_rows_in_space, get_last_order_key
+from app.services.user_in_space import get_member_rows_in_space
+from tests.conftest import make_blocks, make_space, make_user
+
+SPACES = 20
+BLOCKS_PER_SPACE = 500
+
+
+@contextmanager
+def captured_selects(db):
+    """Collect the SELECT statements (with their parameters) issued on db's connection."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+
+def plans(db, statements):
+    cursor = db.connection().connection.cursor()
+    try:
+        result = []
+        for statement, parameters in statements:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            result.append("\n".join(row[0] for row in cursor.fetchall()))
+        return result
+    finally:
+        cursor.close()
+
+
+def seeded_spaces(db, spaces: int = SPACES, blocks: int = BLOCKS_PER_SPACE):
+    owner = make_user(db, "owner")
+    members = [make_user(db, f"member{n}") for n in range(10)]
+    spaces = [make_space(db, owner, members) for _ in range(spaces)]
+    for space in spaces:
+        make_blocks(db, space, blocks)
+    db.execute(text("ANALYZE"))
+    db.commit()
+    return [space.id for space in spaces]
+
+
+def test_space_block_queries_use_space_order_index(db):
+    space_id = seeded_spaces(db)[SPACES // 2]
+
+    with captured_selects(db) as statements:
+        assert len(get_block_rows_in_space(db, space_id)) == BLOCKS_PER_SPACE
+        assert get_last_order_key(db, space_id) is not None
+
+    assert len(statements) == 2
+    for plan in plans(db, statements):
+        assert "uq_blocks_space_id_order" in plan, plan
+        assert "Seq Scan on blocks" not in plan, plan
+
+
+def test_space_member_query_uses_space_user_index(db):
+    # Enough memberships that reading the whole table costs more than the index
+    space_id = seeded_spaces(db, spaces=500, blocks=0)[0]
+
+    with captured_selects(db) as statements:
+        assert len(get_member_rows_in_space(db, space_id)) == 11
+
+    [plan] = plans(db, statements)
+    assert "ix_users_in_spaces_space_id_user_id" in plan, plan
@@ -0,0 +1,25 @@
+from app.core import auth
+from tests.conftest import auth_headers, make_user
+
+
+def test_internal_stats_is_admin_only(client, db):
+    admin, user = make_user(db, "admin"), make_user(db, "user")
+
+    assert client.get("/internal/stats").status_code == 401
+    assert client.get("/internal/stats", headers=auth_headers(user)).status_code == 403
+    response = client.get("/internal/stats", headers=auth_headers(admin))
+    assert response.status_code == 200 and "block_cache" in response.json()
+
+
+def test_metrics_need_the_token_or_an_admin(client, db, monkeypatch):
+    admin, user = make_user(db, "admin"), make_user(db, "user")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=auth_headers(user)).status_code == 403
+    assert client.get("/metrics", headers=auth_headers(admin)).status_code == 200
+
+    monkeypatch.setattr(auth, "METRICS_TOKEN", "scrape-token")
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers=auth_headers(admin)).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200 and "http_request_duration" in response.text
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import threading
+import time
+
+from app.core import loop_monitor as loop_monitor_module
+from app.core import metrics
+from app.core.loop_monitor import LOOP_STALL_MS, LoopMonitor, flag_blocking_call
+
+
+def stalls_total() -> float:
+    lines = [line for line in metrics.event_loop_stalls.render() if not line.startswith("#")]
+    return float(lines[0].split()[-1]) if lines else 0.0
+
+
+def block_the_loop(seconds: float):
+    time.sleep(seconds)
+
+
+def test_a_stall_past_the_threshold_is_counted_and_logged(caplog):
+    threshold = LOOP_STALL_MS / 1000
+    monitor = LoopMonitor(interval=0.01, stall_seconds=threshold)
+    before = stalls_total()
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        block_the_loop(threshold / 2)
+        await asyncio.sleep(0.05)
+        block_the_loop(threshold * 4)
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger=loop_monitor_module.__name__):
+        asyncio.run(run())
+
+    assert monitor.stalls == 1 and stalls_total() == before + 1
+    assert monitor.max_lag >= threshold * 3
+    (record,) = [record for record in caplog.records if record.getMessage() == "Event loop blocked"]
+    # Taken while the loop was stuck, so the stack shows the blocking call
+    assert record.blocked_ms >= LOOP_STALL_MS and "block_the_loop" in record.stack
+
+
+def test_blocking_calls_on_the_loop_thread_are_flagged_once(caplog, monkeypatch):
+    monkeypatch.setattr(loop_monitor_module, "LOOP_DEBUG_BLOCKING", True)
+    monkeypatch.setattr(loop_monitor_module, "_flagged", set())
+    monkeypatch.setattr(loop_monitor_module.loop_monitor, "loop_thread_id", None)
+
+    async def handler():
+        flag_blocking_call("db")
+        flag_blocking_call("db")
+        # The same call from the threadpool is what the handler should have done
+        await asyncio.get_running_loop().run_in_executor(None, flag_blocking_call, "db")
+
+    async def run():
+        loop_monitor_module.loop_monitor.loop_thread_id = threading.get_ident()
+        await handler()
+
+    with caplog.at_level(logging.WARNING, logger=loop_monitor_module.__name__):
+        asyncio.run(run())
+
+    (record,) = [record for record in caplog.records if record.getMessage() == "Blocking call on the event loop"]
+    assert record.call == "db" and record.coroutine.endswith(":" + handler.__qualname__)
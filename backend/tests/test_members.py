@@ -0,0 +1,29 @@
+from tests.conftest import auth_headers, make_space, make_user
+
+
+def test_invite_adds_the_member_with_the_requested_role(client, db):
+    owner, admin, participant = make_user(db, "owner"), make_user(db, "admin"), make_user(db, "participant")
+    space = make_space(db, owner)
+    url, headers = f"/user-in-space/space/{space.id}/invite", auth_headers(owner)
+
+    response = client.post(url, headers=headers, params={"user_email": admin.email, "role": "admin"})
+    assert response.status_code == 200 and response.json()["role"] == "admin"
+    response = client.post(url, headers=headers, params={"user_email": participant.email})
+    assert response.status_code == 200 and response.json()["role"] == "participant"
+
+    assert client.post(url, headers=headers, params={"user_email": participant.email}).status_code == 400
+    members = client.get(f"/user-in-space/space/{space.id}/users", headers=headers).json()
+    assert sorted(member["role"] for member in members) == ["admin", "admin", "participant"]
+
+
+def test_role_change_is_stored(client, db):
+    owner, member = make_user(db, "owner"), make_user(db, "member")
+    space = make_space(db, owner, members=[member])
+    headers = auth_headers(owner)
+
+    response = client.put(f"/user-in-space/space/{space.id}/user/{member.id}/role", headers=headers,
+                          json={"role": "admin"})
+
+    assert response.status_code == 200 and response.json()["role"] == "admin"
+    members = client.get(f"/user-in-space/space/{space.id}/users", headers=headers).json()
+    assert {row["email"]: row["role"] for row in members}["member@example.com"] == "admin"
@@ -0,0 +1,134 @@
+import random
+import threading
+
+from sqlalchemy import func, select
+
+from app.core.ordering import MAX_KEY_LENGTH, key_after, key_between, needs_rebalance, with_jitter
+from app.db.session import SessionLocal
+from app.models.block import Block, BlockType
+from app.schemas.block import BlockCreate, BlockOperation
+from app.services.block import (
+    apply_block_batch, create_block_for_member, get_block_rows_in_space, get_space_block_version,
+    rebalance_space_order,
+)
+from tests.conftest import make_blocks, make_space, make_user
+
+
+def test_appends_and_prepends_grow_logarithmically():
+    last = first = None
+    for _ in range(100_000):
+        last = key_between(last, None)
+        first = key_between(None, first)
+    assert len(last) <= 4 and len(first) <= 4
+
+
+def test_inserts_into_one_gap_are_ordered_and_iterative():
+    # Over a thousand characters long, well past any recursion limit
+    low, high = "a0", "a1"
+    for _ in range(6000):
+        key = key_between(low, high)
+        assert low < key < high
+        high = key
+    assert len(high) > 1000
+
+
+def test_random_inserts_stay_ordered_and_short():
+    rng = random.Random(0)
+    keys = [key_between(None, None)]
+    for _ in range(20_000):
+        index = rng.randrange(len(keys) + 1)
+        before = keys[index - 1] if index > 0 else None
+        after = keys[index] if index < len(keys) else None
+        keys.insert(index, key_between(before, after))
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+    assert not any(needs_rebalance(key) for key in keys)
+
+
+def test_jittered_key_sorts_before_the_next_append():
+    key = key_after("a5")
+    assert "a5" < key < with_jitter(key) < key_after(key)
+
+
+def test_sql_block_order_after_matches_key_after(db):
+    keys, key = [None], None
+    for _ in range(5000):
+        key = key_after(key)
+        keys.append(key)
+    keys += ["Zz", "Yzz", "a0V", "bzzk", "zzzzzzzzzzzzzzzzzzzzzzzzzzzy"]
+    for key in keys:
+        assert db.execute(select(func.block_order_after(key))).scalar() == key_after(key), key
+
+
+def test_rebalance_changes_the_space_version(db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 10)
+    space_id, owner_id = space.id, owner.id
+    before = get_space_block_version(db, space_id, owner_id)
+
+    rebalance_space_order(db, space_id)
+
+    after = get_space_block_version(db, space_id, owner_id)
+    assert after.last_updated > before.last_updated
+    rows = get_block_rows_in_space(db, space_id)
+    assert [row["content"] for row in rows] == [f"block {n}" for n in range(10)]
+    assert max(len(row["order"]) for row in rows) < MAX_KEY_LENGTH
+
+
+def test_batch_hands_keys_on_between_blocks(db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 5)
+    space_id, owner_id = space.id, owner.id
+    ids = [row["id"] for row in get_block_rows_in_space(db, space_id)]
+
+    # The last block's key goes to the new one; b3 takes the key b1 leaves, and is
+    # written before b1 as its content changes first
+    apply_block_batch(db, space_id, owner_id, [
+        BlockOperation(op="delete", block_id=ids[4]),
+        BlockOperation(op="create", content="new"),
+        BlockOperation(op="update", block_id=ids[3], content="moved"),
+        BlockOperation(op="move", block_id=ids[1], after_id=ids[2]),
+        BlockOperation(op="move", block_id=ids[3], after_id=ids[0]),
+    ])
+
+    rows = get_block_rows_in_space(db, space_id)
+    assert [row["content"] for row in rows] == ["block 0", "moved", "block 2", "block 1", "new"]
+    assert rows[1]["order"] == "a1" and rows[4]["order"] == "a4"
+
+
+def test_concurrent_appends_get_distinct_keys(db):
+    # Appends that race for the same key hit the unique constraint and retry with another
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    space_id, owner_id = space.id, owner.id
+    writers, rounds = 16, 5
+    barrier = threading.Barrier(writers)
+    results, errors = [], []
+
+    def append(n):
+        session = SessionLocal()
+        try:
+            for round in range(rounds):
+                barrier.wait()
+                results.append(create_block_for_member(
+                    session, BlockCreate(space_id=space_id, type=BlockType.TEXT, content=f"block {n}.{round}"), owner_id,
+                ))
+        except threading.BrokenBarrierError:
+            pass
+        except Exception as error:
+            errors.append(error)
+            barrier.abort()
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=append, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(results) == writers * rounds and all(results)
+    keys = db.scalars(select(Block.order).where(Block.space_id == space_id)).all()
+    assert len(set(keys)) == writers * rounds
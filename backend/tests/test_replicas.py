@@ -0,0 +1,85 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.db import session
+from app.db.session import ReplicaRouter
+from tests.conftest import TEST_DATABASE_URL, auth_headers, make_blocks, make_space, make_user
+
+
+@pytest.fixture
+def replica(engine):
+    # A second engine on the test database stands in for the replica
+    replica = create_engine(TEST_DATABASE_URL)
+    yield replica
+    replica.dispose()
+
+
+class RecordingRouter(ReplicaRouter):
+    def __init__(self, primary, replicas, lag: float):
+        super().__init__(primary, replicas, max_lag_seconds=2, sticky_seconds=5)
+        self.fixed_lag = lag
+        self.chosen = []
+
+    def measure_lag(self, replica) -> float:
+        return self.fixed_lag
+
+    def choose(self, last_write_at: float = None):
+        chosen = super().choose(last_write_at)
+        self.chosen.append(chosen)
+        return chosen
+
+
+def make_router(engine, replicas, lag: float = 0.0) -> RecordingRouter:
+    return RecordingRouter(engine, replicas, lag)
+
+
+def test_reads_go_to_a_replica_unless_the_client_wrote_recently(engine, replica):
+    router = make_router(engine, [replica])
+
+    assert router.choose() is replica
+    assert router.choose(time.time() - 1) is engine
+    assert router.choose(time.time() - 10) is replica
+    assert make_router(engine, []).choose() is engine
+
+
+def test_a_lagging_replica_falls_back_to_the_primary(engine, replica):
+    assert make_router(engine, [replica], lag=1.5).choose() is replica
+    assert make_router(engine, [replica], lag=30).choose() is engine
+
+
+def test_an_unreachable_replica_falls_back_to_the_primary(engine):
+    unreachable = create_engine("postgresql://postgres@127.0.0.1:1/notes")
+    router = ReplicaRouter(engine, [unreachable], max_lag_seconds=2, sticky_seconds=5)
+
+    assert router.lag(unreachable) == float("inf")
+    assert router.choose() is engine
+
+
+def test_a_server_that_is_not_replaying_wal_is_not_used(engine, replica):
+    # The test database is no standby: nothing is replayed or streamed
+    router = ReplicaRouter(engine, [replica], max_lag_seconds=2, sticky_seconds=5)
+
+    assert router.measure_lag(replica) == float("inf")
+    assert router.choose() is engine
+
+
+def test_the_write_time_travels_with_the_client(client, db, engine, replica, monkeypatch):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 2)
+    # Each request may reach another worker: only the client remembers its write
+    router = make_router(engine, [replica])
+    monkeypatch.setattr(session, "replica_router", router)
+    headers, url = auth_headers(owner), f"/blocks/space/{space.id}"
+
+    assert client.get(url, headers=headers).status_code == 200
+    written = client.post("/blocks/", headers=headers, json={"space_id": space.id, "content": "new"})
+    assert written.status_code == 200 and written.headers["X-Last-Write"]
+    assert client.get(url, headers=headers).status_code == 200
+    client.cookies.clear()
+    assert client.get(url, headers=headers).status_code == 200
+    assert client.get(url, headers={**headers, "X-Last-Write": written.headers["X-Last-Write"]}).status_code == 200
+
+    assert router.chosen == [replica, engine, replica, engine]
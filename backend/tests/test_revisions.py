@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core import revisions
+from app.core.revisions import apply_delta, make_delta
+from app.models.block import Block
+from app.models.block_revision import BlockRevision
+from app.schemas.block import BlockUpdate
+from app.services.block import update_block
+from app.services.block_revision import compact_block_revisions, get_block_content_at
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+
+@pytest.mark.parametrize("old, new", [
+    ("", ""),
+    ("", "typed into an empty block"),
+    ("all of it goes", ""),
+    ("the quick brown fox", "the quick red fox"),
+    ("aaaa", "aaa"),
+    ("abc", "abcabc"),
+    ("prefix only", "prefix only, and more"),
+    ("a line\nanother line\n", "another line\na line\n"),
+    ("naïve café", "naïve café ☕ crème"),
+    ("completely different", "nothing in common?"),
+])
+def test_a_delta_rebuilds_the_new_content(old, new):
+    assert apply_delta(old, make_delta(old, new)) == new
+
+
+def make_history(db, monkeypatch, edits: int):
+    # A snapshot every third revision, so a few edits cross several snapshots
+    monkeypatch.setattr(revisions, "SNAPSHOT_EVERY", 3)
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 1, content="version")
+    block = db.query(Block).one()
+    contents = [block.content]
+    for n in range(1, edits + 1):
+        contents.append(f"version {n}: " + " ".join(f"word{i * n % 7}" for i in range(n)))
+        update_block(db, block.id, BlockUpdate(content=contents[-1]), author_id=owner.id)
+    db.expire_all()
+    return owner, db.get(Block, block.id), contents
+
+
+def stored_revisions(db, block_id: int):
+    return db.query(BlockRevision.revision, BlockRevision.is_snapshot).filter(
+        BlockRevision.block_id == block_id).order_by(BlockRevision.revision).all()
+
+
+def test_every_revision_is_rebuilt_across_snapshots(db, monkeypatch):
+    _, block, contents = make_history(db, monkeypatch, 8)
+
+    assert [row.revision for row in stored_revisions(db, block.id) if row.is_snapshot] == [0, 3, 6]
+    assert [get_block_content_at(db, block, n) for n in range(len(contents))] == contents
+    assert get_block_content_at(db, block, len(contents)) is None
+
+
+def test_restore_adds_a_revision_with_the_old_content(client, db, monkeypatch):
+    owner, block, contents = make_history(db, monkeypatch, 4)
+    headers = auth_headers(owner)
+
+    response = client.post(f"/blocks/{block.id}/revisions/2/restore", headers=headers)
+
+    assert response.status_code == 200 and response.json()["content"] == contents[2]
+    assert client.get(f"/blocks/{block.id}/revisions/5", headers=headers).json()["content"] == contents[2]
+    assert client.get(f"/blocks/{block.id}/revisions/4", headers=headers).json()["content"] == contents[4]
+    assert client.post(f"/blocks/{block.id}/revisions/9/restore", headers=headers).status_code == 404
+
+
+def test_compaction_keeps_the_newest_expired_revision_as_a_snapshot(db, monkeypatch):
+    _, block, contents = make_history(db, monkeypatch, 8)
+    # Revisions up to 4 fall outside the retention window; 4 is a delta on top of 3
+    db.query(BlockRevision).filter(BlockRevision.block_id == block.id, BlockRevision.revision <= 4).update(
+        {"created_at": datetime.now(timezone.utc) - timedelta(days=100)})
+    db.commit()
+
+    result = compact_block_revisions(db, retention_days=90)
+
+    assert result == {"blocks_compacted": 1, "revisions_removed": 4}
+    assert stored_revisions(db, block.id)[:2] == [(4, True), (5, False)]
+    assert [get_block_content_at(db, block, n) for n in range(4, len(contents))] == contents[4:]
+    assert get_block_content_at(db, block, 3) is None
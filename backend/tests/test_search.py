@@ -0,0 +1,32 @@
+from app.models.block import Block
+from app.services import block as block_service
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+
+def test_search_covers_the_callers_spaces_only(client, db):
+    owner, outsider = make_user(db, "owner"), make_user(db, "outsider")
+    make_blocks(db, make_space(db, owner), 3, content="shared note")
+    make_blocks(db, make_space(db, outsider), 3, content="shared note")
+
+    response = client.get("/blocks/search", params={"q": "shared"}, headers=auth_headers(owner))
+
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == 3 and all(item["owner_id"] == owner.id for item in items)
+    assert all("<mark>shared</mark>" in item["highlight"] for item in items)
+
+
+def test_search_ranks_a_bounded_set_of_matches(client, db, monkeypatch):
+    owner = make_user(db, "owner")
+    make_blocks(db, make_space(db, owner), 10, content="common word")
+    monkeypatch.setattr(block_service, "SEARCH_CANDIDATES", 4)
+    headers = auth_headers(owner)
+
+    first = client.get("/blocks/search", params={"q": "common", "limit": 3}, headers=headers).json()
+    second = client.get("/blocks/search", params={"q": "common", "limit": 3, "offset": 3}, headers=headers).json()
+
+    assert len(first["items"]) == 3 and first["next_offset"] == 3
+    assert len(second["items"]) == 1 and second["next_offset"] is None
+    # Equal ranks, so the window decides: always the newest matches
+    found = {item["id"] for item in first["items"] + second["items"]}
+    assert found == {block.id for block in db.query(Block).order_by(Block.id.desc()).limit(4)}
@@ -0,0 +1,55 @@
+import time
+
+from app.routers import space as space_router
+from tests.conftest import auth_headers, make_blocks, make_space, make_user
+
+
+def wait_for_job(client, headers, job_id: str) -> dict:
+    for _ in range(100):
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_import_round_trips_an_export(client, db, monkeypatch):
+    # Small write buffer, so the upload is written in several pieces
+    monkeypatch.setattr(space_router, "IMPORT_WRITE_BYTES", 1024)
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 200)
+    headers = auth_headers(owner)
+    export = client.get(f"/spaces/{space.id}/export", headers=headers).content
+
+    response = client.post("/spaces/import", headers={**headers, "Content-Type": "application/x-ndjson"},
+                           content=iter([export[:5000], export[5000:]]))
+    assert response.status_code == 200
+    job = wait_for_job(client, headers, response.json()["job_id"])
+    assert job["status"] == "succeeded" and job["result"]["blocks_imported"] == 200
+
+
+def test_import_refuses_a_member_after_the_blocks(client, db):
+    owner = make_user(db, "owner")
+    space = make_space(db, owner)
+    make_blocks(db, space, 3)
+    headers = auth_headers(owner)
+    header, *records = client.get(f"/spaces/{space.id}/export", headers=headers).content.splitlines()
+    members = [record for record in records if b'"member"' in record]
+    blocks = [record for record in records if record not in members]
+
+    response = client.post("/spaces/import", headers={**headers, "Content-Type": "application/x-ndjson"},
+                           content=b"\n".join([header, *blocks, *members]))
+    job = wait_for_job(client, headers, response.json()["job_id"])
+    assert job["status"] == "failed" and job["error"] == "Line 5: member records must come before blocks"
+
+
+def test_import_over_the_size_limit_is_refused(client, db, monkeypatch):
+    monkeypatch.setattr(space_router, "IMPORT_MAX_BYTES", 1000)
+    headers = {**auth_headers(make_user(db, "owner")), "Content-Type": "application/x-ndjson"}
+
+    # Declared too large, refused before reading
+    assert client.post("/spaces/import", headers=headers, content=b"x" * 1001).status_code == 413
+    # No Content-Length (chunked), refused once the received bytes pass the limit
+    response = client.post("/spaces/import", headers=headers, content=iter([b"x" * 600, b"x" * 600]))
+    assert response.status_code == 413
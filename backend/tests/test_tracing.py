@@ -0,0 +1,50 @@
+import pytest
+
+from app.core import tracing
+from app.core.tracing import parse_traceparent
+
+TRACE_ID, PARENT_ID = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+
+
+@pytest.mark.parametrize("header, parsed", [
+    (f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)),
+    (f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)),
+    (f"01-{TRACE_ID}-{PARENT_ID}-03-later", (TRACE_ID, PARENT_ID, True)),
+    (f"00-{TRACE_ID}-{PARENT_ID}-01-extra", None),
+    (f"ff-{TRACE_ID}-{PARENT_ID}-01", None),
+    (f"00-{'z' * 32}-{PARENT_ID}-01", None),
+    (f"00-{TRACE_ID.upper()}-{PARENT_ID}-01", None),
+    (f"00-{'0' * 32}-{PARENT_ID}-01", None),
+    (f"00-{TRACE_ID}-{'0' * 16}-01", None),
+    (f"00-{TRACE_ID}-{PARENT_ID}-x1", None),
+    (f"00-{TRACE_ID}-{PARENT_ID}", None),
+    ("", None),
+])
+def test_parse_traceparent(header, parsed):
+    assert parse_traceparent(header) == parsed
+
+
+@pytest.fixture
+def traced(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING", True)
+    return monkeypatch
+
+
+def test_an_incoming_trace_is_continued_only_when_sampled(traced):
+    span = tracing.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (span.trace_id, span.parent_id) == (TRACE_ID, PARENT_ID)
+
+    assert tracing.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-00") is tracing.NO_SPAN
+
+
+def test_the_local_sample_rate_applies_to_incoming_traces(traced):
+    traced.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+
+    assert tracing.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-01") is tracing.NO_SPAN
+
+
+def test_incoming_traces_can_be_ignored(traced):
+    traced.setattr(tracing, "TRACE_TRUST_TRACEPARENT", False)
+
+    span = tracing.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-00")
+    assert span.trace_id != TRACE_ID and span.parent_id is None